@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import json
+import os
+import shlex
+
+from ansible.plugins.action import ActionBase
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    STACK_UNITS,
+    quadlet_content_hash,
+    quadlet_manifest_path,
+    quadlet_service_name,
+    quadlet_systemctl_command,
+    quadlet_unit_name,
+    quadlet_wanted_states,
+    socket_activation_units,
+    stack_argument_spec,
+    validate_stack
+)
+
+
+class ActionModule(ActionBase):
+    """Render stack quadlets on the controller and only ship what differs."""
+
+    TRANSFERS_FILES = False
+
+    def _load_remote_manifest(self, quadlet_dir, project, task_vars):
+        """Fetch the manifest of the host, returning (units, expanded path)."""
+        slurp = self._execute_module(
+            module_name='ansible.builtin.slurp',
+            module_args=dict(src=quadlet_manifest_path(quadlet_dir, project)),
+            task_vars=task_vars,
+        )
+        if slurp.get('failed'):
+            return None, None
+
+        try:
+            manifest = json.loads(base64.b64decode(slurp['content']))
+        except (ValueError, TypeError):
+            return None, None
+        return manifest.get('units') or {}, slurp.get('source')
+
+    @staticmethod
+    def _render_unit(renderer, unit, config, quadlet_type):
+        """Render a present unit, returning (content hash, socket units).
+
+        The hash is None for an invalid configuration, which the module reports.
+        """
+        try:
+            content = renderer.generate_quadlet_content(config, quadlet_type)
+            socket_units = {}
+            if config.get('socket_activation'):
+                socket_units = socket_activation_units(unit['name'], config['socket_activation'])
+        except ValueError:
+            return None, {}
+        return quadlet_content_hash(content, config.get('instances'), socket_units), socket_units
+
+    @staticmethod
+    def _skipped_result(unit, config, quadlet_type, quadlet_file, content_hash, socket_units):
+        """Return the result the module would report for an up to date unit."""
+        unit_name = quadlet_unit_name(unit['name'], config)
+        unit_result = {
+            'name': unit['name'],
+            'changed': False,
+            'quadlet_file': quadlet_file,
+            'service_name': quadlet_service_name(unit_name, quadlet_type),
+            'services': [],
+            'change_class': 'none',
+            'changed_services': [],
+            'msg': f"Quadlet file {quadlet_file} is up to date",
+        }
+        if content_hash is not None:
+            unit_result['content_hash'] = content_hash
+            unit_result['services'] = [unit_result['service_name']]
+            if socket_units:
+                unit_result['socket_unit'] = f"{unit['name']}.socket"
+        if config.get('instances') is not None:
+            unit_result['removed_instances'] = []
+            if content_hash is not None:
+                unit_result['instances'] = config['instances']
+                unit_result['added_instances'] = []
+                unit_result['services'] = [
+                    quadlet_service_name(f"{unit_name}{instance}", quadlet_type)
+                    for instance in config['instances']]
+        return unit_result
+
+    def _compare_units(self, params, manifest_units, remote_dir):
+        """Compare the rendered units with the manifest.
+
+        Returns the results of the up to date units by (option, index).
+        """
+        renderer = PodmanQuadletBase(None)
+        renderer.capabilities = params['capabilities'] or {}
+        skipped = {}
+
+        for option, quadlet_type, build_config in STACK_UNITS:
+            for index, unit in enumerate(params[option]):
+                config = build_config(unit)
+                unit_file = f"{quadlet_unit_name(unit['name'], config)}.{quadlet_type}"
+                content_hash, socket_units = None, {}
+                if unit['state'] == 'absent':
+                    up_to_date = unit_file not in manifest_units
+                else:
+                    content_hash, socket_units = self._render_unit(renderer, unit, config,
+                                                                   quadlet_type)
+                    up_to_date = (content_hash is not None
+                                  and manifest_units.get(unit_file) == content_hash)
+
+                if up_to_date:
+                    skipped[(option, index)] = self._skipped_result(
+                        unit, config, quadlet_type, os.path.join(remote_dir, unit_file),
+                        content_hash, socket_units)
+        return skipped
+
+    def _service_states(self, remote_dir, services):
+        """Return the active state of services with one systemctl is-active call.
+
+        Returns None when the states cannot be read, so the module checks them.
+        """
+        cmd = quadlet_systemctl_command(remote_dir) + ['is-active'] + services
+        # is-active exits non-zero when a unit is not active, its output is what counts
+        states = self._low_level_execute_command(
+            ' '.join(shlex.quote(arg) for arg in cmd)).get('stdout', '').split()
+        if len(states) != len(services):
+            return None
+        return dict(zip(services, states))
+
+    def _drifted_units(self, params, skipped, remote_dir):
+        """Return the skipped units whose services are not in their wanted state.
+
+        Also returns the active states of the services that are.
+        """
+        wanted = {}
+        for (option, index), unit_result in skipped.items():
+            state = params[option][index]['state']
+            if state in ('started', 'stopped'):
+                wanted[(option, index)] = quadlet_wanted_states(unit_result, state)
+        services = sorted(set(service for states in wanted.values() for service in states))
+        if not services:
+            return set(), {}
+
+        states = self._service_states(remote_dir, services)
+        if states is None:
+            return set(wanted), {}
+        running = ('active', 'activating', 'reloading')
+        drifted = set(key for key, unit_wanted in wanted.items()
+                      if any((states[service] in running) != (state == 'started')
+                             for service, state in unit_wanted.items()))
+        return drifted, states
+
+    def _pending_units(self, params, skipped):
+        """Return the task arguments of the units the module has to apply, by option."""
+        return dict((option, [self._task.args.get(option)[index]
+                              for index in range(len(params[option]))
+                              if (option, index) not in skipped])
+                    for option, quadlet_type, build_config in STACK_UNITS)
+
+    @staticmethod
+    def _merge_results(result, module_result, skipped, params):
+        """Merge the skipped units back in the order they were requested."""
+        result.update(module_result)
+        for option, quadlet_type, build_config in STACK_UNITS:
+            executed = iter(module_result.get(option, []))
+            result[option] = [
+                skipped[(option, index)] if (option, index) in skipped else next(executed)
+                for index in range(len(params[option]))
+            ]
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        validation_result, params = self.validate_argument_spec(stack_argument_spec())
+        module_args = self._task.args.copy()
+
+        if not params['manifest_check']:
+            result.update(self._execute_module(module_args=module_args, task_vars=task_vars))
+            return result
+
+        # The quadlet_dir is expanded on the target, not on the controller
+        quadlet_dir = self._task.args.get('quadlet_dir',
+                                          stack_argument_spec()['quadlet_dir']['default'])
+        manifest_units, manifest_path = self._load_remote_manifest(quadlet_dir, params['project'],
+                                                                   task_vars)
+        if manifest_units is None:
+            result.update(self._execute_module(module_args=module_args, task_vars=task_vars))
+            return result
+
+        # The module only sees the pending units, so order the whole stack here
+        try:
+            start_waves = validate_stack(params)
+        except ValueError as e:
+            result.update(failed=True, msg=str(e))
+            return result
+
+        remote_dir = os.path.dirname(manifest_path)
+        skipped = self._compare_units(params, manifest_units, remote_dir)
+        # Up to date units with a service state only go to the module when
+        # their services drifted, a single systemctl call tells
+        drifted, active_states = self._drifted_units(params, skipped, remote_dir)
+        for key in drifted:
+            del skipped[key]
+        pending = self._pending_units(params, skipped)
+
+        # Pruning only needs the manifest, so the desired set decides whether
+        # the module has to run at all
+        desired = set(f"{quadlet_unit_name(unit['name'], build_config(unit))}.{quadlet_type}"
+                      for option, quadlet_type, build_config in STACK_UNITS
+                      for unit in params[option])
+        desired.update(params['keep_units'])
+        orphans = params['prune'] and any(unit_file not in desired for unit_file in manifest_units)
+
+        if any(pending.values()) or orphans:
+            module_args.update(pending)
+            if params['prune']:
+                module_args['keep_units'] = sorted(
+                    set(params['keep_units'])
+                    | set(os.path.basename(unit_result['quadlet_file'])
+                          for unit_result in skipped.values()))
+            module_result = self._execute_module(module_args=module_args, task_vars=task_vars)
+            if module_result.get('failed'):
+                result.update(module_result)
+                return result
+            active_states.update(module_result.get('active_states') or {})
+        else:
+            module_result = {'changed': False, 'changed_units': [], 'changed_services': [],
+                             'pruned_units': [], 'reloaded': False, 'restarted_services': [],
+                             'stopped_services': []}
+            for option in pending:
+                module_result[option] = []
+        module_result['active_states'] = active_states
+
+        self._merge_results(result, module_result, skipped, params)
+        result['start_waves'] = start_waves
+        return result
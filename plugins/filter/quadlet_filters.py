@@ -7,6 +7,8 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import re
+
 from ansible.errors import AnsibleFilterError
 
 
@@ -41,6 +43,22 @@ def extract_networks(containers):
     return networks
 
 
+def extract_images(containers):
+    """Extract unique images from container definitions that are not absent."""
+    images = []
+    seen = set()
+
+    for container in containers:
+        if container.get('state', 'present') == 'absent':
+            continue
+        image = container.get('container_image')
+        if image and image not in seen:
+            seen.add(image)
+            images.append(image)
+
+    return images
+
+
 def quadlet_format(value, key=None):
     """Format values for quadlet files."""
     if isinstance(value, bool):
@@ -58,7 +76,6 @@ def quadlet_format(value, key=None):
 def to_systemd_unit_name(name):
     """Convert a name to a valid systemd unit name."""
     # Replace invalid characters with hyphens
-    import re
     name = re.sub(r'[^a-zA-Z0-9:._-]', '-', name)
     # Remove leading/trailing hyphens
     name = name.strip('-')
@@ -67,6 +84,168 @@ def to_systemd_unit_name(name):
     return name
 
 
+def _stack_container_name(container):
+    """Return the podman_quadlet_stack name of a role container definition."""
+    if 'name' not in container:
+        raise AnsibleFilterError('Every container definition needs a name')
+
+    name = container.get('container_name', container['name'])
+    if name.endswith('.container'):
+        name = name[:-len('.container')]
+    return name
+
+
+def _image_unit_name(image):
+    """Return the name of the .image unit pulling an image reference."""
+    return to_systemd_unit_name(re.sub(r'[/:@]', '-', image))
+
+
+def quadlet_stack_images(containers, defaults=None):
+    """Convert the images of role container definitions into podman_quadlet_stack images."""
+    images = []
+
+    for image in extract_images(containers):
+        unit = dict(defaults or {})
+        unit['name'] = _image_unit_name(image)
+        unit['image'] = image
+        images.append(unit)
+
+    return images
+
+
+def quadlet_cpuset_requests(containers):
+    """Convert the cpuset settings of role containers into podman_quadlet_cpuset requests."""
+    requests = []
+
+    for container in containers:
+        if 'cpuset' not in container:
+            continue
+        request = dict(container['cpuset'])
+        request['name'] = _stack_container_name(container)
+        if container.get('state', 'present') == 'absent':
+            request = {'name': request['name'], 'state': 'absent'}
+        requests.append(request)
+
+    return requests
+
+
+def _stack_container_state(defaults):
+    """Return the state of containers without one, following the service state of the role."""
+    state = defaults.get('service_state')
+    if state not in ('started', 'stopped'):
+        return 'present'
+    return state
+
+
+def _stack_container_dependencies(container):
+    """Return the dependencies of a container, hand-written services included."""
+    # Hand-written service dependencies join the graph built by the stack
+    depends_on = list(container.get('depends_on', []))
+    for key in ('required_services', 'after_services'):
+        services = container.get(key) or []
+        depends_on.extend(services.split() if isinstance(services, str) else services)
+    return list(dict.fromkeys(depends_on))
+
+
+def _merge_stack_container_defaults(stack_container, container, defaults):
+    """Apply the role defaults a container does not override."""
+    for key in ('auto_update', 'restart_policy'):
+        if key not in container and key in defaults:
+            stack_container[key] = defaults[key]
+    # Containers without networks of their own follow the role network mode,
+    # and only join the default networks in bridge mode outside of a pod
+    if 'networks' not in container and 'network_mode' not in container \
+            and not container.get('pod'):
+        if defaults.get('network_mode') and defaults['network_mode'] != 'bridge':
+            stack_container['network_mode'] = defaults['network_mode']
+        else:
+            stack_container['networks'] = defaults.get('networks', [])
+    resources = dict(defaults.get('resources') or {})
+    resources.update(container.get('resources') or {})
+    cpuset = (defaults.get('cpusets') or {}).get(stack_container['name'])
+    if cpuset:
+        resources['cpuset_cpus'] = cpuset['cpuset_cpus']
+        resources['cpuset_mems'] = cpuset['cpuset_mems']
+    if resources:
+        stack_container['resources'] = resources
+    if defaults.get('enable_security_opts'):
+        security_opts = defaults.get('security_opts') or {}
+        stack_container['security_label_disable'] = not container.get('security_label', True)
+        if 'no_new_privileges' in security_opts:
+            stack_container['no_new_privileges'] = bool(security_opts['no_new_privileges'])
+
+
+def quadlet_stack_containers(containers, defaults=None):
+    """Convert role container definitions into podman_quadlet_stack containers."""
+    defaults = defaults or {}
+    state = _stack_container_state(defaults)
+    stack_containers = []
+
+    for container in containers:
+        environment = dict(container.get('environment_variables', {}))
+        environment.update(defaults.get('environment', {}))
+        labels = dict(container.get('labels', {}))
+        labels.update(defaults.get('labels', {}))
+
+        stack_container = {
+            'name': _stack_container_name(container),
+            'state': container.get('state', state),
+            'environment': environment,
+            'volumes': container.get('volumes', []),
+            'networks': container.get('networks', []),
+            'labels': labels,
+            'ports': container.get('ports', []),
+            'secrets': container.get('secrets', {}),
+        }
+        if 'container_image' in container:
+            if defaults.get('image_units') and stack_container['state'] != 'absent':
+                stack_container['image_unit'] = _image_unit_name(container['container_image'])
+            else:
+                stack_container['image'] = container['container_image']
+        for key in ('auto_update', 'restart_policy', 'custom_options', 'replicas', 'instances',
+                    'instance_base', 'restart_sec', 'start_limit_burst',
+                    'start_limit_interval_sec', 'timeout_start_sec', 'timeout_stop_sec',
+                    'stop_timeout', 'stop_signal', 'healthcheck', 'notify', 'socket_activation',
+                    'pod', 'network_mode', 'pasta_options', 'slirp4netns'):
+            if key in container:
+                stack_container[key] = container[key]
+        _merge_stack_container_defaults(stack_container, container, defaults)
+        depends_on = _stack_container_dependencies(container)
+        if depends_on:
+            stack_container['depends_on'] = depends_on
+
+        stack_containers.append(stack_container)
+
+    return stack_containers
+
+
+def quadlet_stack_units(names, settings=None, defaults=None, suffix=None, keys=None):
+    """Convert unit file names into podman_quadlet_stack network or volume entries."""
+    settings = settings or {}
+    defaults = defaults or {}
+    units = []
+
+    for name in names:
+        if suffix and name.endswith('.' + suffix):
+            name = name[:-len(suffix) - 1]
+
+        unit_settings = settings.get(name) or {}
+        if keys is not None:
+            unit_settings = dict((k, v) for k, v in unit_settings.items() if k in keys)
+
+        unit = dict(defaults)
+        unit.update(unit_settings)
+        unit['name'] = name
+        # Dictionaries given as defaults (e.g. common labels) take precedence
+        for key, value in defaults.items():
+            if isinstance(value, dict):
+                unit[key] = dict(unit_settings.get(key, {}), **value)
+
+        units.append(unit)
+
+    return units
+
+
 class FilterModule(object):
     """Ansible filters for podman quadlets."""
 
@@ -74,6 +253,11 @@ class FilterModule(object):
         return {
             'extract_volumes': extract_volumes,
             'extract_networks': extract_networks,
+            'extract_images': extract_images,
             'quadlet_format': quadlet_format,
             'to_systemd_unit_name': to_systemd_unit_name,
+            'quadlet_stack_containers': quadlet_stack_containers,
+            'quadlet_stack_units': quadlet_stack_units,
+            'quadlet_cpuset_requests': quadlet_cpuset_requests,
+            'quadlet_stack_images': quadlet_stack_images,
         }
\ No newline at end of file
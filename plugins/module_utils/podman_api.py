@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import socket
+import threading
+
+from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.parse import quote, urlencode
+
+# Oldest libpod API with the endpoints used here
+API_VERSION = 'v4.0.0'
+
+API_TIMEOUT = 300
+
+
+class PodmanAPIError(Exception):
+    """A podman operation failed, over the API or the CLI."""
+
+
+class _SocketUnavailable(Exception):
+    """The API socket cannot be reached, the CLI is used instead."""
+
+
+class UnixHTTPConnection(http_client.HTTPConnection):
+    """HTTP connection over a unix socket."""
+
+    def __init__(self, socket_path, timeout=API_TIMEOUT):
+        http_client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def podman_socket_path():
+    """Return the path of the Podman API socket of the current user."""
+    container_host = os.environ.get('CONTAINER_HOST', '')
+    if container_host.startswith('unix://'):
+        return container_host[len('unix://'):]
+    if os.geteuid() == 0:
+        return '/run/podman/podman.sock'
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or f"/run/user/{os.geteuid()}"
+    return os.path.join(runtime_dir, 'podman', 'podman.sock')
+
+
+class PodmanAPIClient(object):
+    """Run podman operations over the libpod REST API, or the CLI without a socket.
+
+    Every thread keeps one keep-alive connection for the whole module run.
+    Operations raise PodmanAPIError when they fail.
+    """
+
+    def __init__(self, module, socket_path=None, executable='podman'):
+        self.module = module
+        self.socket_path = socket_path or podman_socket_path()
+        self.executable = executable
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.transport = 'api' if os.path.exists(self.socket_path) else 'cli'
+
+    def _connection(self):
+        """Return the connection of the current thread, opening it if needed."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = UnixHTTPConnection(self.socket_path)
+            try:
+                connection.connect()
+            except (OSError, socket.error) as e:
+                raise _SocketUnavailable(to_native(e))
+            self._local.connection = connection
+            self._local.used = False
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _drop_connection(self):
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def close(self):
+        """Close every connection."""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def request(self, method, path, params=None, body=None):
+        """Send a request to the libpod API and return (status, body)."""
+        url = f"/{API_VERSION}/libpod{path}"
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        headers = {'Content-Type': 'application/octet-stream'} if body is not None else {}
+
+        for attempt in range(2):
+            connection = self._connection()
+            reused = self._local.used
+            try:
+                connection.request(method, url, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http_client.RemoteDisconnected, http_client.BadStatusLine,
+                    ConnectionResetError, BrokenPipeError) as e:
+                # The service closes idle connections, which only shows on reuse
+                self._drop_connection()
+                if reused and attempt == 0:
+                    continue
+                raise PodmanAPIError(f"Podman API request {method} {path} failed: {to_native(e)}")
+            except (OSError, socket.error, http_client.HTTPException) as e:
+                self._drop_connection()
+                raise PodmanAPIError(f"Podman API request {method} {path} failed: {to_native(e)}")
+            self._local.used = True
+            if response.getheader('Connection', '').lower() == 'close':
+                self._drop_connection()
+            return response.status, data
+
+    def _api(self, method, path, params=None, body=None, ok=(200, 201, 204)):
+        """Send a request and return its decoded JSON body, failing on other statuses."""
+        status, data = self.request(method, path, params=params, body=body)
+        if status not in ok:
+            raise PodmanAPIError(self._error_message(data)
+                                 or f"Podman API returned status {status} for {path}")
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return to_text(data)
+
+    @staticmethod
+    def _error_message(data):
+        """Return the message of a libpod error response."""
+        try:
+            error = json.loads(data)
+        except ValueError:
+            return to_text(data).strip()
+        if isinstance(error, dict):
+            return error.get('message') or error.get('cause')
+        return None
+
+    def _cli(self, args, data=None):
+        """Run a podman command and return (rc, stdout, stderr)."""
+        cmd = [self.executable] + args
+        try:
+            if data is not None:
+                return self.module.run_command(cmd, data=to_bytes(data), binary_data=True,
+                                               check_rc=False)
+            return self.module.run_command(cmd, check_rc=False)
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to run podman command: {to_native(e)}")
+
+    def _cli_json(self, args):
+        """Run a podman command and decode its JSON output."""
+        rc, stdout, stderr = self._cli(args)
+        if rc != 0:
+            raise PodmanAPIError(stderr.strip() or f"podman {' '.join(args)} failed with rc {rc}")
+        try:
+            return json.loads(stdout or 'null')
+        except ValueError as e:
+            raise PodmanAPIError(f"Failed to parse the output of podman {args[0]}: {to_native(e)}")
+
+    def _call(self, api, cli):
+        """Run an operation over the API, or the CLI when the socket is unavailable."""
+        if self.transport == 'api':
+            try:
+                return api()
+            except _SocketUnavailable:
+                self.transport = 'cli'
+        return cli()
+
+    def list_secrets(self):
+        """Return all secrets with their labels, in the format of podman secret inspect."""
+        def cli():
+            # podman secret ls leaves out the labels, inspect them all in one call
+            entries = self._cli_json(['secret', 'ls', '--format', 'json']) or []
+            ids = [entry.get('ID') or entry.get('Name') for entry in entries]
+            ids = [secret_id for secret_id in ids if secret_id]
+            if not ids:
+                return []
+            return self._cli_json(['secret', 'inspect'] + ids) or []
+
+        return self._call(lambda: self._api('GET', '/secrets/json') or [], cli)
+
+    def inspect_secret(self, name):
+        """Return the details of a secret, or None if it does not exist."""
+        def api():
+            status, data = self.request('GET', f"/secrets/{quote(name, safe='')}/json")
+            if status == 404:
+                return None
+            if status != 200:
+                raise PodmanAPIError(self._error_message(data)
+                                     or f"Podman API returned status {status}")
+            return json.loads(data)
+
+        def cli():
+            rc, stdout, stderr = self._cli(['secret', 'inspect', name])
+            if rc != 0:
+                return None
+            try:
+                return (json.loads(stdout) or [None])[0]
+            except ValueError:
+                return None
+
+        return self._call(api, cli)
+
+    @staticmethod
+    def _secret_body(data, path):
+        """Return the payload of a new secret, read from path when given."""
+        if not path:
+            return to_bytes(data)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except (IOError, OSError) as e:
+            raise PodmanAPIError(f"Failed to read secret file: {to_native(e)}")
+
+    def create_secret(self, name, data=None, path=None, driver=None, driver_opts=None,
+                      labels=None):
+        """Create a secret from data or from the content of a file and return its ID."""
+        # The file driver is the default of podman and is not passed on
+        driver = driver if driver != 'file' else None
+        driver_opts = driver_opts or {}
+        labels = labels or {}
+
+        def api():
+            params = {'name': name}
+            if driver:
+                params['driver'] = driver
+            if driver_opts:
+                params['driveropts'] = json.dumps(driver_opts)
+            if labels:
+                params['labels'] = json.dumps(dict((k, str(v)) for k, v in labels.items()))
+            created = self._api('POST', '/secrets/create', params=params,
+                                body=self._secret_body(data, path))
+            return created.get('ID', '') if isinstance(created, dict) else ''
+
+        def cli():
+            args = ['secret', 'create'] + (['--driver', driver] if driver else [])
+            for key, value in driver_opts.items():
+                args.extend(['--driver-opt', f'{key}={value}'])
+            for key, value in labels.items():
+                args.extend(['--label', f'{key}={value}'])
+            args.append(name)
+            if path:
+                rc, stdout, stderr = self._cli(args + [path])
+            else:
+                rc, stdout, stderr = self._cli(args + ['-'], data=data)
+            if rc != 0:
+                raise PodmanAPIError(stderr.strip())
+            # podman prints the ID of the new secret
+            return stdout.strip()
+
+        return self._call(api, cli)
+
+    def remove_secrets(self, names):
+        """Remove secrets."""
+        if not names:
+            return
+
+        def api():
+            for name in names:
+                self._api('DELETE', f"/secrets/{quote(name, safe='')}")
+
+        def cli():
+            rc, stdout, stderr = self._cli(['secret', 'rm'] + list(names))
+            if rc != 0:
+                raise PodmanAPIError(stderr.strip())
+
+        return self._call(api, cli)
+
+    def list_images(self):
+        """Return all local images, in the format of podman images."""
+        return self._call(
+            lambda: self._api('GET', '/images/json') or [],
+            lambda: self._cli_json(['images', '--format', 'json']) or [])
+
+    def pull_image(self, image):
+        """Pull an image."""
+        def api():
+            status, data = self.request('POST', '/images/pull',
+                                        params={'reference': image, 'quiet': 'true'})
+            if status != 200:
+                raise PodmanAPIError(self._error_message(data)
+                                     or f"Podman API returned status {status}")
+            # The response streams one JSON report per line, the error is in the last one
+            for line in to_text(data).splitlines():
+                try:
+                    report = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(report, dict) and report.get('error'):
+                    raise PodmanAPIError(report['error'])
+
+        def cli():
+            rc, stdout, stderr = self._cli(['pull', '--quiet', image])
+            if rc != 0:
+                raise PodmanAPIError(stderr.strip())
+
+        return self._call(api, cli)
@@ -7,36 +7,1092 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import hashlib
+import json
 import os
+import re
 import tempfile
+from contextlib import contextmanager
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils._text import to_native, to_text
+from ansible.module_utils._text import to_bytes, to_native, to_text
+
+
+# Label recording the digest of a secret payload, used to detect changes
+SECRET_DIGEST_LABEL = 'io.podman_quadlets.digest'
+
+
+# Canonical key order of every section and the kind of each key: 'str' keys
+# appear once, 'bool' keys once with normalized truth values, 'list' keys
+# repeat in the given order and 'map' keys repeat sorted by value. Keys not
+# listed here follow the known ones, sorted by name.
+QUADLET_SCHEMA = {
+    'Unit': (
+        ('Description', 'str'), ('Documentation', 'list'), ('Requires', 'list'),
+        ('Wants', 'list'), ('BindsTo', 'list'), ('After', 'list'), ('Before', 'list'),
+        ('StartLimitIntervalSec', 'str'), ('StartLimitBurst', 'str'), ('StopWhenUnneeded', 'bool'),
+    ),
+    'Container': (
+        ('Image', 'str'), ('ContainerName', 'str'), ('Pod', 'str'), ('Entrypoint', 'str'),
+        ('Exec', 'str'), ('User', 'str'), ('Group', 'str'), ('UserNS', 'str'),
+        ('WorkingDir', 'str'), ('Environment', 'map'), ('EnvironmentFile', 'list'),
+        ('Volume', 'list'), ('Mount', 'list'), ('Network', 'list'), ('PublishPort', 'list'),
+        ('Label', 'map'), ('Annotation', 'map'), ('Secret', 'map'), ('AutoUpdate', 'str'),
+        ('SecurityLabelDisable', 'bool'), ('NoNewPrivileges', 'bool'), ('ReadOnly', 'bool'),
+        ('AddCapability', 'list'), ('DropCapability', 'list'), ('Timezone', 'str'),
+        ('LogDriver', 'str'), ('StopTimeout', 'str'), ('StopSignal', 'str'),
+        ('HealthCmd', 'str'), ('HealthInterval', 'str'), ('HealthTimeout', 'str'),
+        ('HealthStartPeriod', 'str'), ('HealthRetries', 'str'), ('HealthOnFailure', 'str'),
+        ('Notify', 'str'), ('PidsLimit', 'str'), ('PodmanArgs', 'list'),
+    ),
+    'Network': (
+        ('NetworkName', 'str'), ('Driver', 'str'), ('Subnet', 'list'), ('Gateway', 'list'),
+        ('IPRange', 'list'), ('IPv6', 'bool'), ('Internal', 'bool'), ('DisableDNS', 'bool'),
+        ('DNS', 'list'), ('Options', 'map'), ('Label', 'map'), ('PodmanArgs', 'list'),
+    ),
+    'Volume': (
+        ('VolumeName', 'str'), ('Driver', 'str'), ('Device', 'str'), ('Type', 'str'),
+        ('Options', 'list'), ('Copy', 'bool'), ('User', 'str'), ('Group', 'str'),
+        ('Label', 'map'), ('PodmanArgs', 'list'),
+    ),
+    'Pod': (
+        ('PodName', 'str'), ('Network', 'list'), ('PublishPort', 'list'), ('Volume', 'list'),
+        ('UserNS', 'str'), ('PodmanArgs', 'list'),
+    ),
+    'Image': (
+        ('Image', 'str'), ('AllTags', 'bool'), ('Arch', 'str'), ('OS', 'str'), ('Variant', 'str'),
+        ('AuthFile', 'str'), ('CertDir', 'str'), ('Creds', 'str'), ('DecryptionKey', 'str'),
+        ('TLSVerify', 'bool'), ('ImageTag', 'str'), ('PodmanArgs', 'list'),
+    ),
+    'Socket': (
+        ('ListenStream', 'list'), ('ListenDatagram', 'list'), ('FileDescriptorName', 'str'),
+        ('Service', 'str'),
+    ),
+    'Service': (
+        ('Type', 'str'), ('ExecStart', 'str'), ('Restart', 'str'), ('RestartSec', 'str'),
+        ('TimeoutStartSec', 'str'), ('TimeoutStopSec', 'str'), ('CPUWeight', 'str'),
+    ),
+    'Install': (
+        ('WantedBy', 'list'), ('RequiredBy', 'list'),
+    ),
+}
+
+# Unit file extensions handled by the quadlet generator
+QUADLET_TYPES = ('container', 'network', 'volume', 'pod', 'kube', 'image')
+
+# Quadlet directories whose units run as system services
+SYSTEM_QUADLET_DIRS = ('/etc/containers/systemd', '/usr/share/containers/systemd',
+                       '/run/containers/systemd')
+
+# Suffixes of systemd units that are not generated from a quadlet
+SYSTEMD_UNIT_SUFFIXES = ('service', 'socket', 'target', 'timer', 'path', 'mount')
+
+# Keys whose values quadlet splits into words, so they are quoted if needed.
+# Their values are free-form text, so % is escaped too: systemd would expand
+# it as a specifier. Other keys keep specifiers such as the %i of templates.
+QUADLET_QUOTED_KEYS = ('Environment', 'Label', 'Annotation')
+
+# C escapes systemd decodes in the words of a value, and the hexadecimal
+# digits of the escapes carrying a code point
+QUADLET_ESCAPES = {'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v',
+                   's': ' '}
+QUADLET_HEX_ESCAPES = {'x': 2, 'u': 4, 'U': 8}
+
+# Keys systemd applies on daemon-reload without the container being recreated,
+# per section. None means every key of the section.
+RELOAD_ONLY_KEYS = {
+    'Unit': ('Description', 'Documentation', 'Requires', 'After', 'Before', 'Wants',
+             'StartLimitBurst', 'StartLimitIntervalSec', 'StopWhenUnneeded'),
+    'Service': ('Restart', 'RestartSec', 'TimeoutStartSec', 'TimeoutStopSec',
+                'TimeoutSec', 'StartLimitBurst', 'StartLimitIntervalSec'),
+    'Install': None,
+}
+
+
+# podman flags carrying the same setting as quadlet keys that older quadlet
+# generators do not know, written as PodmanArgs= instead
+QUADLET_KEY_FALLBACKS = {
+    'Container': {
+        'Timezone': '--tz', 'LogDriver': '--log-driver', 'Mount': '--mount',
+        'ReadOnly': '--read-only', 'StopTimeout': '--stop-timeout', 'StopSignal': '--stop-signal',
+        'PidsLimit': '--pids-limit', 'HealthCmd': '--health-cmd',
+        'HealthInterval': '--health-interval', 'HealthTimeout': '--health-timeout',
+        'HealthStartPeriod': '--health-start-period', 'HealthRetries': '--health-retries',
+        'HealthOnFailure': '--health-on-failure', 'AddCapability': '--cap-add',
+        'DropCapability': '--cap-drop',
+    },
+    'Network': {
+        'DNS': '--dns', 'IPRange': '--ip-range', 'Gateway': '--gateway', 'Subnet': '--subnet',
+    },
+    'Volume': {
+        'Device': '--opt=device', 'Type': '--opt=type',
+    },
+    'Pod': {
+        'UserNS': '--userns',
+    },
+    'Image': {
+        'AllTags': '--all-tags', 'Arch': '--arch', 'OS': '--os', 'Variant': '--variant',
+        'AuthFile': '--authfile', 'CertDir': '--cert-dir', 'Creds': '--creds',
+        'DecryptionKey': '--decryption-key', 'TLSVerify': '--tls-verify',
+    },
+}
+
+
+def _format_quadlet_value(value, key=None):
+    """Format a value for a quadlet file, quoting and escaping it where quadlet splits words."""
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    value = to_text(value)
+
+    if '\n' in value or '\r' in value:
+        raise ValueError(f"Quadlet values cannot contain line breaks: {value!r}")
+
+    if key in QUADLET_QUOTED_KEYS:
+        value = value.replace('%', '%%')
+        if any(c.isspace() or c in '"\'\\' for c in value):
+            value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    return value
+
+
+def _unescape_quadlet_char(value, index):
+    """Decode the C escape following a backslash at index, returning (text, next index)."""
+    char = value[index:index + 1]
+    if char in QUADLET_HEX_ESCAPES:
+        digits = value[index + 1:index + 1 + QUADLET_HEX_ESCAPES[char]]
+        if re.match(r'^[0-9a-fA-F]{%d}$' % QUADLET_HEX_ESCAPES[char], digits):
+            return chr(int(digits, 16)), index + 1 + len(digits)
+    elif re.match(r'^[0-7]{3}$', value[index:index + 3]):
+        return chr(int(value[index:index + 3], 8)), index + 3
+    return QUADLET_ESCAPES.get(char, char), index + 1
+
+
+def split_quadlet_words(value):
+    """Split a value into words like quadlet, removing quotes and decoding escapes.
+    
+    Environment="A=1" and Environment=A=1 both give ['A=1'].
+    """
+    words = []
+    word = None
+    quote = None
+    index = 0
+    while index < len(value):
+        char = value[index]
+        index += 1
+        if char == '\\':
+            char, index = _unescape_quadlet_char(value, index)
+        elif char == quote:
+            quote = None
+            continue
+        elif quote is None and char in '"\'':
+            quote = char
+            word = word or ''
+            continue
+        elif quote is None and char.isspace():
+            if word is not None:
+                words.append(word)
+            word = None
+            continue
+        word = (word or '') + char
+    if word is not None:
+        words.append(word)
+    return words
+
+
+def _map_sort_key(key, value):
+    """Return the words of a map value, quotes removed, to sort and compare it."""
+    if key in QUADLET_QUOTED_KEYS:
+        return split_quadlet_words(value)
+    return [value]
+
+
+def _podman_arg(flag, value):
+    """Format a podman flag as a single PodmanArgs= word."""
+    value = _format_quadlet_value(value)
+    if any(c.isspace() or c in '"\\' for c in value):
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        return f'"{flag}={value}"'
+    return f"{flag}={value}"
+
+
+def apply_quadlet_capabilities(sections, capabilities, quadlet_type):
+    """Rewrite (section, entries) pairs for what the installed quadlet generator supports.
+
+    capabilities is the result of podman_quadlet_capabilities. Keys it reports
+    as unsupported are written as PodmanArgs= when podman has an equivalent
+    flag. Raises ValueError when a setting cannot be expressed at all.
+    """
+    if not capabilities:
+        return sections
+    version = capabilities.get('version') or 'unknown'
+    if quadlet_type not in (capabilities.get('unit_types') or QUADLET_TYPES):
+        raise ValueError(f".{quadlet_type} units are not supported by podman {version}")
+
+    unsupported = capabilities.get('unsupported_keys') or {}
+    rewritten = []
+    for section, entries in sections:
+        missing = set(unsupported.get(section) or [])
+        if not missing:
+            rewritten.append((section, entries))
+            continue
+        fallbacks = QUADLET_KEY_FALLBACKS.get(section, {})
+        kept = []
+        podman_args = []
+        for key, value in entries:
+            if key not in missing and f"{key}={_format_quadlet_value(value)}" not in missing:
+                kept.append((key, value))
+            elif key in fallbacks and 'PodmanArgs' not in missing:
+                podman_args.append(('PodmanArgs', _podman_arg(fallbacks[key], value)))
+            else:
+                raise ValueError(f"{key}={_format_quadlet_value(value)} is not supported "
+                                 f"by podman {version}")
+        rewritten.append((section, kept + podman_args))
+    return rewritten
+
+
+def serialize_quadlet(sections):
+    """Serialize (section, entries) pairs into canonical quadlet content."""
+    blocks = []
+
+    for section, entries in sections:
+        schema = QUADLET_SCHEMA.get(section, ())
+        kinds = dict(schema)
+
+        grouped = {}
+        for key, value in entries:
+            grouped.setdefault(key, []).append(_format_quadlet_value(value, key))
+
+        keys = [key for key, kind in schema if key in grouped]
+        keys.extend(sorted(key for key in grouped if key not in kinds))
+
+        lines = [f'[{section}]']
+        for key in keys:
+            values = grouped[key]
+            if kinds.get(key) == 'map':
+                values = sorted(values, key=lambda value: _map_sort_key(key, value))
+            lines.extend(f"{key}={value}" for value in values)
+        blocks.append('\n'.join(lines))
+
+    return '\n\n'.join(blocks)
+
+
+def parse_quadlet_content(content):
+    """Parse quadlet content into a mapping of section to (key, value) pairs."""
+    sections = {}
+    current = None
+
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            current = sections.setdefault(line[1:-1], [])
+        elif current is not None and '=' in line:
+            key, value = line.split('=', 1)
+            current.append((key.strip(), value.strip()))
+
+    return sections
+
+
+def _normalize_quadlet(sections):
+    """Group parsed quadlet content by (section, key) in a comparable form."""
+    grouped = {}
+
+    for section, pairs in sections.items():
+        kinds = dict(QUADLET_SCHEMA.get(section, ()))
+        for key, value in pairs:
+            if kinds.get(key) == 'bool':
+                value = 'true' if value.lower() in ('1', 'yes', 'true', 'on') else 'false'
+            grouped.setdefault((section, key), []).append(value)
+
+    # Quoting is not part of the meaning of map values
+    for (section, key), values in grouped.items():
+        if dict(QUADLET_SCHEMA.get(section, ())).get(key) == 'map':
+            grouped[(section, key)] = sorted(word for value in values
+                                             for word in _map_sort_key(key, value))
+
+    return grouped
+
+
+def quadlets_equivalent(current_content, new_content):
+    """Check whether two quadlets have the same meaning, ignoring key order."""
+    if current_content is None or new_content is None:
+        return current_content == new_content
+    return (_normalize_quadlet(parse_quadlet_content(current_content))
+            == _normalize_quadlet(parse_quadlet_content(new_content)))
+
+
+def classify_quadlet_change(current_content, new_content):
+    """Classify the difference between two quadlets.
+
+    Returns C(none) when both have the same meaning, C(reload_only) when every
+    differing key is applied by a systemd daemon-reload and C(recreate) when
+    the container has to be recreated.
+    """
+    if current_content == new_content:
+        return 'none'
+    if current_content is None or new_content is None:
+        return 'recreate'
+
+    current = _normalize_quadlet(parse_quadlet_content(current_content))
+    new = _normalize_quadlet(parse_quadlet_content(new_content))
+    differing = [item for item in set(current) | set(new) if current.get(item) != new.get(item)]
+
+    if not differing:
+        return 'none'
+
+    for section, key in differing:
+        if section not in RELOAD_ONLY_KEYS:
+            return 'recreate'
+        reload_keys = RELOAD_ONLY_KEYS[section]
+        if reload_keys is not None and key not in reload_keys:
+            return 'recreate'
+
+    return 'reload_only'
+
+
+def secret_digest(data=None, path=None, chunk_size=65536):
+    """Return the SHA-256 digest of a secret payload given as data or file."""
+    digest = hashlib.sha256()
+    if path is not None:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    else:
+        digest.update(to_bytes(data))
+    return f"sha256:{digest.hexdigest()}"
+
+
+def quadlet_content_hash(content, instances=None, companions=None):
+    """Return the SHA-256 hex digest of quadlet content, its template instances
+    and the units written next to it."""
+    if instances is not None:
+        content = content + '\0' + '\n'.join(instances)
+    for filename in sorted(companions or {}):
+        content = content + '\0' + filename + '\n' + companions[filename]
+    return hashlib.sha256(to_bytes(content)).hexdigest()
+
+
+def quadlet_unit_name(name, config):
+    """Return the unit name of a quadlet, with a trailing @ for templates."""
+    if config.get('instances') is not None:
+        return f"{name}@"
+    return name
+
+
+# Health check of a container, see container_healthcheck_entries()
+CONTAINER_HEALTHCHECK_OPTIONS = dict(
+    cmd=dict(type='str'),
+    interval=dict(type='str'),
+    timeout=dict(type='str'),
+    start_period=dict(type='str'),
+    retries=dict(type='int'),
+    on_failure=dict(type='str', choices=['none', 'kill', 'restart', 'stop']),
+)
+
+# Options of the slirp4netns network mode, see container_network_entries()
+CONTAINER_SLIRP4NETNS_OPTIONS = dict(
+    port_handler=dict(type='str', choices=['rootlesskit', 'slirp4netns']),
+    mtu=dict(type='int'),
+    enable_ipv6=dict(type='bool'),
+    allow_host_loopback=dict(type='bool'),
+    cidr=dict(type='str'),
+    outbound_addr=dict(type='str'),
+)
+
+# Socket of a socket-activated container, see socket_activation_units()
+CONTAINER_SOCKET_OPTIONS = dict(
+    listen_stream=dict(type='list', elements='str', default=[]),
+    listen_datagram=dict(type='list', elements='str', default=[]),
+    file_descriptor_name=dict(type='str'),
+    idle_timeout=dict(type='str'),
+    target=dict(type='str'),
+    unit_dir=dict(type='path'),
+)
+
+# Resource limits of a container, see container_resource_entries()
+CONTAINER_RESOURCE_OPTIONS = dict(
+    memory=dict(type='str'),
+    memory_reservation=dict(type='str'),
+    memory_swap=dict(type='str'),
+    cpus=dict(type='float'),
+    cpu_quota=dict(type='int'),
+    cpu_period=dict(type='int'),
+    cpu_shares=dict(type='int'),
+    cpu_weight=dict(type='int'),
+    pids_limit=dict(type='int'),
+    blkio_weight=dict(type='int'),
+    device_read_bps=dict(type='list', elements='str'),
+    device_write_bps=dict(type='list', elements='str'),
+    device_read_iops=dict(type='list', elements='str'),
+    device_write_iops=dict(type='list', elements='str'),
+    cpuset_cpus=dict(type='str'),
+    cpuset_mems=dict(type='str'),
+)
+
+# Accepted ranges of the integer resource limits, None for no upper bound
+RESOURCE_RANGES = {
+    'cpu_quota': (1000, None),
+    'cpu_period': (1000, 1000000),
+    'cpu_shares': (2, 262144),
+    'cpu_weight': (1, 10000),
+    'pids_limit': (-1, None),
+    'blkio_weight': (10, 1000),
+}
+
+SIZE_UNITS = {'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+SIZE_RE = re.compile(r'^[0-9]+[bkmg]?$', re.IGNORECASE)
+
+
+def parse_size(value):
+    """Return the number of bytes of a podman size such as 512m."""
+    value = to_text(value).lower()
+    if not SIZE_RE.match(value):
+        raise ValueError(f"'{value}' is not a size such as 512m")
+    if value[-1] in SIZE_UNITS:
+        return int(value[:-1]) * SIZE_UNITS[value[-1]]
+    return int(value)
+
+
+# systemd Restart= value of every restart_policy; systemd has no notion of
+# a manual stop surviving a reboot, so unless-stopped behaves like always
+RESTART_POLICIES = {
+    'always': 'always',
+    'unless-stopped': 'always',
+    'on-failure': 'on-failure',
+    'no': 'no',
+}
+
+TIMESPAN_UNITS = r'(us|ms|s|sec|m|min|h|hr|d|w)'
+TIMESPAN_RE = re.compile(r'^([0-9]+(\.[0-9]+)?' + TIMESPAN_UNITS + r')*'
+                         r'[0-9]+(\.[0-9]+)?' + TIMESPAN_UNITS + r'?$')
+# Durations understood by podman itself, such as 1m30s
+DURATION_RE = re.compile(r'^([0-9]+(\.[0-9]+)?(ns|us|ms|s|m|h))+$')
+SIGNAL_RE = re.compile(r'^(SIG)?[A-Z][A-Z0-9+-]*$|^[0-9]+$')
+
+
+def container_service_entries(config):
+    """Validate the restart and stop settings of a container and return their entries.
+    
+    Returns the (unit, container, service) entries.
+    """
+    unit = []
+    container = []
+    restart = RESTART_POLICIES.get(config.get('restart_policy') or 'always', 'always')
+    service = [('Restart', restart)]
+    
+    for key, section, entries in (('restart_sec', 'RestartSec', service),
+                                  ('timeout_start_sec', 'TimeoutStartSec', service),
+                                  ('timeout_stop_sec', 'TimeoutStopSec', service),
+                                  ('start_limit_interval_sec', 'StartLimitIntervalSec', unit)):
+        value = config.get(key)
+        if value is None:
+            continue
+        value = to_text(value).strip()
+        if value != 'infinity' and not (value and all(TIMESPAN_RE.match(part)
+                                                      for part in value.split())):
+            raise ValueError(f"{key} must be a time span such as 5s or 1min 30s, got '{value}'")
+        entries.append((section, value))
+    
+    if config.get('start_limit_burst') is not None:
+        if config['start_limit_burst'] < 0:
+            raise ValueError("start_limit_burst cannot be negative")
+        unit.append(('StartLimitBurst', config['start_limit_burst']))
+    
+    if config.get('stop_timeout') is not None:
+        if config['stop_timeout'] < 0:
+            raise ValueError("stop_timeout cannot be negative")
+        container.append(('StopTimeout', config['stop_timeout']))
+    
+    if config.get('stop_signal'):
+        if not SIGNAL_RE.match(config['stop_signal']):
+            raise ValueError("stop_signal must be a signal such as SIGTERM, "
+                             f"got '{config['stop_signal']}'")
+        container.append(('StopSignal', config['stop_signal']))
+    
+    return unit, container, service
+
+
+def parse_cpuset(value):
+    """Return the sorted CPU or node ids of a cpuset list such as 0-3,8."""
+    ids = set()
+    for part in to_text(value).replace(' ', '').split(','):
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        if not first.isdigit() or (sep and not last.isdigit()):
+            raise ValueError(f"'{value}' is not a cpuset list such as 0-3,8")
+        if sep and int(last) < int(first):
+            raise ValueError(f"'{part}' is an empty range")
+        ids.update(range(int(first), int(last or first) + 1))
+    return sorted(ids)
+
+
+def format_cpuset(ids):
+    """Format CPU or node ids as a compact cpuset list."""
+    ranges = []
+    for cpu in sorted(set(ids)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(f"{first}-{last}" if first != last else f"{first}" for first, last in ranges)
+
+
+def resource_range_value(resources, key):
+    """Return an integer resource limit checked against RESOURCE_RANGES, None when not set."""
+    if key not in resources:
+        return None
+    value = resources[key]
+    minimum, maximum = RESOURCE_RANGES[key]
+    if value < minimum or (maximum is not None and value > maximum):
+        if maximum is not None:
+            bounds = f"between {minimum} and {maximum}"
+        else:
+            bounds = f"at least {minimum}"
+        raise ValueError(f"resources.{key} must be {bounds}, got {value}")
+    return value
+
+
+def resource_memory_entries(resources):
+    """Validate the memory limits and return their container entries."""
+    container = []
+    sizes = {}
+    for key in ('memory', 'memory_reservation', 'memory_swap'):
+        if key not in resources:
+            continue
+        value = to_text(resources[key])
+        if key == 'memory_swap' and value == '-1':
+            sizes[key] = -1
+        else:
+            try:
+                sizes[key] = parse_size(value)
+            except ValueError as e:
+                raise ValueError(f"resources.{key}: {to_native(e)}")
+        container.append(('PodmanArgs', f"--{key.replace('_', '-')}={value}"))
+    
+    if sizes.get('memory_reservation', 0) > sizes.get('memory', float('inf')):
+        raise ValueError("resources.memory_reservation cannot exceed resources.memory")
+    if sizes.get('memory_swap', -1) != -1:
+        if 'memory' not in sizes:
+            raise ValueError("resources.memory_swap requires resources.memory")
+        if sizes['memory_swap'] < sizes['memory']:
+            raise ValueError("resources.memory_swap includes the memory and cannot be lower "
+                             "than resources.memory")
+    return container
+
+
+def resource_cpu_entries(resources):
+    """Validate the CPU limits and return their (container, service) entries."""
+    container = []
+    service = []
+    if 'cpus' in resources:
+        if resources['cpus'] <= 0:
+            raise ValueError("resources.cpus must be greater than 0")
+        if 'cpu_quota' in resources or 'cpu_period' in resources:
+            raise ValueError("resources.cpus cannot be combined with resources.cpu_quota "
+                             "or resources.cpu_period")
+        container.append(('PodmanArgs', f"--cpus={resources['cpus']:g}"))
+    
+    for key in ('cpu_quota', 'cpu_period', 'cpu_shares'):
+        value = resource_range_value(resources, key)
+        if value is not None:
+            container.append(('PodmanArgs', f"--{key.replace('_', '-')}={value}"))
+    if resource_range_value(resources, 'cpu_weight') is not None:
+        service.append(('CPUWeight', resources['cpu_weight']))
+    return container, service
+
+
+def resource_cpuset_entries(resources):
+    """Validate the CPUs and memory nodes a container is pinned to and return their entries."""
+    container = []
+    for key in ('cpuset_cpus', 'cpuset_mems'):
+        if key not in resources:
+            continue
+        try:
+            ids = parse_cpuset(resources[key])
+        except ValueError as e:
+            raise ValueError(f"resources.{key}: {to_native(e)}")
+        if ids:
+            container.append(('PodmanArgs', f"--{key.replace('_', '-')}={format_cpuset(ids)}"))
+    return container
+
+
+def resource_pids_entries(resources):
+    """Validate the PIDs limit and return its container entries."""
+    value = resource_range_value(resources, 'pids_limit')
+    return [] if value is None else [('PidsLimit', value)]
+
+
+def resource_io_entries(resources):
+    """Validate the block IO weight and return its container entries."""
+    value = resource_range_value(resources, 'blkio_weight')
+    return [] if value is None else [('PodmanArgs', f"--blkio-weight={value}")]
+
+
+def resource_device_entries(resources):
+    """Validate the device IO throttles and return their container entries."""
+    container = []
+    for key in ('device_read_bps', 'device_write_bps', 'device_read_iops', 'device_write_iops'):
+        for throttle in resources.get(key) or []:
+            device, sep, rate = to_text(throttle).rpartition(':')
+            valid_rate = SIZE_RE.match(rate) if key.endswith('bps') else rate.isdigit()
+            if not sep or not device.startswith('/') or not valid_rate:
+                example = '/dev/sda:10m' if key.endswith('bps') else '/dev/sda:1000'
+                raise ValueError(
+                    f"resources.{key} entries must look like {example}, got '{throttle}'")
+            container.append(('PodmanArgs', f"--{key.replace('_', '-')}={device}:{rate}"))
+    return container
+
+
+def container_resource_entries(resources):
+    """Validate resource limits and return their (container, service) entries.
+    
+    Limits podman only knows as flags are written as PodmanArgs, the PIDs limit
+    as PidsLimit and the CPU weight as CPUWeight of the service cgroup.
+    """
+    resources = dict((key, value) for key, value in (resources or {}).items()
+                     if value is not None)
+    cpu_container, service = resource_cpu_entries(resources)
+    container = (resource_memory_entries(resources) + cpu_container
+                 + resource_pids_entries(resources) + resource_io_entries(resources)
+                 + resource_cpuset_entries(resources) + resource_device_entries(resources))
+    return container, service
+
+
+PORT_PROTOCOLS = ('tcp', 'udp', 'sctp')
+
+
+def publish_port(port):
+    """Return the PublishPort= of a port mapping, [host_ip:]host_port:container_port[/protocol]."""
+    value = f"{port['host_port']}:{port['container_port']}"
+    host_ip = port.get('host_ip')
+    if host_ip:
+        host_ip = to_text(host_ip)
+        if ':' in host_ip and not host_ip.startswith('['):
+            host_ip = f"[{host_ip}]"
+        value = f"{host_ip}:{value}"
+    protocol = port.get('protocol')
+    if protocol:
+        if protocol not in PORT_PROTOCOLS:
+            raise ValueError(f"port protocol must be one of {', '.join(PORT_PROTOCOLS)}, "
+                             f"got '{protocol}'")
+        value = f"{value}/{protocol}"
+    return value
+
+
+def container_network_entries(config):
+    """Validate the network mode of a container and return its Network= values.
+    
+    bridge, the default, joins the networks of the container. The other modes
+    replace them: host and none, container:<name> to share the namespace of
+    another container, and the rootless forwarders pasta and slirp4netns with
+    their options.
+    """
+    mode = config.get('network_mode') or 'bridge'
+    networks = list(config.get('networks') or [])
+    pasta_options = config.get('pasta_options') or []
+    slirp4netns = dict((key, value) for key, value in (config.get('slirp4netns') or {}).items()
+                       if value is not None)
+    
+    if pasta_options and mode != 'pasta':
+        raise ValueError("pasta_options requires network_mode=pasta")
+    if slirp4netns and mode != 'slirp4netns':
+        raise ValueError("slirp4netns requires network_mode=slirp4netns")
+    if mode == 'bridge':
+        return networks
+    if networks:
+        raise ValueError(f"networks cannot be joined with network_mode={mode}")
+    
+    if mode == 'pasta':
+        return [f"pasta:{','.join(pasta_options)}" if pasta_options else 'pasta']
+    if mode == 'slirp4netns':
+        if slirp4netns.get('mtu') is not None and slirp4netns['mtu'] < 68:
+            raise ValueError("slirp4netns.mtu must be at least 68")
+        options = [f"{key}={_format_quadlet_value(slirp4netns[key])}"
+                   for key in sorted(slirp4netns)]
+        return [f"slirp4netns:{','.join(options)}" if options else 'slirp4netns']
+    if mode in ('host', 'none') or (mode.startswith('container:')
+                                    and len(mode) > len('container:')):
+        # These share or lack a network namespace of their own, nothing to publish
+        if config.get('ports'):
+            raise ValueError(f"ports cannot be published with network_mode={mode}")
+        return [mode]
+    raise ValueError("network_mode must be bridge, host, none, pasta, slirp4netns or "
+                     f"container:<name>, got '{mode}'")
+
+
+def container_networking_entries(config):
+    """Return the Network= and PublishPort= entries of a container."""
+    entries = [('Network', network) for network in container_network_entries(config)]
+    for port in config.get('ports') or []:
+        if '%i' in f"{port['host_port']}" and config.get('instances') is None:
+            raise ValueError(
+                "'%i' can only be used in ports of containers with replicas or instances")
+        entries.append(('PublishPort', publish_port(port)))
+    return entries
+
+
+def container_pod_entries(config):
+    """Return the Pod= entry of a container joining a pod."""
+    if not config.get('pod'):
+        return []
+    # Members of a pod share its network namespace, ports and networks are the pod's
+    if config.get('ports') or config.get('networks') or config.get('network_mode'):
+        raise ValueError(
+            f"ports and networks of a container in a pod are set on {config['pod']}")
+    return [('Pod', config['pod'])]
+
+
+def container_security_entries(config):
+    """Return the security entries of a container."""
+    return [(key, config[option])
+            for key, option in (('SecurityLabelDisable', 'security_label_disable'),
+                                ('NoNewPrivileges', 'no_new_privileges'))
+            if config.get(option) is not None]
+
+
+def container_healthcheck_entries(config):
+    """Validate the health check of a container and return its entries."""
+    healthcheck = config.get('healthcheck') or {}
+    entries = []
+    if healthcheck.get('cmd'):
+        entries.append(('HealthCmd', healthcheck['cmd']))
+    for key, option in (('HealthInterval', 'interval'), ('HealthTimeout', 'timeout'),
+                        ('HealthStartPeriod', 'start_period')):
+        if healthcheck.get(option):
+            if not DURATION_RE.match(healthcheck[option]):
+                raise ValueError(
+                    f"healthcheck.{option} '{healthcheck[option]}' is not a valid duration")
+            entries.append((key, healthcheck[option]))
+    if healthcheck.get('retries') is not None:
+        if healthcheck['retries'] < 1:
+            raise ValueError("healthcheck.retries must be at least 1")
+        entries.append(('HealthRetries', healthcheck['retries']))
+    if healthcheck.get('on_failure'):
+        entries.append(('HealthOnFailure', healthcheck['on_failure']))
+    return entries + container_notify_entries(config)
+
+
+def container_notify_entries(config):
+    """Return the Notify= readiness reported to systemd, conmon being podman's default."""
+    if config.get('notify') == 'healthy':
+        if not (config.get('healthcheck') or {}).get('cmd'):
+            raise ValueError("notify=healthy requires healthcheck.cmd")
+        return [('Notify', 'healthy')]
+    if config.get('notify') == 'container':
+        return [('Notify', True)]
+    return []
+
+
+def container_custom_entries(custom_options):
+    """Return the entries of custom options, a list value repeating the key."""
+    entries = []
+    for key, values in (custom_options or {}).items():
+        if not isinstance(values, list):
+            values = [values]
+        entries.extend((key, value) for value in values)
+    return entries
+
+
+def container_instances(params):
+    """Return the instances of a templated container, or None for a plain one."""
+    if params.get('instances') is not None:
+        return [to_text(instance) for instance in params['instances']]
+    if params.get('replicas') is not None:
+        base = params.get('instance_base')
+        if base is None:
+            base = 1
+        return [to_text(base + index) for index in range(params['replicas'])]
+    return None
+
+
+def quadlet_manifest_path(quadlet_dir, project):
+    """Return the path of the manifest recording the quadlets of a project."""
+    return os.path.join(quadlet_dir, f".podman_quadlets-{project}.json")
+
+
+def is_quadlet_unit_file(unit_file):
+    """Check that a manifest entry is the file name of a quadlet unit, without any path."""
+    name, dot, suffix = unit_file.rpartition('.')
+    return (os.path.basename(unit_file) == unit_file and unit_file not in ('.', '..')
+            and bool(dot and name) and suffix in QUADLET_TYPES and '\0' not in unit_file)
+
+
+def quadlet_service_name(name, quadlet_type='container'):
+    """Return the systemd service generated by quadlet for a unit."""
+    if quadlet_type in ('container', 'kube'):
+        return f"{name}.service"
+    return f"{name}-{quadlet_type}.service"
+
+
+# First line of the socket and proxy units written next to a container, so
+# that only files written by this collection are ever removed
+MANAGED_UNIT_HEADER = '# Managed by community.podman_quadlets\n'
+
+SOCKET_PROXY = '/usr/lib/systemd/systemd-socket-proxyd'
+
+
+def systemd_unit_dir(quadlet_dir):
+    """Return the directory of plain systemd units matching a quadlet directory."""
+    quadlet_dir = quadlet_dir.rstrip('/')
+    if quadlet_dir in SYSTEM_QUADLET_DIRS:
+        return '/etc/systemd/system'
+    config_dir, tail = os.path.split(os.path.dirname(quadlet_dir))
+    if tail == 'containers' and os.path.basename(quadlet_dir) == 'systemd':
+        return os.path.join(config_dir, 'systemd', 'user')
+    return os.path.expanduser('~/.config/systemd/user')
+
+
+def socket_activation_units(name, socket_activation):
+    """Return the socket and proxy units of a socket-activated container by file name.
+    
+    Without idle_timeout the socket passes its file descriptors to the
+    container service, whose application must accept them (LISTEN_FDS). With
+    it, systemd-socket-proxyd forwards connections to target and exits once
+    idle, and the container, only needed by the proxy, stops with it.
+    """
+    streams = socket_activation.get('listen_stream') or []
+    datagrams = socket_activation.get('listen_datagram') or []
+    if not streams and not datagrams:
+        raise ValueError("socket_activation requires listen_stream or listen_datagram")
+    
+    socket = [('ListenStream', address) for address in streams]
+    socket.extend(('ListenDatagram', address) for address in datagrams)
+    if socket_activation.get('file_descriptor_name'):
+        socket.append(('FileDescriptorName', socket_activation['file_descriptor_name']))
+    
+    units = {}
+    idle_timeout = socket_activation.get('idle_timeout')
+    target = socket_activation.get('target')
+    if idle_timeout is not None:
+        idle_timeout = to_text(idle_timeout).strip()
+        if not TIMESPAN_RE.match(idle_timeout):
+            raise ValueError("socket_activation.idle_timeout must be a time span such as 5min, "
+                             f"got '{idle_timeout}'")
+        if not target:
+            raise ValueError("socket_activation.idle_timeout requires socket_activation.target")
+        if datagrams:
+            raise ValueError("systemd-socket-proxyd only forwards streams, "
+                             "socket_activation.idle_timeout cannot be used with listen_datagram")
+        proxy = f"{name}-proxy.service"
+        socket.append(('Service', proxy))
+        dependencies = [f"{name}.service", f"{name}.socket"]
+        units[proxy] = MANAGED_UNIT_HEADER + serialize_quadlet([
+            ('Unit', [('Description', f"{name} Socket Proxy")]
+             + [('Requires', unit) for unit in dependencies]
+             + [('After', unit) for unit in dependencies]),
+            ('Service', [('ExecStart',
+                          f"{SOCKET_PROXY} --exit-idle-time={idle_timeout} {target}")]),
+        ])
+    elif target:
+        raise ValueError(
+            "socket_activation.target is only used with socket_activation.idle_timeout")
+    
+    units[f"{name}.socket"] = MANAGED_UNIT_HEADER + serialize_quadlet([
+        ('Unit', [('Description', f"{name} Socket")]),
+        ('Socket', socket),
+        ('Install', [('WantedBy', 'sockets.target')]),
+    ])
+    return units
+
+
+def socket_activated_entries(config, service):
+    """Validate a socket-activated container and return its (unit, service) entries.
+    
+    service is the service section of the container, which systemd must no
+    longer restart when the application exits on its own when idle.
+    """
+    if config.get('instances') is not None:
+        raise ValueError("socket_activation cannot be used with replicas or instances")
+    unit = []
+    if config['socket_activation'].get('idle_timeout') is not None:
+        unit.append(('StopWhenUnneeded', True))
+    service = [(key, 'on-failure' if (key, value) == ('Restart', 'always') else value)
+               for key, value in service]
+    return unit, service
+
+
+def dependency_service(ref):
+    """Return the systemd service a dependency reference points to.
+
+    References may be systemd units such as services or sockets, quadlet unit
+    files or container names.
+    """
+    name, dot, suffix = ref.rpartition('.')
+    if dot and suffix in SYSTEMD_UNIT_SUFFIXES:
+        return ref
+    if dot and suffix in QUADLET_TYPES:
+        return quadlet_service_name(name, suffix)
+    return f"{ref}.service"
+
+
+def container_image(params):
+    """Return the Image= of a container, pointing to its image unit when it has one."""
+    image_unit = params.get('image_unit')
+    if image_unit:
+        return image_unit if image_unit.endswith('.image') else f"{image_unit}.image"
+    return params['image']
+
+
+def container_pod(params):
+    """Return the Pod= of a container, the quadlet unit of its pod."""
+    pod = params.get('pod')
+    if pod and not pod.endswith('.pod'):
+        return f"{pod}.pod"
+    return pod
+
+
+def container_dependencies(params):
+    """Return the services a container needs, from the units it references and depends_on."""
+    refs = [network for network in params.get('networks') or [] if network.endswith('.network')]
+    if params.get('pod'):
+        refs.append(container_pod(params))
+    network_mode = params.get('network_mode') or ''
+    if network_mode.startswith('container:'):
+        refs.append(network_mode[len('container:'):])
+    if params.get('image_unit'):
+        refs.append(container_image(params))
+    for volume in params.get('volumes') or []:
+        host_path = f"{volume.get('host_path', '')}" if isinstance(volume, dict) else ''
+        if host_path.endswith('.volume'):
+            refs.append(host_path)
+    refs.extend(params.get('depends_on') or [])
+    return list(dict.fromkeys(dependency_service(ref) for ref in refs))
+
+
+def quadlet_start_waves(units):
+    """Group services into waves that can each be started with one call.
+
+    units maps a unit file to its services and the services it depends on.
+    Dependencies outside of units are left to systemd. Raises ValueError
+    naming the units of a dependency cycle.
+    """
+    owners = {}
+    for unit_file, (services, dependencies) in units.items():
+        for service in services:
+            owners[service] = unit_file
+    needs = {}
+    for unit_file, (services, dependencies) in units.items():
+        needs[unit_file] = set(owners[service] for service in dependencies
+                               if owners.get(service, unit_file) != unit_file)
+    
+    waves = []
+    started = set()
+    remaining = set(units)
+    while remaining:
+        ready = sorted(unit_file for unit_file in remaining if needs[unit_file] <= started)
+        if not ready:
+            # Every remaining unit waits on another one, so following them loops
+            path = [min(remaining)]
+            while path.count(path[-1]) < 2:
+                path.append(min(needs[path[-1]] & remaining))
+            cycle = path[path.index(path[-1]):]
+            raise ValueError(f"Dependency cycle between {' -> '.join(cycle)}")
+        wave = [service for unit_file in ready for service in units[unit_file][0]]
+        if wave:
+            waves.append(wave)
+        started.update(ready)
+        remaining.difference_update(ready)
+    return waves
+
+
+def quadlet_wanted_states(unit_result, state):
+    """Return the wanted state of the units of a quadlet, started or stopped.
+    
+    A socket-activated container is controlled through its socket. Its
+    service is stopped when it needs a recreate, so that the next connection
+    starts it with the new configuration.
+    """
+    socket_unit = unit_result.get('socket_unit')
+    if not socket_unit:
+        return dict((service, state) for service in unit_result['services'])
+    wanted = {socket_unit: state}
+    for service in unit_result['services']:
+        if state == 'stopped' or service in unit_result['changed_services']:
+            wanted[service] = 'stopped'
+    return wanted
+
+
+def parse_systemctl_show(stdout, services):
+    """Split the output of systemctl show for several units into their properties."""
+    # systemctl prints one block per unit, in the order they were given
+    blocks = [block for block in stdout.strip().split('\n\n') if block.strip()]
+    properties = {}
+    for service, block in zip(services, blocks):
+        properties[service] = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+    return properties
+
+
+def quadlet_systemctl_command(quadlet_dir, user=None):
+    """Return the systemctl command managing the services of a quadlet directory.
+
+    With user, the manager of that user is reached from a privileged process.
+    """
+    if quadlet_dir.rstrip('/').startswith(SYSTEM_QUADLET_DIRS):
+        return ['systemctl']
+    if user is not None:
+        return ['systemctl', '--user', '-M', f"{user}@"]
+    return ['systemctl', '--user']
 
 
 class PodmanQuadletBase:
     """Base class for Podman Quadlet operations."""
     
-    def __init__(self, module):
+    def __init__(self, module, params=None, owner=None, user=None):
         self.module = module
-        self.check_mode = module.check_mode
+        if params is None:
+            params = module.params if module is not None else {}
+        self.params = params
+        self.check_mode = module.check_mode if module is not None else False
+        self.capabilities = self.params.get('capabilities') or {}
+        # (uid, gid) of the user owning the quadlet directory. A privileged
+        # process does its file operations as that user, which also gives it
+        # the files and directories they create.
+        self.owner = owner
+        # User whose systemd manager runs the units, None for the current one
+        self.user = user
+        self._manifest_updates = {}
         
     def _expand_path(self, path):
         """Expand user and environment variables in path."""
         return os.path.expanduser(os.path.expandvars(path))
     
+    @contextmanager
+    def _as_owner(self):
+        """Run the file operations of the block with the uid and gid of the owner.
+        
+        The directories of another user are under its control, so a privileged
+        process would follow the symlinks it placed there. Nested blocks and
+        unprivileged processes run unchanged.
+        """
+        if self.owner is None or os.geteuid() != 0:
+            yield
+            return
+        groups, egid = os.getgroups(), os.getegid()
+        os.setgroups([self.owner[1]])
+        os.setegid(self.owner[1])
+        os.seteuid(self.owner[0])
+        try:
+            yield
+        finally:
+            os.seteuid(0)
+            os.setegid(egid)
+            os.setgroups(groups)
+    
     def _ensure_directory(self, path):
         """Ensure directory exists."""
         expanded_path = self._expand_path(path)
-        if not os.path.exists(expanded_path):
+        with self._as_owner():
+            if os.path.exists(expanded_path):
+                return False
             if not self.check_mode:
                 os.makedirs(expanded_path, mode=0o750)
-            return True
-        return False
+        return True
     
     def _read_file(self, path):
         """Read file contents."""
         try:
-            with open(path, 'r') as f:
+            with self._as_owner(), open(path, 'r') as f:
                 return f.read()
         except IOError as e:
             return None
@@ -45,218 +1101,921 @@ class PodmanQuadletBase:
         """Write content to file."""
         if self.check_mode:
             return True
-            
-        # Write to temp file first
-        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
-        try:
-            with os.fdopen(temp_fd, 'w') as f:
-                f.write(content)
-            
-            # Set permissions
-            os.chmod(temp_path, mode)
-            
-            # Move to final location
-            os.rename(temp_path, path)
-            return True
-        except Exception as e:
-            # Clean up temp file on error
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-            raise
+        
+        with self._as_owner():
+            # Write to temp file first
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(temp_fd, 'w') as f:
+                    f.write(content)
+                    # Set permissions on the file itself, never through its path
+                    os.fchmod(f.fileno(), mode)
+                
+                # Move to final location
+                os.rename(temp_path, path)
+                return True
+            except Exception as e:
+                # Clean up temp file on error
+                if os.path.lexists(temp_path):
+                    os.unlink(temp_path)
+                raise
     
     def _file_exists(self, path):
         """Check if file exists."""
-        return os.path.exists(self._expand_path(path))
+        with self._as_owner():
+            return os.path.exists(self._expand_path(path))
     
     def _remove_file(self, path):
         """Remove file if it exists."""
         expanded_path = self._expand_path(path)
-        if os.path.exists(expanded_path):
+        with self._as_owner():
+            if not os.path.lexists(expanded_path):
+                return False
             if not self.check_mode:
                 os.unlink(expanded_path)
-            return True
+        return True
+    
+    def load_manifest(self, path):
+        """Load a quadlet manifest, returning an empty one if missing or invalid."""
+        content = self._read_file(path)
+        try:
+            manifest = json.loads(content) if content else {}
+        except ValueError:
+            manifest = {}
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('units', {}), dict):
+            manifest = {}
+        manifest.setdefault('units', {})
+        return manifest
+    
+    def save_manifest(self, path, manifest):
+        """Write a quadlet manifest atomically."""
+        return self._write_file(path, json.dumps(manifest, indent=2, sort_keys=True) + '\n',
+                                mode=0o600)
+    
+    def _record_manifest_unit(self, quadlet_dir, unit_file, content_hash):
+        """Queue a unit for the manifest of the module's project, None to drop it."""
+        project = self.params.get('project')
+        if project:
+            path = quadlet_manifest_path(quadlet_dir, project)
+            self._manifest_updates.setdefault(path, {})[unit_file] = content_hash
+    
+    def flush_manifests(self):
+        """Write the queued manifest updates, once per manifest."""
+        for path, updates in self._manifest_updates.items():
+            manifest = self.load_manifest(path)
+            units = dict(manifest['units'])
+            for unit_file, content_hash in updates.items():
+                if content_hash is None:
+                    units.pop(unit_file, None)
+                else:
+                    units[unit_file] = content_hash
+            if units != manifest['units'] and os.path.isdir(os.path.dirname(path)):
+                manifest['units'] = units
+                self.save_manifest(path, manifest)
+        self._manifest_updates = {}
+    
+    def _stop_services(self, quadlet_dir, services):
+        """Stop services with a single systemctl call, warning on failure."""
+        if not services or self.check_mode:
+            return
+        rc, stdout, stderr = self.module.run_command(
+            quadlet_systemctl_command(quadlet_dir, self.user) + ['stop'] + services, check_rc=False)
+        if rc != 0:
+            self.module.warn(f"Failed to stop {', '.join(services)}: {stderr.strip()}")
+    
+    def _run_systemctl(self, quadlet_dir, args):
+        """Run a systemctl command, failing the module on error."""
+        cmd = quadlet_systemctl_command(quadlet_dir, self.user) + args
+        rc, stdout, stderr = self.module.run_command(cmd, check_rc=False)
+        if rc != 0:
+            self.module.fail_json(msg=f"Failed to run {' '.join(cmd)}: {stderr.strip()}")
+        return stdout
+    
+    def service_states(self, quadlet_dir, services):
+        """Return the ActiveState of services with a single systemctl call."""
+        if not services:
+            return {}
+        stdout = self._run_systemctl(quadlet_dir, ['show', '--property=ActiveState'] + services)
+        properties = parse_systemctl_show(stdout, services)
+        return dict((service, properties.get(service, {}).get('ActiveState', 'unknown'))
+                    for service in services)
+    
+    def apply_service_states(self, quadlet_dir, wanted, reload=False, recreate=()):
+        """Bring services to their wanted state, started or stopped.
+        
+        systemd is reloaded at most once, then everything to start or restart
+        goes through one systemctl restart call and everything to stop through
+        one systemctl stop call. Returns the actions taken and the resulting
+        active state of every service.
+        """
+        result = {'reloaded': False, 'restarted_services': [], 'stopped_services': [],
+                  'active_states': {}}
+        if reload and not self.check_mode:
+            self._run_systemctl(quadlet_dir, ['daemon-reload'])
+            result['reloaded'] = True
+        
+        services = list(wanted)
+        states = self.service_states(quadlet_dir, services)
+        running = ('active', 'activating', 'reloading')
+        # restart also starts inactive units, so one call covers both
+        restart = [service for service in services if wanted[service] == 'started'
+                   and (states[service] not in running or service in recreate)]
+        stop = [service for service in services
+                if wanted[service] == 'stopped' and states[service] in running]
+        
+        if self.check_mode:
+            states.update((service, 'active') for service in restart)
+            states.update((service, 'inactive') for service in stop)
+        else:
+            if stop:
+                self._run_systemctl(quadlet_dir, ['stop'] + stop)
+            if restart:
+                self._run_systemctl(quadlet_dir, ['restart'] + restart)
+            if stop or restart:
+                states = self.service_states(quadlet_dir, services)
+        
+        result['restarted_services'] = restart
+        result['stopped_services'] = stop
+        result['active_states'] = states
+        return result
+    
+    def _list_instances(self, quadlet_dir, name, quadlet_type='container'):
+        """Return the instances linked to the template quadlet of a unit."""
+        prefix, suffix = f"{name}@", f".{quadlet_type}"
+        instances = []
+        try:
+            with self._as_owner():
+                entries = list(os.scandir(quadlet_dir))
+        except OSError:
+            return instances
+        for entry in entries:
+            if entry.name.startswith(prefix) and entry.name.endswith(suffix) and entry.is_symlink():
+                instance = entry.name[len(prefix):-len(suffix)]
+                if instance:
+                    instances.append(instance)
+        return sorted(instances)
+    
+    def manage_instances(self, quadlet_dir, name, instances, quadlet_type='container'):
+        """Link the wanted instances of a template quadlet and unlink the others.
+        
+        Instances are symlinks to the template, so scaling never re-renders it.
+        Returns the added and removed instances.
+        """
+        template = f"{name}@.{quadlet_type}"
+        current = self._list_instances(quadlet_dir, name, quadlet_type)
+        added = [instance for instance in instances if instance not in current]
+        removed = [instance for instance in current if instance not in instances]
+        
+        self._stop_services(quadlet_dir, [quadlet_service_name(f"{name}@{instance}", quadlet_type)
+                                          for instance in removed])
+        if not self.check_mode:
+            try:
+                with self._as_owner():
+                    for instance in removed:
+                        os.unlink(os.path.join(quadlet_dir, f"{name}@{instance}.{quadlet_type}"))
+                    for instance in added:
+                        os.symlink(template,
+                                   os.path.join(quadlet_dir, f"{name}@{instance}.{quadlet_type}"))
+            except OSError as e:
+                self.module.fail_json(
+                    msg=f"Failed to update the instances of {template}: {to_native(e)}")
+        
+        return added, removed
+    
+    def manage_socket_units(self, quadlet_dir, name, units, unit_dir=None):
+        """Write the socket units of a container and enable its socket, or remove them.
+        
+        units maps file names to content, as returned by socket_activation_units(),
+        and an empty mapping removes the units this collection wrote before.
+        Returns whether anything changed.
+        """
+        unit_dir = self._expand_path(unit_dir or systemd_unit_dir(quadlet_dir))
+        changed = False
+        
+        stale = []
+        for filename in (f"{name}.socket", f"{name}-proxy.service"):
+            path = os.path.join(unit_dir, filename)
+            current = self._read_file(path)
+            if filename in units:
+                if current != units[filename]:
+                    self._ensure_directory(unit_dir)
+                    self._write_file(path, units[filename], mode=0o644)
+                    changed = True
+            elif current is not None and current.startswith(MANAGED_UNIT_HEADER):
+                stale.append(path)
+        
+        if stale:
+            self._stop_services(quadlet_dir, [os.path.basename(path) for path in stale])
+            for path in stale:
+                self._remove_file(path)
+            changed = True
+        
+        if self._enable_socket(unit_dir, name, bool(units)):
+            changed = True
+        
+        return changed
+    
+    def _enable_socket(self, unit_dir, name, enabled):
+        """Link the socket of a container into sockets.target, or remove its link.
+        
+        This is what systemctl enable would do, without needing the unit to be
+        loaded. Returns whether anything changed.
+        """
+        socket_file = os.path.join(unit_dir, f"{name}.socket")
+        link = os.path.join(unit_dir, 'sockets.target.wants', f"{name}.socket")
+        try:
+            with self._as_owner():
+                if enabled and not os.path.islink(link):
+                    self._ensure_directory(os.path.dirname(link))
+                    if not self.check_mode:
+                        os.symlink(socket_file, link)
+                    return True
+                if not enabled and os.path.islink(link) and os.readlink(link) == socket_file:
+                    return self._remove_file(link)
+        except OSError as e:
+            self.module.fail_json(msg=f"Failed to enable {name}.socket: {to_native(e)}")
         return False
     
+    def _manifest_orphans(self, quadlet_dir, keep):
+        """List the unit files of the project manifest that are not in keep."""
+        manifest = self.load_manifest(quadlet_manifest_path(quadlet_dir, self.params['project']))
+        orphans = []
+        for unit_file in sorted(manifest['units']):
+            if unit_file in keep:
+                continue
+            if not is_quadlet_unit_file(unit_file):
+                # Never follow a path from the manifest, it may have been edited
+                self.module.warn(f"Dropping '{unit_file}' from the manifest of project "
+                                 f"{self.params['project']}, it is not a quadlet unit file")
+                self._record_manifest_unit(quadlet_dir, unit_file, None)
+                continue
+            orphans.append(unit_file)
+        return orphans
+    
+    def prune_quadlets(self, keep):
+        """Stop and remove the units of the project manifest that are not in keep."""
+        quadlet_dir = self._expand_path(
+            self.params.get('quadlet_dir', '~/.config/containers/systemd'))
+        orphans = self._manifest_orphans(quadlet_dir, keep)
+        services = []
+        unit_files = []
+        for unit_file in orphans:
+            unit_name, quadlet_type = unit_file.rsplit('.', 1)
+            if unit_name.endswith('@'):
+                # The instances of a template go away with it
+                for instance in self._list_instances(quadlet_dir, unit_name[:-1], quadlet_type):
+                    services.append(quadlet_service_name(f"{unit_name}{instance}", quadlet_type))
+                    unit_files.append(f"{unit_name}{instance}.{quadlet_type}")
+            else:
+                services.append(quadlet_service_name(unit_name, quadlet_type))
+            unit_files.append(unit_file)
+        self._stop_services(quadlet_dir, services)
+        
+        for unit_file in unit_files:
+            self._remove_file(os.path.join(quadlet_dir, unit_file))
+        for unit_file in orphans:
+            unit_name, quadlet_type = unit_file.rsplit('.', 1)
+            if quadlet_type == 'container' and not unit_name.endswith('@'):
+                self.manage_socket_units(quadlet_dir, unit_name, {})
+        for unit_file in orphans:
+            self._record_manifest_unit(quadlet_dir, unit_file, None)
+        
+        return orphans
+    
+    def deploy_stack(self):
+        """Write the units of a stack, prune orphans and record the manifest.
+        
+        Returns the per-unit results and the wanted state of the services of
+        the units with state started or stopped.
+        """
+        result = {
+            'changed': False,
+            'containers': [],
+            'networks': [],
+            'volumes': [],
+            'images': [],
+            'pods': [],
+            'changed_units': [],
+            'changed_services': [],
+            'pruned_units': [],
+        }
+        keep = set(self.params.get('keep_units') or [])
+        wanted = {}
+        
+        for option, quadlet_type, build_config in STACK_UNITS:
+            for unit in self.params[option]:
+                unit_result = self.manage_quadlet(
+                    name=unit['name'],
+                    state=unit['state'],
+                    config=build_config(unit),
+                    quadlet_type=quadlet_type
+                )
+                unit_result['name'] = unit['name']
+                result[option].append(unit_result)
+                unit_file = os.path.basename(unit_result['quadlet_file'])
+                keep.add(unit_file)
+                if unit['state'] in ('started', 'stopped'):
+                    wanted.update(quadlet_wanted_states(unit_result, unit['state']))
+                
+                if unit_result['changed']:
+                    result['changed'] = True
+                    result['changed_units'].append(unit_file)
+                    result['changed_services'].extend(unit_result['changed_services'])
+        
+        if self.params.get('prune'):
+            result['pruned_units'] = self.prune_quadlets(keep)
+            if result['pruned_units']:
+                result['changed'] = True
+        
+        # Record the content hashes so the action plugin can skip unchanged hosts
+        self.flush_manifests()
+        
+        return result, wanted
+    
     def generate_quadlet_content(self, config, quadlet_type='container'):
         """Generate quadlet file content."""
-        lines = ['[Unit]']
+        unit = []
         
         if 'service_description' in config:
-            lines.append(f"Description={config['service_description']}")
-        
-        if 'required_services' in config and config['required_services']:
-            lines.append(f"Requires={config['required_services']}")
+            unit.append(('Description', config['service_description']))
         
-        if 'after_services' in config and config['after_services']:
-            lines.append(f"After={config['after_services']}")
-        
-        lines.append('')
-        lines.append(f'[{quadlet_type.capitalize()}]')
+        # Dependencies may be given as a list or a space-separated string
+        for key, option in (('Requires', 'required_services'), ('After', 'after_services')):
+            services = config.get(option) or []
+            if isinstance(services, str):
+                services = services.split()
+            unit.extend((key, service) for service in services)
         
         # Add type-specific configuration
+        generate = {
+            'container': self._generate_container_config,
+            'network': self._generate_network_config,
+            'volume': self._generate_volume_config,
+            'image': self._generate_image_config,
+            'pod': self._generate_pod_config,
+        }.get(quadlet_type)
+        entries = generate(config) if generate else []
+        
+        # Image units are oneshot pulls, which systemd does not restart
+        service = [] if quadlet_type == 'image' else [('Restart', 'always')]
+        install = [('WantedBy', 'default.target')]
         if quadlet_type == 'container':
-            lines.extend(self._generate_container_config(config))
-        elif quadlet_type == 'network':
-            lines.extend(self._generate_network_config(config))
-        elif quadlet_type == 'volume':
-            lines.extend(self._generate_volume_config(config))
+            service_unit, service_container, service = container_service_entries(config)
+            unit.extend(service_unit)
+            entries.extend(service_container)
+            service.extend(container_resource_entries(config.get('resources'))[1])
+            
+            # A socket-activated container is started by its socket, never at boot
+            if config.get('socket_activation'):
+                socket_unit, service = socket_activated_entries(config, service)
+                unit.extend(socket_unit)
+                install = []
         
-        lines.append('')
-        lines.append('[Service]')
-        lines.append('Restart=always')
-        lines.append('')
-        lines.append('[Install]')
-        lines.append('WantedBy=default.target')
+        sections = [
+            ('Unit', unit),
+            (quadlet_type.capitalize(), entries),
+            ('Service', service),
+            ('Install', install),
+        ]
+        sections = [(section, entries) for section, entries in sections
+                    if entries or section not in ('Service', 'Install')]
         
-        return '\n'.join(lines)
+        return serialize_quadlet(apply_quadlet_capabilities(sections, self.capabilities,
+                                                            quadlet_type))
     
     def _generate_container_config(self, config):
         """Generate container-specific configuration."""
-        lines = []
+        entries = []
         
         if 'container_image' in config:
-            lines.append(f"Image={config['container_image']}")
+            entries.append(('Image', config['container_image']))
         
         if 'container_name' in config:
-            lines.append(f"ContainerName={config['container_name']}")
-        
-        # Environment variables
-        if 'environment_variables' in config and config['environment_variables']:
-            for key, value in config['environment_variables'].items():
-                lines.append(f"Environment={key}={value}")
-        
-        # Volumes
-        if 'volumes' in config and config['volumes']:
-            for volume in config['volumes']:
-                lines.append(f"Volume={volume['host_path']}:{volume['container_path']}")
+            entries.append(('ContainerName', config['container_name']))
         
-        # Networks
-        if 'networks' in config and config['networks']:
-            for network in config['networks']:
-                lines.append(f"Network={network}")
+        entries.extend(('Environment', f"{key}={_format_quadlet_value(value)}")
+                       for key, value in (config.get('environment_variables') or {}).items())
+        entries.extend(('Volume', f"{volume['host_path']}:{volume['container_path']}")
+                       for volume in config.get('volumes') or [])
+        entries.extend(('Label', f"{key}={_format_quadlet_value(value)}")
+                       for key, value in (config.get('labels') or {}).items())
+        entries.extend(('Secret', f"{key},type=env,target={value}")
+                       for key, value in (config.get('secrets') or {}).items())
         
-        # Ports
-        if 'ports' in config and config['ports']:
-            for port in config['ports']:
-                lines.append(f"PublishPort={port['host_port']}:{port['container_port']}")
-        
-        # Labels
-        if 'labels' in config and config['labels']:
-            for key, value in config['labels'].items():
-                lines.append(f"Label={key}={value}")
-        
-        # Secrets
-        if 'secrets' in config and config['secrets']:
-            for key, value in config['secrets'].items():
-                lines.append(f"Secret={key},type=env,target={value}")
-        
-        # Auto update
         if 'auto_update' in config:
-            lines.append(f"AutoUpdate={config['auto_update']}")
+            entries.append(('AutoUpdate', config['auto_update']))
         
-        return lines
+        entries.extend(container_pod_entries(config))
+        entries.extend(container_networking_entries(config))
+        entries.extend(container_security_entries(config))
+        entries.extend(container_healthcheck_entries(config))
+        entries.extend(container_resource_entries(config.get('resources'))[0])
+        entries.extend(container_custom_entries(config.get('custom_options')))
+        
+        return entries
     
     def _generate_network_config(self, config):
         """Generate network-specific configuration."""
-        lines = []
+        entries = []
         
         if 'driver' in config:
-            lines.append(f"Driver={config['driver']}")
+            entries.append(('Driver', config['driver']))
         
         if 'subnet' in config:
-            lines.append(f"Subnet={config['subnet']}")
+            entries.append(('Subnet', config['subnet']))
         
         if 'gateway' in config:
-            lines.append(f"Gateway={config['gateway']}")
+            entries.append(('Gateway', config['gateway']))
         
         if 'ip_range' in config:
-            lines.append(f"IPRange={config['ip_range']}")
+            entries.append(('IPRange', config['ip_range']))
         
         if 'ipv6' in config and config['ipv6']:
-            lines.append("IPv6=true")
+            entries.append(('IPv6', True))
         
         if 'internal' in config and config['internal']:
-            lines.append("Internal=true")
+            entries.append(('Internal', True))
         
         if 'disable_dns' in config and config['disable_dns']:
-            lines.append("DisableDNS=true")
+            entries.append(('DisableDNS', True))
         
         if 'options' in config:
             for key, value in config['options'].items():
-                lines.append(f"Options={key}={value}")
+                entries.append(('Options', f"{key}={_format_quadlet_value(value)}"))
         
         if 'labels' in config and config['labels']:
             for key, value in config['labels'].items():
-                lines.append(f"Label={key}={value}")
+                entries.append(('Label', f"{key}={_format_quadlet_value(value)}"))
         
-        return lines
+        return entries
 
-    
     def _generate_volume_config(self, config):
         """Generate volume-specific configuration."""
-        lines = []
+        entries = []
         
         if 'driver' in config:
-            lines.append(f"Driver={config['driver']}")
+            entries.append(('Driver', config['driver']))
         
         if 'device' in config:
-            lines.append(f"Device={config['device']}")
+            entries.append(('Device', config['device']))
         
         if 'type' in config:
-            lines.append(f"Type={config['type']}")
+            entries.append(('Type', config['type']))
         
         if 'mount_options' in config:
-            lines.append(f"Options={config['mount_options']}")
+            entries.append(('Options', config['mount_options']))
         
         if 'copy' in config and not config['copy']:
-            lines.append("Copy=false")
+            entries.append(('Copy', False))
         
         if 'labels' in config and config['labels']:
             for key, value in config['labels'].items():
-                lines.append(f"Label={key}={value}")
+                entries.append(('Label', f"{key}={_format_quadlet_value(value)}"))
         
         if 'options' in config:
-            for key, value in config['options'].items():
-                lines.append(f"Options={key}={value}")
+            for key, value in sorted(config['options'].items()):
+                entries.append(('Options', f"{key}={_format_quadlet_value(value)}"))
+        
+        return entries
+    
+    def _generate_image_config(self, config):
+        """Generate image-specific configuration."""
+        entries = [('Image', config['image'])]
+        
+        for key, option in (('Arch', 'arch'), ('OS', 'os'), ('Variant', 'variant'),
+                            ('AuthFile', 'auth_file'), ('TLSVerify', 'tls_verify')):
+            if config.get(option) is not None:
+                entries.append((key, config[option]))
+        
+        # Pull settings without a quadlet key are passed to podman image pull
+        if config.get('pull_policy'):
+            entries.append(('PodmanArgs', f"--policy={config['pull_policy']}"))
+        if config.get('retry') is not None:
+            entries.append(('PodmanArgs', f"--retry={config['retry']}"))
+        if config.get('retry_delay'):
+            if not DURATION_RE.match(config['retry_delay']):
+                raise ValueError(f"retry_delay '{config['retry_delay']}' is not a valid duration")
+            entries.append(('PodmanArgs', f"--retry-delay={config['retry_delay']}"))
+        
+        return entries
+    
+    def _generate_pod_config(self, config):
+        """Generate pod-specific configuration."""
+        entries = [('PodName', config['pod_name'])]
         
-        return lines
+        for network in config.get('networks') or []:
+            entries.append(('Network', network))
+        
+        for port in config.get('ports') or []:
+            entries.append(('PublishPort', publish_port(port)))
+        
+        for volume in config.get('volumes') or []:
+            entries.append(('Volume', f"{volume['host_path']}:{volume['container_path']}"))
+        
+        if config.get('userns'):
+            entries.append(('UserNS', config['userns']))
+        
+        return entries
+    
+    def _remove_quadlet(self, quadlet_dir, name, quadlet_file, quadlet_type, instances, result):
+        """Remove a quadlet file and the instance links of a template."""
+        self._record_manifest_unit(quadlet_dir, os.path.basename(quadlet_file), None)
+        if instances is not None:
+            result['removed_instances'] = self.manage_instances(quadlet_dir, name, [],
+                                                                quadlet_type)[1]
+            if result['removed_instances']:
+                result['changed'] = True
+        if self._remove_file(quadlet_file):
+            result['changed'] = True
+            result['change_class'] = 'recreate'
+            result['msg'] = f"Removed quadlet file {quadlet_file}"
+        else:
+            result['msg'] = f"Quadlet file {quadlet_file} does not exist"
+    
+    def _write_quadlet(self, quadlet_file, new_content, quadlet_type, result):
+        """Write a quadlet file whose meaning changed."""
+        # Compare the meaning of the current file, so that reordered keys do
+        # not cause a rewrite
+        change_class = classify_quadlet_change(self._read_file(quadlet_file), new_content)
+        if change_class == 'none':
+            result['msg'] = f"Quadlet file {quadlet_file} is up to date"
+            return
+        if not self._write_file(quadlet_file, new_content):
+            return
+        result['changed'] = True
+        result['change_class'] = change_class
+        result['msg'] = f"Created/Updated quadlet file {quadlet_file}"
+        # Networks and volumes are oneshot units whose resources are not
+        # recreated on restart, so only containers, pods and kube units need one
+        if quadlet_type in ('container', 'pod', 'kube') and change_class == 'recreate':
+            result['changed_services'].extend(result['services'])
+    
+    def _sync_socket_units(self, quadlet_dir, name, socket_activation, socket_units, result):
+        """Write or remove the socket units of a container."""
+        if socket_units:
+            result['socket_unit'] = f"{name}.socket"
+        if not self.manage_socket_units(quadlet_dir, name, socket_units,
+                                        socket_activation.get('unit_dir')):
+            return
+        result['changed'] = True
+        if socket_units:
+            # The socket listens on the new addresses once restarted
+            result['changed_services'].append(result['socket_unit'])
     
     def manage_quadlet(self, name, state, config, quadlet_type='container'):
         """Manage a quadlet file."""
-        quadlet_dir = self._expand_path(self.module.params.get('quadlet_dir', '~/.config/containers/systemd'))
-        quadlet_file = os.path.join(quadlet_dir, f"{name}.{quadlet_type}")
+        quadlet_dir = self._expand_path(self.params.get('quadlet_dir',
+                                                        '~/.config/containers/systemd'))
+        instances = config.get('instances')
+        unit_name = quadlet_unit_name(name, config)
+        quadlet_file = os.path.join(quadlet_dir, f"{unit_name}.{quadlet_type}")
+        service_name = quadlet_service_name(unit_name, quadlet_type)
         
         result = {
             'changed': False,
             'quadlet_file': quadlet_file,
-            'service_name': f"{name}.service"
+            'service_name': service_name,
+            'services': [],
+            'change_class': 'none',
+            'changed_services': []
         }
         
         # Ensure directory exists
         if self._ensure_directory(quadlet_dir):
             result['changed'] = True
         
+        socket_activation = config.get('socket_activation') or {}
+        socket_units = {}
+        
         if state == 'absent':
-            if self._remove_file(quadlet_file):
-                result['changed'] = True
-                result['msg'] = f"Removed quadlet file {quadlet_file}"
+            self._remove_quadlet(quadlet_dir, name, quadlet_file, quadlet_type, instances, result)
         else:
             # Generate new content
-            new_content = self.generate_quadlet_content(config, quadlet_type)
+            try:
+                new_content = self.generate_quadlet_content(config, quadlet_type)
+                if socket_activation:
+                    socket_units = socket_activation_units(name, socket_activation)
+            except ValueError as e:
+                self.module.fail_json(msg=f"Invalid configuration for {unit_name}.{quadlet_type}: "
+                                          f"{to_native(e)}")
+            result['content_hash'] = quadlet_content_hash(new_content, instances, socket_units)
+            self._record_manifest_unit(quadlet_dir, os.path.basename(quadlet_file),
+                                       result['content_hash'])
             
-            # Check if file exists and compare content
-            current_content = self._read_file(quadlet_file)
-            
-            if current_content != new_content:
-                if self._write_file(quadlet_file, new_content):
-                    result['changed'] = True
-                    result['msg'] = f"Created/Updated quadlet file {quadlet_file}"
-            else:
-                result['msg'] = f"Quadlet file {quadlet_file} is up to date"
+            result['services'] = [service_name] if instances is None else [
+                quadlet_service_name(f"{unit_name}{instance}", quadlet_type)
+                for instance in instances]
+            self._write_quadlet(quadlet_file, new_content, quadlet_type, result)
+        
+        # Socket units go along with the container and are removed when it no
+        # longer uses socket activation
+        if quadlet_type == 'container' and instances is None:
+            self._sync_socket_units(quadlet_dir, name, socket_activation, socket_units, result)
+        
+        # Scaling only adds or removes links to the template
+        if state != 'absent' and instances is not None:
+            result['instances'] = instances
+            result['added_instances'], result['removed_instances'] = self.manage_instances(
+                quadlet_dir, name, instances, quadlet_type)
+            if result['added_instances'] or result['removed_instances']:
+                result['changed'] = True
         
         return result
 
 
+def build_container_config(params):
+    """Build the quadlet configuration of a container from module parameters."""
+    config = {
+        'name': params['name'] + '.container',
+        'service_description': f"{params['name']} Container",
+        'container_image': container_image(params),
+        'container_name': params['name'],
+        'environment_variables': params['environment'],
+        'volumes': params['volumes'],
+        'networks': params['networks'],
+        'labels': params['labels'],
+        'ports': params['ports'],
+        'secrets': params['secrets'],
+        'auto_update': params['auto_update'],
+        'security_label_disable': params.get('security_label_disable'),
+        'no_new_privileges': params.get('no_new_privileges'),
+        'custom_options': params.get('custom_options') or {},
+        'resources': params.get('resources') or {},
+        'restart_policy': params.get('restart_policy'),
+        'restart_sec': params.get('restart_sec'),
+        'start_limit_burst': params.get('start_limit_burst'),
+        'start_limit_interval_sec': params.get('start_limit_interval_sec'),
+        'timeout_start_sec': params.get('timeout_start_sec'),
+        'timeout_stop_sec': params.get('timeout_stop_sec'),
+        'stop_timeout': params.get('stop_timeout'),
+        'stop_signal': params.get('stop_signal'),
+        'healthcheck': params.get('healthcheck') or {},
+        'notify': params.get('notify'),
+        'socket_activation': params.get('socket_activation'),
+        'pod': container_pod(params),
+        'network_mode': params.get('network_mode'),
+        'pasta_options': params.get('pasta_options') or [],
+        'slirp4netns': params.get('slirp4netns') or {},
+    }
+    
+    dependencies = container_dependencies(params)
+    if dependencies:
+        config['required_services'] = dependencies
+        config['after_services'] = dependencies
+    
+    instances = container_instances(params)
+    if instances is not None:
+        config['service_description'] = f"{params['name']} Container %i"
+        config['container_name'] = f"{params['name']}-%i"
+        config['instances'] = instances
+    
+    return config
+
+
+def build_pod_config(params):
+    """Build the quadlet configuration of a pod from module parameters."""
+    config = {
+        'name': params['name'] + '.pod',
+        'service_description': f"{params['name']} Pod",
+        'pod_name': params['name'],
+        'networks': params['networks'],
+        'ports': params['ports'],
+        'volumes': params['volumes'],
+        'userns': params.get('userns'),
+    }
+    
+    dependencies = container_dependencies(params)
+    if dependencies:
+        config['required_services'] = dependencies
+        config['after_services'] = dependencies
+    
+    return config
+
+
+def build_image_config(params):
+    """Build the quadlet configuration of an image from module parameters."""
+    return {
+        'name': params['name'] + '.image',
+        'service_description': f"{params['name']} Image",
+        'image': params['image'],
+        'pull_policy': params.get('pull_policy'),
+        'retry': params.get('retry'),
+        'retry_delay': params.get('retry_delay'),
+        'arch': params.get('arch'),
+        'os': params.get('os'),
+        'variant': params.get('variant'),
+        'auth_file': params.get('auth_file'),
+        'tls_verify': params.get('tls_verify'),
+    }
+
+
+def build_network_config(params):
+    """Build the quadlet configuration of a network from module parameters."""
+    config = {
+        'name': params['name'] + '.network',
+        'service_description': f"{params['name']} Network",
+        'driver': params['driver'],
+        'labels': params['labels'],
+        'options': params['options'],
+    }
+
+    # Add optional network parameters
+    if params.get('subnet'):
+        config['subnet'] = params['subnet']
+    if params.get('gateway'):
+        config['gateway'] = params['gateway']
+    if params.get('ip_range'):
+        config['ip_range'] = params['ip_range']
+    if params.get('ipv6'):
+        config['ipv6'] = params['ipv6']
+    if params.get('internal'):
+        config['internal'] = params['internal']
+    if not params.get('dns_enabled', True):
+        config['disable_dns'] = True
+
+    return config
+
+
+def build_volume_config(params):
+    """Build the quadlet configuration of a volume from module parameters."""
+    config = {
+        'name': params['name'] + '.volume',
+        'service_description': f"{params['name']} Volume",
+        'driver': params['driver'],
+        'labels': params['labels'],
+        'options': params['options'],
+        'copy': params['copy'],
+    }
+
+    # Add optional volume parameters
+    if params.get('device'):
+        config['device'] = params['device']
+    if params.get('type'):
+        config['type'] = params['type']
+    if params.get('mount_options'):
+        config['mount_options'] = params['mount_options']
+
+    return config
+
+
+STACK_CONTAINER_OPTIONS = dict(
+    name=dict(type='str', required=True),
+    state=dict(type='str', default='present', choices=['present', 'absent', 'started', 'stopped']),
+    image=dict(type='str'),
+    image_unit=dict(type='str'),
+    environment=dict(type='dict', default={}),
+    volumes=dict(type='list', elements='dict', default=[]),
+    networks=dict(type='list', elements='str', default=[]),
+    labels=dict(type='dict', default={}),
+    ports=dict(type='list', elements='dict', default=[]),
+    secrets=dict(type='dict', default={}),
+    auto_update=dict(type='str', default='registry', choices=['registry', 'local', 'disabled']),
+    restart_policy=dict(type='str', default='always',
+                        choices=['always', 'on-failure', 'unless-stopped', 'no']),
+    restart_sec=dict(type='str'),
+    start_limit_burst=dict(type='int'),
+    start_limit_interval_sec=dict(type='str'),
+    timeout_start_sec=dict(type='str'),
+    timeout_stop_sec=dict(type='str'),
+    stop_timeout=dict(type='int'),
+    stop_signal=dict(type='str'),
+    security_label_disable=dict(type='bool'),
+    no_new_privileges=dict(type='bool'),
+    custom_options=dict(type='dict', default={}),
+    replicas=dict(type='int'),
+    instances=dict(type='list', elements='str'),
+    instance_base=dict(type='int', default=1),
+    resources=dict(type='dict', options=CONTAINER_RESOURCE_OPTIONS),
+    depends_on=dict(type='list', elements='str', default=[]),
+    healthcheck=dict(type='dict', options=CONTAINER_HEALTHCHECK_OPTIONS),
+    notify=dict(type='str', choices=['conmon', 'container', 'healthy']),
+    socket_activation=dict(type='dict', options=CONTAINER_SOCKET_OPTIONS),
+    pod=dict(type='str'),
+    network_mode=dict(type='str'),
+    pasta_options=dict(type='list', elements='str', default=[]),
+    slirp4netns=dict(type='dict', options=CONTAINER_SLIRP4NETNS_OPTIONS),
+)
+
+STACK_IMAGE_OPTIONS = dict(
+    name=dict(type='str', required=True),
+    state=dict(type='str', default='present', choices=['present', 'absent']),
+    image=dict(type='str'),
+    pull_policy=dict(type='str', choices=['always', 'missing', 'newer', 'never']),
+    retry=dict(type='int'),
+    retry_delay=dict(type='str'),
+    arch=dict(type='str'),
+    os=dict(type='str'),
+    variant=dict(type='str'),
+    auth_file=dict(type='path'),
+    tls_verify=dict(type='bool'),
+)
+
+STACK_NETWORK_OPTIONS = dict(
+    name=dict(type='str', required=True),
+    state=dict(type='str', default='present', choices=['present', 'absent']),
+    driver=dict(type='str', default='bridge', choices=['bridge', 'macvlan', 'ipvlan']),
+    subnet=dict(type='str'),
+    gateway=dict(type='str'),
+    ip_range=dict(type='str'),
+    ipv6=dict(type='bool', default=False),
+    internal=dict(type='bool', default=False),
+    dns_enabled=dict(type='bool', default=True),
+    labels=dict(type='dict', default={}),
+    options=dict(type='dict', default={}),
+)
+
+STACK_POD_OPTIONS = dict(
+    name=dict(type='str', required=True),
+    state=dict(type='str', default='present', choices=['present', 'absent']),
+    networks=dict(type='list', elements='str', default=[]),
+    ports=dict(type='list', elements='dict', default=[]),
+    volumes=dict(type='list', elements='dict', default=[]),
+    userns=dict(type='str'),
+)
+
+STACK_VOLUME_OPTIONS = dict(
+    name=dict(type='str', required=True),
+    state=dict(type='str', default='present', choices=['present', 'absent']),
+    driver=dict(type='str', default='local'),
+    labels=dict(type='dict', default={}),
+    options=dict(type='dict', default={}),
+    copy=dict(type='bool', default=True),
+    device=dict(type='str'),
+    type=dict(type='str'),
+    mount_options=dict(type='str'),
+)
+
+# Order in which the unit types of a stack are reconciled, so that images,
+# networks, volumes and pods exist before the containers referencing them.
+STACK_UNITS = (
+    ('images', 'image', build_image_config),
+    ('networks', 'network', build_network_config),
+    ('volumes', 'volume', build_volume_config),
+    ('pods', 'pod', build_pod_config),
+    ('containers', 'container', build_container_config),
+)
+
+
+def stack_start_waves(params):
+    """Return the start waves of the units a stack keeps running."""
+    units = {}
+    templates = {}
+    for option, quadlet_type, build_config in STACK_UNITS:
+        for unit in params[option]:
+            if unit['state'] in ('absent', 'stopped'):
+                continue
+            config = build_config(unit)
+            unit_name = quadlet_unit_name(unit['name'], config)
+            if config.get('instances') is not None:
+                services = [quadlet_service_name(f"{unit_name}{instance}", quadlet_type)
+                            for instance in config['instances']]
+                templates[quadlet_service_name(unit['name'], quadlet_type)] = unit['name']
+            else:
+                services = [quadlet_service_name(unit_name, quadlet_type)]
+            units[f"{unit_name}.{quadlet_type}"] = (services, config.get('required_services') or [])
+    
+    for unit_file, (services, dependencies) in units.items():
+        for service in dependencies:
+            if service in templates:
+                template = templates[service]
+                raise ValueError(f"{unit_file} depends on the templated container {template}, "
+                                 f"depend on its instances such as {template}@<instance> instead")
+    return quadlet_start_waves(units)
+
+
+def validate_stack(params):
+    """Check a stack before anything is written, returning its start waves."""
+    for option, quadlet_type, build_config in STACK_UNITS:
+        for unit in params[option]:
+            if (unit.get('replicas') or 0) < 0:
+                raise ValueError(f"'replicas' of {unit['name']} cannot be negative")
+            if (unit.get('retry') or 0) < 0:
+                raise ValueError(f"'retry' of {unit['name']} cannot be negative")
+    return stack_start_waves(params)
+
+
+def stack_argument_spec():
+    """Return the argument spec shared by the stack module and action plugin."""
+    return dict(
+        containers=dict(type='list', elements='dict', default=[], options=STACK_CONTAINER_OPTIONS,
+                        required_if=[['state', 'present', ['image', 'image_unit'], True],
+                                     ['state', 'started', ['image', 'image_unit'], True],
+                                     ['state', 'stopped', ['image', 'image_unit'], True]],
+                        mutually_exclusive=[['replicas', 'instances'], ['image', 'image_unit']]),
+        images=dict(type='list', elements='dict', default=[], options=STACK_IMAGE_OPTIONS,
+                    required_if=[['state', 'present', ['image']]]),
+        networks=dict(type='list', elements='dict', default=[], options=STACK_NETWORK_OPTIONS),
+        volumes=dict(type='list', elements='dict', default=[], options=STACK_VOLUME_OPTIONS),
+        pods=dict(type='list', elements='dict', default=[], options=STACK_POD_OPTIONS),
+        quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        project=dict(type='str', default='default'),
+        manifest_check=dict(type='bool', default=True),
+        prune=dict(type='bool', default=False),
+        keep_units=dict(type='list', elements='str', default=[]),
+        capabilities=dict(type='dict'),
+    )
+
+
 def generate_container_quadlet(config):
     """Helper function to generate container quadlet content."""
     base = PodmanQuadletBase(None)
@@ -0,0 +1,337 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_capabilities
+short_description: Detect what the installed Podman and Quadlet generator support
+version_added: "1.1.0"
+description:
+  - Probe the Podman version, rootless mode, cgroup version and network backend with a single
+    C(podman info) call
+  - Probe the unit types and keys supported by the Quadlet generator with a single dry run over
+    one probe file per type and key, so support is detected rather than guessed from version numbers
+  - The result is cached on the host, keyed by the inode and modification time of the podman and
+    quadlet binaries, so the probes only run again after Podman is upgraded
+  - Pass the returned I(capabilities) to the I(capabilities) option of the other modules so they
+    never write keys the generator rejects
+options:
+  quadlet_dir:
+    description:
+      - Directory of the quadlet files, used for the default I(cache_file)
+    type: path
+    default: ~/.config/containers/systemd
+  cache_file:
+    description:
+      - Path of the capability cache
+      - Defaults to C(.podman_quadlets-capabilities.json) inside I(quadlet_dir)
+    type: path
+  executable:
+    description:
+      - Path of the podman executable
+    type: str
+    default: podman
+  generator:
+    description:
+      - Path of the quadlet generator
+      - Searched in the usual libexec directories when not set
+    type: path
+  force:
+    description:
+      - Probe again even if the cache is current
+    type: bool
+    default: false
+notes:
+  - When the generator cannot be found or run, I(unsupported_keys) is empty and the other modules
+    write every key as before
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Detect the podman capabilities
+  community.podman_quadlets.podman_quadlet_capabilities:
+  register: podman_caps
+
+- name: Require Quadlet support
+  ansible.builtin.assert:
+    that:
+      - podman_caps.capabilities.version is version('4.4', '>=')
+
+- name: Deploy a container using only supported keys
+  community.podman_quadlets.podman_quadlet_container:
+    name: web
+    image: docker.io/nginx:latest
+    capabilities: "{{ podman_caps.capabilities }}"
+'''
+
+RETURN = r'''
+capabilities:
+    description: Detected capabilities
+    type: dict
+    returned: always
+    sample:
+      version: 4.9.3
+      rootless: true
+      cgroup_version: v2
+      network_backend: netavark
+      rootless_network_cmd: pasta
+      unit_types: ['container', 'network', 'volume', 'kube', 'image']
+      unsupported_keys:
+        Container: ['Notify=healthy', 'StopSignal']
+      probed: true
+cached:
+    description: Whether the capabilities came from the cache
+    type: bool
+    returned: always
+'''
+
+import json
+import os
+import shutil
+import tempfile
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    QUADLET_SCHEMA,
+    QUADLET_TYPES,
+    quadlet_service_name
+)
+
+CACHE_VERSION = 2
+
+GENERATOR_PATHS = (
+    '/usr/libexec/podman/quadlet',
+    '/usr/lib/podman/quadlet',
+    '/usr/local/libexec/podman/quadlet',
+)
+
+# Minimal content of a unit of every type, the probed key is appended
+PROBE_BASE = {
+    'container': '[Container]\nImage=localhost/probe\n',
+    'network': '[Network]\n',
+    'volume': '[Volume]\n',
+    'image': '[Image]\nImage=localhost/probe\n',
+    'pod': '[Pod]\n',
+    'kube': '[Kube]\nYaml=/dev/null\n',
+}
+
+# Valid sample values of keys whose value the generator checks
+PROBE_VALUES = {
+    'Volume': '/tmp:/probe', 'Mount': 'type=tmpfs,destination=/probe', 'PublishPort': '8080:80',
+    'Environment': 'PROBE=1', 'Label': 'probe=1', 'Annotation': 'probe=1', 'Options': 'probe=1',
+    'Secret': 'probe', 'AutoUpdate': 'registry', 'Notify': 'true', 'Network': 'host',
+    'Pod': 'probe-pod.pod', 'User': '0', 'Group': '0', 'UserNS': 'host', 'Timezone': 'UTC',
+    'HealthCmd': 'true', 'HealthInterval': '30s', 'HealthTimeout': '30s',
+    'HealthStartPeriod': '30s', 'HealthRetries': '3', 'HealthOnFailure': 'none',
+    'StopTimeout': '10', 'StopSignal': 'SIGTERM', 'PidsLimit': '100', 'Subnet': '10.89.250.0/24',
+    'Gateway': '10.89.250.1', 'IPRange': '10.89.250.0/25', 'DNS': '192.0.2.1', 'Driver': 'local',
+    'Device': 'tmpfs', 'Type': 'tmpfs', 'Arch': 'amd64',
+    'OS': 'linux', 'Variant': 'v8', 'AuthFile': '/dev/null', 'DecryptionKey': '/dev/null',
+    'CertDir': '/tmp', 'Creds': 'probe:probe', 'PodmanArgs': '--log-level=info',
+}
+
+# Values that are newer than their key
+PROBE_EXTRA_VALUES = (
+    ('Container', 'Notify', 'healthy'),
+)
+
+
+class PodmanQuadletCapabilities(PodmanQuadletBase):
+    """Probe and cache the capabilities of podman and its quadlet generator."""
+
+    def __init__(self, module):
+        super(PodmanQuadletCapabilities, self).__init__(module)
+        self.quadlet_dir = self._expand_path(module.params['quadlet_dir'])
+        self.cache_file = self._expand_path(
+            module.params['cache_file']
+            or os.path.join(self.quadlet_dir, '.podman_quadlets-capabilities.json'))
+        self.executable = module.get_bin_path(module.params['executable'], required=True)
+        self.generator = module.params['generator'] or next(
+            (path for path in GENERATOR_PATHS if os.access(path, os.X_OK)), None)
+        self.force = module.params['force']
+
+    @staticmethod
+    def _binary_key(path):
+        """Identify a binary by inode and modification time."""
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return {'path': path, 'dev': stat.st_dev, 'ino': stat.st_ino, 'mtime_ns': stat.st_mtime_ns}
+
+    def cache_key(self):
+        """Return the key the cached capabilities must match."""
+        return {
+            'podman': self._binary_key(self.executable),
+            'quadlet': self._binary_key(self.generator),
+            'uid': os.geteuid(),
+        }
+
+    def load_cache(self, key):
+        """Return the cached capabilities if they were probed with the same binaries."""
+        content = self._read_file(self.cache_file)
+        try:
+            cache = json.loads(content) if content else {}
+        except ValueError:
+            return None
+        if cache.get('version') != CACHE_VERSION or cache.get('key') != key:
+            return None
+        return cache.get('capabilities')
+
+    def save_cache(self, key, capabilities):
+        """Write the capability cache, ignoring unwritable locations."""
+        cache = {'version': CACHE_VERSION, 'key': key, 'capabilities': capabilities}
+        if not os.path.isdir(os.path.dirname(self.cache_file)):
+            return
+        try:
+            self._write_file(self.cache_file, json.dumps(cache, sort_keys=True) + '\n', mode=0o600)
+        except (IOError, OSError):
+            pass
+
+    def probe_podman(self):
+        """Read the version and host setup from a single podman info call."""
+        rc, stdout, stderr = self.module.run_command([self.executable, 'info', '--format', 'json'],
+                                                     check_rc=False)
+        if rc != 0:
+            self.module.fail_json(msg=f"Failed to run podman info: {stderr}")
+        try:
+            info = json.loads(stdout)
+        except ValueError as e:
+            self.module.fail_json(msg=f"Failed to parse podman info: {to_native(e)}")
+
+        host = info.get('host') or {}
+        security = host.get('security') or {}
+        rootless_network_cmd = host.get('rootlessNetworkCmd')
+        if not rootless_network_cmd and security.get('rootless'):
+            if (host.get('pasta') or {}).get('executable'):
+                rootless_network_cmd = 'pasta'
+            elif (host.get('slirp4netns') or {}).get('executable'):
+                rootless_network_cmd = 'slirp4netns'
+
+        return {
+            'version': (info.get('version') or {}).get('Version'),
+            'rootless': bool(security.get('rootless')),
+            'cgroup_version': host.get('cgroupVersion'),
+            'cgroup_manager': host.get('cgroupManager'),
+            'network_backend': host.get('networkBackend'),
+            'rootless_network_cmd': rootless_network_cmd,
+        }
+
+    @staticmethod
+    def probe_units():
+        """Return the probe files, each with the unit type, section and key it tests."""
+        units = {}
+        for quadlet_type, base in PROBE_BASE.items():
+            units[f"probe-{quadlet_type}.{quadlet_type}"] = (quadlet_type, None, None, base)
+
+        probes = []
+        for quadlet_type in ('container', 'network', 'volume', 'pod', 'image'):
+            section = quadlet_type.capitalize()
+            for key, kind in QUADLET_SCHEMA[section]:
+                value = 'true' if kind == 'bool' else PROBE_VALUES.get(key, 'probe')
+                if not (quadlet_type in ('container', 'image') and key == 'Image'):
+                    probes.append((quadlet_type, section, key, value))
+        for section, key, value in PROBE_EXTRA_VALUES:
+            probes.append((section.lower(), section, f"{key}={value}", value))
+
+        for index, (quadlet_type, section, key, value) in enumerate(probes):
+            line = f"{key.split('=', 1)[0]}={value}"
+            units[f"probe-{quadlet_type}-{index}.{quadlet_type}"] = (
+                quadlet_type, section, key, f"{PROBE_BASE[quadlet_type]}{line}\n")
+        return units
+
+    def probe_generator(self, rootless):
+        """Find the unit types and keys the generator rejects with a single dry run."""
+        if not self.generator:
+            return None
+
+        units = self.probe_units()
+        probe_dir = tempfile.mkdtemp(prefix='podman-quadlets-probe-')
+        try:
+            for name, (quadlet_type, section, key, content) in units.items():
+                with open(os.path.join(probe_dir, name), 'w') as f:
+                    f.write(content)
+            cmd = [self.generator, '-dryrun'] + (['-user'] if rootless else [])
+            rc, stdout, stderr = self.module.run_command(
+                cmd, environ_update={'QUADLET_UNIT_DIRS': probe_dir}, check_rc=False)
+        finally:
+            shutil.rmtree(probe_dir, ignore_errors=True)
+
+        # Every unit the generator accepted shows up as a ---<service>--- header
+        generated = set(line.strip('-') for line in stdout.splitlines() if line.startswith('---'))
+        if quadlet_service_name('probe-container') not in generated:
+            # Nothing was read from the probe directory, so nothing is known
+            return None
+
+        unit_types = []
+        unsupported = {}
+        for name, (quadlet_type, section, key, content) in units.items():
+            service = quadlet_service_name(name.rsplit('.', 1)[0], quadlet_type)
+            if section is None:
+                if service in generated:
+                    unit_types.append(quadlet_type)
+            elif service not in generated and quadlet_type in unit_types:
+                # Base probes come first, so unit_types is complete here
+                unsupported.setdefault(section, []).append(key)
+
+        return {
+            'unit_types': [quadlet_type for quadlet_type in QUADLET_TYPES
+                           if quadlet_type in unit_types],
+            'unsupported_keys': dict((section, sorted(keys))
+                                     for section, keys in sorted(unsupported.items())),
+        }
+
+    def detect(self):
+        """Main method to return the capabilities, probing only when the cache is stale."""
+        key = self.cache_key()
+        capabilities = None if self.force else self.load_cache(key)
+        if capabilities is not None:
+            return {'changed': False, 'capabilities': capabilities, 'cached': True}
+
+        capabilities = self.probe_podman()
+        generator = self.probe_generator(capabilities['rootless'])
+        if generator is None:
+            capabilities.update(unit_types=list(QUADLET_TYPES), unsupported_keys={}, probed=False)
+        else:
+            capabilities.update(generator, probed=True)
+
+        if not self.check_mode:
+            self.save_cache(key, capabilities)
+
+        return {'changed': False, 'capabilities': capabilities, 'cached': False}
+
+
+def main():
+    argument_spec = dict(
+        quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        cache_file=dict(type='path'),
+        executable=dict(type='str', default='podman'),
+        generator=dict(type='path'),
+        force=dict(type='bool', default=False),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    detector = PodmanQuadletCapabilities(module)
+    result = detector.detect()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -24,17 +24,30 @@ options:
   state:
     description:
       - Desired state of the container
+      - C(present) only manages the quadlet file
+      - C(started) and C(stopped) also reload systemd when the file changed and start, restart
+        or stop the services of the container, with one C(systemctl) call per action
+      - A started container whose quadlet needs a recreate is restarted
     choices: ['present', 'absent', 'started', 'stopped']
     default: present
     type: str
   image:
     description:
       - Container image to use
-    required: true
+      - Required unless I(image_unit) is set or I(state=absent)
+    type: str
+  image_unit:
+    description:
+      - Name of a C(.image) unit managed by M(community.podman_quadlets.podman_quadlet_image)
+        to run instead of I(image)
+      - Written as C(Image=<image_unit>.image), so the container requires the pull of that unit
+        and starts as soon as its image is ready
+      - Mutually exclusive with I(image)
     type: str
   environment:
     description:
       - Environment variables for the container
+      - Values are written literally, a C(%) is escaped and not expanded as a systemd specifier
     type: dict
     default: {}
   volumes:
@@ -57,6 +70,59 @@ options:
     type: list
     elements: str
     default: []
+  network_mode:
+    description:
+      - Network mode of the container, written as C(Network=)
+      - C(bridge), the default, joins I(networks)
+      - C(host) uses the network of the host and C(none) only a loopback interface
+      - C(container:<name>) shares the network namespace of another container, which is added
+        to its dependencies
+      - C(pasta) and C(slirp4netns) select the rootless forwarder, tuned with I(pasta_options)
+        and I(slirp4netns); both keep the client source address, C(slirp4netns) only with
+        I(slirp4netns.port_handler=slirp4netns)
+      - All modes but C(bridge) exclude I(networks), and C(host), C(none) and
+        C(container:<name>) exclude I(ports)
+    type: str
+  pasta_options:
+    description:
+      - Options passed to pasta with I(network_mode=pasta), such as C(--map-gw) or C(-T) and C(8080)
+    type: list
+    elements: str
+    default: []
+  slirp4netns:
+    description:
+      - Options of slirp4netns with I(network_mode=slirp4netns)
+    type: dict
+    suboptions:
+      port_handler:
+        description:
+          - Port forwarder, C(slirp4netns) keeps the client source address, C(rootlesskit) is faster
+        type: str
+        choices: ['rootlesskit', 'slirp4netns']
+      mtu:
+        description: MTU of the tap interface
+        type: int
+      enable_ipv6:
+        description: Enable IPv6
+        type: bool
+      allow_host_loopback:
+        description: Let the container reach the loopback address of the host
+        type: bool
+      cidr:
+        description: Network of the container, such as C(10.0.2.0/24)
+        type: str
+      outbound_addr:
+        description: Host address or interface outgoing traffic is sent from
+        type: str
+  depends_on:
+    description:
+      - Units the container needs, written as C(Requires=) and C(After=)
+      - Elements may be container names such as C(db), quadlet unit files such as C(db.container)
+        or C(cache.volume), or service names
+      - Quadlet networks and volumes listed in I(networks) and I(volumes) are added automatically
+    type: list
+    elements: str
+    default: []
   labels:
     description:
       - Labels to apply to the container
@@ -76,6 +142,15 @@ options:
         description: Port in the container
         type: str
         required: true
+      host_ip:
+        description:
+          - Host address the port is bound to, such as C(127.0.0.1) or C(::1)
+          - All addresses when not set
+        type: str
+      protocol:
+        description: Protocol of the port
+        type: str
+        choices: ['tcp', 'udp', 'sctp']
   secrets:
     description:
       - Secrets to mount in the container
@@ -89,15 +164,250 @@ options:
     default: 'registry'
   restart_policy:
     description:
-      - Restart policy for the container
+      - Restart policy for the container, written as C(Restart=) of the service
+      - C(unless-stopped) is rendered as C(always), systemd does not remember manual stops
+        across reboots
     type: str
     choices: ['always', 'on-failure', 'unless-stopped', 'no']
     default: 'always'
+  restart_sec:
+    description: Time to wait before restarting the service (C(RestartSec=)), such as C(5s)
+    type: str
+  start_limit_burst:
+    description: Number of starts allowed within I(start_limit_interval_sec) (C(StartLimitBurst=))
+    type: int
+  start_limit_interval_sec:
+    description: Interval of the start rate limit (C(StartLimitIntervalSec=)), such as C(5min)
+    type: str
+  timeout_start_sec:
+    description:
+      - Time allowed for the service to start (C(TimeoutStartSec=)), such as C(15min) for
+        large image pulls
+    type: str
+  timeout_stop_sec:
+    description: Time allowed for the service to stop (C(TimeoutStopSec=))
+    type: str
+  stop_timeout:
+    description:
+      - Seconds podman waits after I(stop_signal) before killing the container (C(StopTimeout=))
+      - Keep it below I(timeout_stop_sec)
+    type: int
+  stop_signal:
+    description: Signal sent to stop the container (C(StopSignal=)), such as C(SIGQUIT)
+    type: str
+  healthcheck:
+    description:
+      - Health check of the container
+      - Durations use the podman format, such as C(30s) or C(1m30s)
+    type: dict
+    suboptions:
+      cmd:
+        description: Command run inside the container to check its health (C(HealthCmd=))
+        type: str
+      interval:
+        description: Time between two checks (C(HealthInterval=))
+        type: str
+      timeout:
+        description: Time after which a check is considered failed (C(HealthTimeout=))
+        type: str
+      start_period:
+        description:
+          - Time given to the container to start before failed checks count
+            (C(HealthStartPeriod=))
+        type: str
+      retries:
+        description:
+          - Number of consecutive failures after which the container is unhealthy
+            (C(HealthRetries=))
+        type: int
+      on_failure:
+        description: Action taken when the container becomes unhealthy (C(HealthOnFailure=))
+        type: str
+        choices: ['none', 'kill', 'restart', 'stop']
+  notify:
+    description:
+      - When the service reports itself as started, like C(podman run --sdnotify)
+      - C(conmon) reports it once the container runs, this is the podman default
+      - C(container) lets the application send the notification itself (C(Notify=true))
+      - C(healthy) waits for the first successful health check (C(Notify=healthy)), so
+        C(systemctl start) and units ordered after the container wait until it is ready;
+        requires I(healthcheck.cmd)
+    type: str
+    choices: ['conmon', 'container', 'healthy']
+  pod:
+    description:
+      - Pod the container joins (C(Pod=)), such as C(shop) or C(shop.pod) for a pod of
+        M(community.podman_quadlets.podman_quadlet_pod)
+      - The container shares the network namespace of the pod, so I(ports) and I(networks)
+        must be set on the pod instead
+    type: str
+  socket_activation:
+    description:
+      - Start the container on the first connection through a companion systemd C(.socket) unit,
+        written to I(socket_activation.unit_dir) and enabled in C(sockets.target)
+      - The container is not started at boot and I(state=started) starts the socket instead
+      - A restart policy of C(always) becomes C(on-failure), so an application exiting when idle
+        stays stopped
+      - Cannot be used with I(replicas) or I(instances)
+    type: dict
+    suboptions:
+      listen_stream:
+        description:
+          - Stream addresses the socket listens on, such as C(8080) or C(/run/app.sock)
+            (C(ListenStream=))
+        type: list
+        elements: str
+        default: []
+      listen_datagram:
+        description: Datagram addresses the socket listens on (C(ListenDatagram=))
+        type: list
+        elements: str
+        default: []
+      file_descriptor_name:
+        description:
+          - Name given to the passed file descriptors in C(LISTEN_FDNAMES)
+            (C(FileDescriptorName=))
+        type: str
+      idle_timeout:
+        description:
+          - Stop the container after this time span without connections, such as C(5min)
+          - Connections go through C(systemd-socket-proxyd) to I(socket_activation.target), so
+            the application does not need to support socket activation; only I(listen_stream)
+            is forwarded
+          - Without it, the listening file descriptors are passed to the container, whose
+            application must accept them (C(LISTEN_FDS))
+        type: str
+      target:
+        description:
+          - Address the proxy forwards connections to, such as C(127.0.0.1:8080)
+          - Required with I(socket_activation.idle_timeout)
+        type: str
+      unit_dir:
+        description:
+          - Directory of the socket units
+          - Defaults to C(/etc/systemd/system) for system quadlet directories and to
+            C(~/.config/systemd/user) otherwise
+        type: path
+  security_label_disable:
+    description:
+      - Turn off label separation for the container (C(SecurityLabelDisable=))
+      - Omitted from the quadlet when not set
+    type: bool
+  no_new_privileges:
+    description:
+      - Prevent the container processes from gaining additional privileges (C(NoNewPrivileges=))
+      - Omitted from the quadlet when not set
+    type: bool
+  custom_options:
+    description:
+      - Additional keys written to the C([Container]) section
+      - Keys are written in sorted order after the options above
+      - A list value repeats the key once per element
+    type: dict
+    default: {}
+  resources:
+    description:
+      - Resource limits of the container
+      - Limits without a native quadlet key are written as C(PodmanArgs=)
+    type: dict
+    suboptions:
+      memory:
+        description: Memory limit, for example C(512m)
+        type: str
+      memory_reservation:
+        description: Memory soft limit, at most I(memory)
+        type: str
+      memory_swap:
+        description:
+          - Limit of memory plus swap, at least I(memory), or C(-1) for unlimited swap
+          - Requires I(memory)
+        type: str
+      cpus:
+        description:
+          - Number of CPUs the container may use
+          - Mutually exclusive with I(cpu_quota) and I(cpu_period)
+        type: float
+      cpu_quota:
+        description: CPU CFS quota in microseconds per I(cpu_period)
+        type: int
+      cpu_period:
+        description: CPU CFS period in microseconds, between 1000 and 1000000
+        type: int
+      cpu_shares:
+        description: Relative CPU shares, between 2 and 262144
+        type: int
+      cpu_weight:
+        description: CPU weight of the service cgroup (C(CPUWeight=)), between 1 and 10000
+        type: int
+      pids_limit:
+        description: Maximum number of processes (C(PidsLimit=)), C(-1) for unlimited
+        type: int
+      blkio_weight:
+        description: Relative block IO weight, between 10 and 1000
+        type: int
+      device_read_bps:
+        description: Read rate limits such as C(/dev/sda:10m)
+        type: list
+        elements: str
+      device_write_bps:
+        description: Write rate limits such as C(/dev/sda:10m)
+        type: list
+        elements: str
+      device_read_iops:
+        description: Read operation limits such as C(/dev/sda:1000)
+        type: list
+        elements: str
+      device_write_iops:
+        description: Write operation limits such as C(/dev/sda:1000)
+        type: list
+        elements: str
+      cpuset_cpus:
+        description:
+          - CPUs the container may run on, such as C(2-5,18-21)
+          - See M(community.podman_quadlets.podman_quadlet_cpuset) to plan them
+        type: str
+      cpuset_mems:
+        description: NUMA nodes the container may allocate memory from, such as C(0)
+        type: str
+  replicas:
+    description:
+      - Deploy the container as a template C(name@.container) with this many instances
+      - Instances are named I(instance_base), I(instance_base)+1, ... and are enabled
+        by symlinks C(name@<instance>.container) to the template, so scaling never
+        rewrites the template
+      - The container of every instance is named C(name-<instance>), and C(%i) may be used
+        in I(ports) to derive per-instance host ports, for example with C(instance_base=8080)
+      - To remove a templated container, keep I(replicas) or I(instances) set with I(state=absent)
+      - Mutually exclusive with I(instances)
+    type: int
+  instances:
+    description:
+      - Deploy the container as a template C(name@.container) with these instances
+      - Mutually exclusive with I(replicas)
+    type: list
+    elements: str
+  instance_base:
+    description:
+      - Name of the first instance when I(replicas) is used
+    type: int
+    default: 1
   quadlet_dir:
     description:
       - Directory to store quadlet files
     type: path
     default: ~/.config/containers/systemd
+  project:
+    description:
+      - Name of the project the unit belongs to
+      - When set, the unit is recorded in the project manifest used by
+        M(community.podman_quadlets.podman_quadlet_stack) to prune orphaned units
+    type: str
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+      - Keys the installed quadlet generator does not support are written as C(PodmanArgs=)
+        when podman has an equivalent flag, and fail otherwise
+    type: dict
 author:
   - GlobalBots Team (@globalbots)
 extends_documentation_fragment:
@@ -130,6 +440,79 @@ EXAMPLES = r'''
       app: webapp
       env: production
 
+- name: Create container with security and custom options
+  community.podman_quadlets.podman_quadlet_container:
+    name: webapp
+    image: myapp:latest
+    security_label_disable: false
+    no_new_privileges: true
+    custom_options:
+      ShmSize: 256m
+      AddCapability:
+        - NET_BIND_SERVICE
+        - CHOWN
+
+- name: Back off crash loops and stop quickly
+  community.podman_quadlets.podman_quadlet_container:
+    name: webapp
+    image: myapp:latest
+    restart_policy: on-failure
+    restart_sec: 10s
+    start_limit_burst: 5
+    start_limit_interval_sec: 10min
+    stop_signal: SIGQUIT
+    stop_timeout: 5
+    timeout_stop_sec: 15s
+
+- name: Limit the resources of a container
+  community.podman_quadlets.podman_quadlet_container:
+    name: webapp
+    image: myapp:latest
+    resources:
+      memory: 512m
+      memory_reservation: 256m
+      cpus: 1.5
+      pids_limit: 200
+      device_write_bps:
+        - /dev/sda:20m
+
+- name: Run 12 workers from a single template, publishing ports 8081-8092
+  community.podman_quadlets.podman_quadlet_container:
+    name: worker
+    image: myworker:latest
+    replicas: 12
+    instance_base: 8081
+    ports:
+      - host_port: "%i"
+        container_port: "8080"
+
+- name: Start a rarely used service on demand and stop it after 10 idle minutes
+  community.podman_quadlets.podman_quadlet_container:
+    name: wiki
+    image: docker.io/library/nginx:latest
+    ports:
+      - host_port: "127.0.0.1:18080"
+        container_port: "80"
+    socket_activation:
+      listen_stream:
+        - "8080"
+      idle_timeout: 10min
+      target: 127.0.0.1:18080
+    state: started
+
+- name: Keep client addresses with pasta and bind DNS to localhost only
+  community.podman_quadlets.podman_quadlet_container:
+    name: resolver
+    image: docker.io/coredns/coredns:latest
+    network_mode: pasta
+    pasta_options:
+      - --map-gw
+    ports:
+      - host_ip: 127.0.0.1
+        host_port: "53"
+        container_port: "53"
+        protocol: udp
+
 - name: Remove a container
   community.podman_quadlets.podman_quadlet_container:
     name: nginx
@@ -151,12 +534,88 @@ service_name:
     type: str
     returned: always
     sample: nginx.service
+services:
+    description:
+      - Services provided by the container, one per instance for a template
+      - Empty when the container was removed
+    type: list
+    elements: str
+    returned: always
+    sample: ['worker@8081.service', 'worker@8082.service']
+socket_unit:
+    description:
+      - Socket starting the container, controlled by I(state=started) and I(state=stopped)
+        instead of its service
+    type: str
+    returned: when I(socket_activation) is set and I(state) is not C(absent)
+    sample: wiki.socket
+instances:
+    description: Instances of a templated container
+    type: list
+    elements: str
+    returned: when I(replicas) or I(instances) is set and I(state) is not C(absent)
+    sample: ['8081', '8082']
+added_instances:
+    description: Instances that were linked to the template
+    type: list
+    elements: str
+    returned: when I(replicas) or I(instances) is set and I(state) is not C(absent)
+removed_instances:
+    description: Instances that were stopped and unlinked from the template
+    type: list
+    elements: str
+    returned: when I(replicas) or I(instances) is set
+change_class:
+    description:
+      - How the quadlet changed
+      - C(reload_only) means systemd applies the change on daemon-reload and no restart is needed
+    type: str
+    returned: always
+    choices: ['none', 'reload_only', 'recreate']
+    sample: recreate
+changed_services:
+    description:
+      - Services that need a restart to pick up the new configuration
+      - Empty when the quadlet file was not changed, has been removed or
+        only changed in keys applied by a daemon-reload
+    type: list
+    elements: str
+    returned: always
+    sample: ['nginx.service']
+reloaded:
+    description: Whether systemd was reloaded
+    type: bool
+    returned: when I(state) is C(started) or C(stopped)
+restarted_services:
+    description: Services that were started or restarted
+    type: list
+    elements: str
+    returned: when I(state) is C(started) or C(stopped)
+    sample: ['nginx.service']
+stopped_services:
+    description: Services that were stopped
+    type: list
+    elements: str
+    returned: when I(state) is C(started) or C(stopped)
+    sample: []
+active_states:
+    description: Active state of every service after the module ran
+    type: dict
+    returned: when I(state) is C(started) or C(stopped)
+    sample:
+      nginx.service: active
 '''
 
+import os
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    CONTAINER_HEALTHCHECK_OPTIONS,
+    CONTAINER_RESOURCE_OPTIONS,
+    CONTAINER_SLIRP4NETNS_OPTIONS,
+    CONTAINER_SOCKET_OPTIONS,
     PodmanQuadletBase,
-    generate_container_quadlet
+    build_container_config,
+    quadlet_wanted_states
 )
 
 
@@ -164,39 +623,59 @@ def main():
     argument_spec = dict(
         name=dict(type='str', required=True),
         state=dict(type='str', default='present', choices=['present', 'absent', 'started', 'stopped']),
-        image=dict(type='str', required=True),
+        image=dict(type='str'),
+        image_unit=dict(type='str'),
         environment=dict(type='dict', default={}),
         volumes=dict(type='list', elements='dict', default=[]),
         networks=dict(type='list', elements='str', default=[]),
+        network_mode=dict(type='str'),
+        pasta_options=dict(type='list', elements='str', default=[]),
+        slirp4netns=dict(type='dict', options=CONTAINER_SLIRP4NETNS_OPTIONS),
         labels=dict(type='dict', default={}),
         ports=dict(type='list', elements='dict', default=[]),
         secrets=dict(type='dict', default={}),
         auto_update=dict(type='str', default='registry', choices=['registry', 'local', 'disabled']),
         restart_policy=dict(type='str', default='always', choices=['always', 'on-failure', 'unless-stopped', 'no']),
+        security_label_disable=dict(type='bool'),
+        no_new_privileges=dict(type='bool'),
+        restart_sec=dict(type='str'),
+        start_limit_burst=dict(type='int'),
+        start_limit_interval_sec=dict(type='str'),
+        timeout_start_sec=dict(type='str'),
+        timeout_stop_sec=dict(type='str'),
+        stop_timeout=dict(type='int'),
+        stop_signal=dict(type='str'),
+        custom_options=dict(type='dict', default={}),
+        resources=dict(type='dict', options=CONTAINER_RESOURCE_OPTIONS),
+        depends_on=dict(type='list', elements='str', default=[]),
+        healthcheck=dict(type='dict', options=CONTAINER_HEALTHCHECK_OPTIONS),
+        notify=dict(type='str', choices=['conmon', 'container', 'healthy']),
+        socket_activation=dict(type='dict', options=CONTAINER_SOCKET_OPTIONS),
+        pod=dict(type='str'),
+        replicas=dict(type='int'),
+        instances=dict(type='list', elements='str'),
+        instance_base=dict(type='int', default=1),
         quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        project=dict(type='str'),
+        capabilities=dict(type='dict'),
     )
 
     module = AnsibleModule(
         argument_spec=argument_spec,
+        mutually_exclusive=[['replicas', 'instances'], ['image', 'image_unit']],
+        required_if=[['state', 'present', ['image', 'image_unit'], True],
+                     ['state', 'started', ['image', 'image_unit'], True],
+                     ['state', 'stopped', ['image', 'image_unit'], True]],
         supports_check_mode=True
     )
 
+    if (module.params['replicas'] or 0) < 0:
+        module.fail_json(msg="'replicas' cannot be negative")
+
     quadlet = PodmanQuadletBase(module)
     
     # Generate the container configuration
-    container_config = {
-        'name': module.params['name'] + '.container',
-        'service_description': f"{module.params['name']} Container",
-        'container_image': module.params['image'],
-        'container_name': module.params['name'],
-        'environment_variables': module.params['environment'],
-        'volumes': module.params['volumes'],
-        'networks': module.params['networks'],
-        'labels': module.params['labels'],
-        'ports': module.params['ports'],
-        'secrets': module.params['secrets'],
-        'auto_update': module.params['auto_update'],
-    }
+    container_config = build_container_config(module.params)
     
     result = quadlet.manage_quadlet(
         name=module.params['name'],
@@ -204,6 +683,18 @@ def main():
         config=container_config,
         quadlet_type='container'
     )
+    quadlet.flush_manifests()
+    
+    # started and stopped also control the services of the container
+    if module.params['state'] in ('started', 'stopped'):
+        control = quadlet.apply_service_states(
+            os.path.dirname(result['quadlet_file']),
+            quadlet_wanted_states(result, module.params['state']),
+            reload=result['changed'],
+            recreate=result['changed_services'])
+        result.update(control)
+        if control['restarted_services'] or control['stopped_services']:
+            result['changed'] = True
     
     module.exit_json(**result)
 
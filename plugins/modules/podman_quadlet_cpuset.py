@@ -0,0 +1,393 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_cpuset
+short_description: Plan CPU and NUMA placement of Quadlet containers
+version_added: "1.1.0"
+description:
+  - Compute C(--cpuset-cpus) and C(--cpuset-mems) assignments for containers from the
+    CPU topology and NUMA nodes of the host, read from C(/sys/devices/system)
+  - Whole physical cores, including their SMT siblings, are assigned
+  - Exclusive containers get cores no other container uses, shared containers get cores
+    from the remaining pool, preferring the least used ones
+  - A container is kept on the cores of a NUMA node whenever they fit
+  - Assignments are persisted in a state file and kept across runs as long as the request
+    of the container does not change, so adding a container does not move the others
+  - Pass the result to the I(resources) option of the container modules, see the examples
+options:
+  containers:
+    description:
+      - Placement requests
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description: Name of the container
+        type: str
+        required: true
+      cores:
+        description:
+          - Number of physical cores to assign
+          - Required unless I(state=absent)
+        type: int
+      exclusive:
+        description: Reserve the cores for this container alone
+        type: bool
+        default: true
+      numa_node:
+        description: Preferred NUMA node
+        type: int
+      state:
+        description: Use C(absent) to release the cores of the container
+        type: str
+        choices: ['present', 'absent']
+        default: present
+  reserved_cpus:
+    description:
+      - CPUs never assigned to containers, for example C(0-1) for the host
+    type: str
+  prune:
+    description:
+      - Release the assignments of containers not listed in I(containers)
+      - Leave disabled when several projects share the state file
+    type: bool
+    default: false
+  state_file:
+    description:
+      - File persisting the assignments of the host
+    type: path
+    default: ~/.config/containers/systemd/.podman_quadlets-cpusets.json
+  sysfs_root:
+    description:
+      - Root of the sysfs tree to read the topology from
+    type: path
+    default: /sys
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Plan the placement of latency-sensitive containers
+  community.podman_quadlets.podman_quadlet_cpuset:
+    reserved_cpus: "0-1"
+    containers:
+      - name: trading-engine
+        cores: 4
+      - name: market-feed
+        cores: 2
+        numa_node: 1
+      - name: metrics
+        cores: 1
+        exclusive: false
+  register: placement
+
+- name: Deploy the engine on its cores
+  community.podman_quadlets.podman_quadlet_container:
+    name: trading-engine
+    image: registry.example.com/engine:latest
+    resources:
+      cpuset_cpus: "{{ placement.cpusets['trading-engine'].cpuset_cpus }}"
+      cpuset_mems: "{{ placement.cpusets['trading-engine'].cpuset_mems }}"
+'''
+
+RETURN = r'''
+cpusets:
+    description: Assignment of every planned container, keyed by container name
+    type: dict
+    returned: always
+    sample:
+      trading-engine:
+        cpuset_cpus: "2-5,18-21"
+        cpuset_mems: "0"
+        cores: 4
+        exclusive: true
+changed_containers:
+    description: Containers whose assignment was created, moved or released
+    type: list
+    elements: str
+    returned: always
+    sample: ['market-feed']
+topology:
+    description: CPU topology the plan is based on
+    type: dict
+    returned: always
+    sample:
+      cpus: 32
+      cores: 16
+      nodes: [0, 1]
+changed:
+    description: Whether any assignment changed
+    type: bool
+    returned: always
+'''
+
+import json
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    format_cpuset,
+    parse_cpuset
+)
+
+STATE_VERSION = 1
+
+
+class PodmanCpusetPlanner(PodmanQuadletBase):
+    """Assign physical cores to containers, keeping earlier assignments."""
+
+    def __init__(self, module):
+        super(PodmanCpusetPlanner, self).__init__(module)
+        self.containers = module.params['containers']
+        self.prune = module.params['prune']
+        self.state_file = self._expand_path(module.params['state_file'])
+        self.sysfs_root = module.params['sysfs_root']
+        try:
+            self.reserved = set(parse_cpuset(module.params['reserved_cpus'] or ''))
+        except ValueError as e:
+            module.fail_json(msg=f"Invalid reserved_cpus: {to_native(e)}")
+
+    def _read_sysfs(self, *parts):
+        """Read a sysfs attribute, returning None if it does not exist."""
+        content = self._read_file(os.path.join(self.sysfs_root, 'devices', 'system', *parts))
+        return content.strip() if content is not None else None
+
+    def read_topology(self):
+        """Return the usable cores as (node, cpus) tuples, ordered by node and CPU."""
+        online = self._read_sysfs('cpu', 'online')
+        if online is None:
+            self.module.fail_json(msg=f"Cannot read the CPU topology from {self.sysfs_root}")
+        online = parse_cpuset(online)
+
+        node_of = {}
+        node_dir = os.path.join(self.sysfs_root, 'devices', 'system', 'node')
+        try:
+            nodes = [entry.name for entry in os.scandir(node_dir)
+                     if entry.name.startswith('node') and entry.name[4:].isdigit()]
+        except OSError:
+            nodes = []
+        for node in nodes:
+            for cpu in parse_cpuset(self._read_sysfs('node', node, 'cpulist') or ''):
+                node_of[cpu] = int(node[4:])
+
+        cores = {}
+        for cpu in online:
+            siblings = self._read_sysfs('cpu', f'cpu{cpu}', 'topology', 'thread_siblings_list')
+            threads = tuple(parse_cpuset(siblings)) if siblings else (cpu,)
+            cores.setdefault(threads, cpu)
+
+        usable = []
+        for threads in sorted(cores, key=lambda threads: (node_of.get(threads[0], 0), threads[0])):
+            # Cores that are partly offline or reserved are never handed out
+            if all(cpu in online and cpu not in self.reserved for cpu in threads):
+                usable.append((node_of.get(threads[0], 0), threads))
+        return usable
+
+    def load_state(self):
+        """Load the persisted assignments."""
+        content = self._read_file(self.state_file)
+        try:
+            state = json.loads(content) if content else {}
+        except ValueError:
+            state = {}
+        if state.get('version') != STATE_VERSION:
+            return {}
+        return state.get('assignments') or {}
+
+    @staticmethod
+    def _pick_nodes(by_node, count, preferred_node=None):
+        """Return the NUMA nodes to take count cores from, in order."""
+        fitting = [node for node, node_cores in by_node.items() if len(node_cores) >= count]
+        if preferred_node in fitting:
+            return [preferred_node]
+        if fitting:
+            # Fill the node with the fewest free cores that still fits, to keep
+            # large nodes available for large requests
+            return [min(fitting, key=lambda node: (len(by_node[node]), node))]
+        return sorted(by_node, key=lambda node: (-len(by_node[node]), node))
+
+    @classmethod
+    def _pick(cls, candidates, count, preferred_node=None, load=None):
+        """Pick count cores, staying on one NUMA node when possible."""
+        load = load or {}
+        by_node = {}
+        for node, threads in candidates:
+            by_node.setdefault(node, []).append(threads)
+
+        picked = []
+        for node in cls._pick_nodes(by_node, count, preferred_node):
+            node_cores = sorted(by_node[node],
+                                key=lambda threads: (load.get(threads, 0), threads[0]))
+            picked.extend(node_cores[:count - len(picked)])
+            if len(picked) == count:
+                break
+        return picked
+
+    def _assigned_cores(self, assignments, exclusive):
+        """Return the cores of the exclusive or shared assignments."""
+        return set(self.core_of.get(cpu) for assignment in assignments
+                   if assignment['exclusive'] == exclusive for cpu in assignment['cpus'])
+
+    def _kept_cores(self, request, assignment, exclusive_taken):
+        """Return the cores of an earlier assignment still valid for request, or None."""
+        if not assignment or assignment['exclusive'] != request['exclusive'] \
+                or assignment['cores'] != request['cores']:
+            return None
+        cores = set(self.core_of.get(cpu) for cpu in assignment['cpus'])
+        if None in cores or len(cores) != request['cores'] \
+                or set(cpu for threads in cores for cpu in threads) != set(assignment['cpus']):
+            return None
+        if request['exclusive'] and cores & exclusive_taken:
+            return None
+        if request.get('numa_node') is not None and \
+                any(self.node_of[threads] != request['numa_node'] for threads in cores):
+            return None
+        return cores
+
+    def _reuse_cores(self, ordered, previous, exclusive_taken):
+        """Return the kept cores of each request, None for requests needing new cores."""
+        chosen = {}
+        for request in ordered:
+            cores = self._kept_cores(request, previous.get(request['name']), exclusive_taken)
+            if cores is not None and request['exclusive']:
+                exclusive_taken.update(cores)
+            chosen[request['name']] = cores
+        return chosen
+
+    def _allocate(self, request, exclusive_taken, shared_kept, shared_load):
+        """Pick new cores for request, exclusive ones avoiding cores shared containers keep."""
+        free = [(node, threads) for node, threads in self.topology
+                if threads not in exclusive_taken]
+        idle = [(node, threads) for node, threads in free if threads not in shared_kept]
+        if request['exclusive'] and len(idle) >= request['cores']:
+            free = idle
+        picked = self._pick(free, request['cores'], request.get('numa_node'), shared_load)
+        if len(picked) < request['cores']:
+            self.module.fail_json(msg=f"Not enough free cores for {request['name']}: "
+                                      f"{request['cores']} requested, {len(picked)} available")
+        if request['exclusive']:
+            exclusive_taken.update(picked)
+        return set(picked)
+
+    def _write_state(self, assignments):
+        """Persist the assignments when the state directory exists."""
+        if os.path.isdir(os.path.dirname(self.state_file)):
+            content = json.dumps({'version': STATE_VERSION, 'assignments': assignments},
+                                 indent=2, sort_keys=True) + '\n'
+            self._write_file(self.state_file, content, mode=0o600)
+
+    def plan(self):
+        """Main method to compute the assignments."""
+        self.topology = self.read_topology()
+        self.node_of = dict((threads, node) for node, threads in self.topology)
+        self.core_of = dict((cpu, threads) for node, threads in self.topology for cpu in threads)
+        previous = self.load_state()
+
+        requests = dict((container['name'], container) for container in self.containers)
+        assignments = dict((name, assignment) for name, assignment in previous.items()
+                           if name not in requests and not self.prune)
+
+        present = [request for request in self.containers if request['state'] == 'present']
+        for request in present:
+            if request['cores'] < 1:
+                self.module.fail_json(msg=f"'cores' of {request['name']} must be at least 1")
+        ordered = sorted(present, key=lambda request: (not request['exclusive'], request['name']))
+
+        # Exclusive requests are placed first, keeping valid earlier assignments
+        # before any new core is handed out
+        exclusive_taken = self._assigned_cores(assignments.values(), True)
+        chosen = self._reuse_cores(ordered, previous, exclusive_taken)
+
+        # Cores of shared containers that stay put, avoided by new exclusive
+        # assignments whenever possible so those containers do not move
+        shared_kept = self._assigned_cores(assignments.values(), False)
+        shared_kept.update(threads for request in ordered if not request['exclusive']
+                           for threads in chosen[request['name']] or ())
+
+        shared_load = {}
+        for request in ordered:
+            name = request['name']
+            if chosen[name] is not None and not request['exclusive'] \
+                    and chosen[name] & exclusive_taken:
+                chosen[name] = None
+            if chosen[name] is None:
+                chosen[name] = self._allocate(request, exclusive_taken, shared_kept, shared_load)
+            if not request['exclusive']:
+                for threads in chosen[name]:
+                    shared_load[threads] = shared_load.get(threads, 0) + 1
+
+            assignments[name] = {
+                'cpus': sorted(cpu for threads in chosen[name] for cpu in threads),
+                'nodes': sorted(set(self.node_of[threads] for threads in chosen[name])),
+                'cores': request['cores'],
+                'exclusive': request['exclusive'],
+            }
+
+        changed_containers = sorted(name for name in set(previous) | set(assignments)
+                                    if previous.get(name) != assignments.get(name))
+        if changed_containers:
+            self._write_state(assignments)
+
+        cpusets = {}
+        for request in present:
+            assignment = assignments[request['name']]
+            cpusets[request['name']] = {
+                'cpuset_cpus': format_cpuset(assignment['cpus']),
+                'cpuset_mems': format_cpuset(assignment['nodes']),
+                'cores': assignment['cores'],
+                'exclusive': assignment['exclusive'],
+            }
+
+        return {
+            'changed': bool(changed_containers),
+            'cpusets': cpusets,
+            'changed_containers': changed_containers,
+            'topology': {
+                'cpus': len(self.core_of),
+                'cores': len(self.topology),
+                'nodes': sorted(set(self.node_of.values())),
+            },
+        }
+
+
+def main():
+    argument_spec = dict(
+        containers=dict(type='list', elements='dict', required=True, options=dict(
+            name=dict(type='str', required=True),
+            cores=dict(type='int'),
+            exclusive=dict(type='bool', default=True),
+            numa_node=dict(type='int'),
+            state=dict(type='str', default='present', choices=['present', 'absent']),
+        ), required_if=[['state', 'present', ['cores']]]),
+        reserved_cpus=dict(type='str'),
+        prune=dict(type='bool', default=False),
+        state_file=dict(type='path',
+                        default='~/.config/containers/systemd/.podman_quadlets-cpusets.json'),
+        sysfs_root=dict(type='path', default='/sys'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    planner = PodmanCpusetPlanner(module)
+    result = planner.plan()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
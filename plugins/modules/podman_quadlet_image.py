@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_image
+short_description: Manage Podman image pulls using Quadlets
+version_added: "1.1.0"
+description:
+  - Create, update, and delete C(.image) Quadlets
+  - Every image unit becomes an independent C(<name>-image.service), so systemd pulls all
+    images concurrently at boot and each container starts as soon as its own image is ready
+  - Containers use the unit through the I(image_unit) option of
+    M(community.podman_quadlets.podman_quadlet_container), which writes C(Image=<name>.image)
+    and makes the container require the pull
+options:
+  name:
+    description:
+      - Name of the image unit
+    required: true
+    type: str
+  state:
+    description:
+      - Desired state of the image unit
+    choices: ['present', 'absent']
+    default: present
+    type: str
+  image:
+    description:
+      - Image reference to pull, such as C(docker.io/library/nginx:1.27)
+      - Required when I(state=present)
+    type: str
+  pull_policy:
+    description:
+      - Pull policy passed to C(podman image pull --policy)
+      - C(missing) avoids contacting the registry at boot when the image is already present
+    type: str
+    choices: ['always', 'missing', 'newer', 'never']
+  retry:
+    description:
+      - Number of times a failed pull is retried
+    type: int
+  retry_delay:
+    description:
+      - Delay between pull retries, such as C(10s) or C(1m30s)
+    type: str
+  arch:
+    description:
+      - Architecture of the image to pull, such as C(arm64)
+    type: str
+  os:
+    description:
+      - Operating system of the image to pull
+    type: str
+  variant:
+    description:
+      - Architecture variant of the image to pull, such as C(v8)
+    type: str
+  auth_file:
+    description:
+      - Path of the registry authentication file
+    type: path
+  tls_verify:
+    description:
+      - Require HTTPS and verify certificates when contacting the registry
+    type: bool
+  quadlet_dir:
+    description:
+      - Directory to store quadlet files
+    type: path
+    default: ~/.config/containers/systemd
+  project:
+    description:
+      - Name of the project the unit belongs to
+      - When set, the unit is recorded in the project manifest used by
+        M(community.podman_quadlets.podman_quadlet_stack) to prune orphaned units
+    type: str
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+      - Keys the installed quadlet generator does not support are written as C(PodmanArgs=)
+        when podman has an equivalent flag, and fail otherwise
+    type: dict
+notes:
+  - Containers referencing an image unit are not restarted when only the unit changes,
+    use a new unit name for a new image reference to roll the containers over
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Pull nginx as its own unit
+  community.podman_quadlets.podman_quadlet_image:
+    name: nginx
+    image: docker.io/library/nginx:1.27
+    pull_policy: missing
+    retry: 5
+    retry_delay: 10s
+
+- name: Run a container once its image unit has pulled
+  community.podman_quadlets.podman_quadlet_container:
+    name: web
+    image_unit: nginx
+    ports:
+      - host_port: "8080"
+        container_port: "80"
+
+- name: Pull an arm64 image from a private registry
+  community.podman_quadlets.podman_quadlet_image:
+    name: app
+    image: registry.example.com/team/app:2.0
+    arch: arm64
+    auth_file: /etc/containers/auth.json
+
+- name: Remove an image unit
+  community.podman_quadlets.podman_quadlet_image:
+    name: nginx
+    state: absent
+'''
+
+RETURN = r'''
+quadlet_file:
+    description: Path to the generated quadlet file
+    type: str
+    returned: always
+    sample: /home/user/.config/containers/systemd/nginx.image
+changed:
+    description: Whether the image unit was changed
+    type: bool
+    returned: always
+service_name:
+    description: Name of the systemd service generated for the image
+    type: str
+    returned: always
+    sample: nginx-image.service
+change_class:
+    description:
+      - How the quadlet changed
+      - C(reload_only) means systemd applies the change on daemon-reload and no restart is needed
+    type: str
+    returned: always
+    choices: ['none', 'reload_only', 'recreate']
+    sample: recreate
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    build_image_config
+)
+
+
+def main():
+    argument_spec = dict(
+        name=dict(type='str', required=True),
+        state=dict(type='str', default='present', choices=['present', 'absent']),
+        image=dict(type='str'),
+        pull_policy=dict(type='str', choices=['always', 'missing', 'newer', 'never']),
+        retry=dict(type='int'),
+        retry_delay=dict(type='str'),
+        arch=dict(type='str'),
+        os=dict(type='str'),
+        variant=dict(type='str'),
+        auth_file=dict(type='path'),
+        tls_verify=dict(type='bool'),
+        quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        project=dict(type='str'),
+        capabilities=dict(type='dict'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        required_if=[['state', 'present', ['image']]],
+        supports_check_mode=True
+    )
+
+    if (module.params['retry'] or 0) < 0:
+        module.fail_json(msg="'retry' cannot be negative")
+
+    quadlet = PodmanQuadletBase(module)
+
+    # Generate the image configuration
+    image_config = build_image_config(module.params)
+
+    result = quadlet.manage_quadlet(
+        name=module.params['name'],
+        state=module.params['state'],
+        config=image_config,
+        quadlet_type='image'
+    )
+    quadlet.flush_manifests()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
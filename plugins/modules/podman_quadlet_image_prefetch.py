@@ -0,0 +1,247 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_image_prefetch
+short_description: Pull the images of Quadlet containers ahead of deployment
+version_added: "1.1.0"
+description:
+  - Make sure a list of container images is available in the local Podman storage
+  - Image presence is checked for all images at once with a single image list request
+  - Missing images are pulled in parallel by a bounded pool of workers
+  - Podman is driven over its API socket, with one connection per worker, and through
+    the podman CLI when the socket does not exist
+options:
+  images:
+    description:
+      - Images to make available locally
+      - Duplicates are ignored
+    required: true
+    type: list
+    elements: str
+  workers:
+    description:
+      - Maximum number of images pulled at the same time
+    type: int
+    default: 4
+  executable:
+    description:
+      - Path to the podman binary
+      - Only used when the API socket does not exist
+    type: str
+    default: podman
+  socket:
+    description:
+      - Path of the Podman API socket
+      - Defaults to the socket of the current user, C(/run/podman/podman.sock) for root
+    type: path
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Prefetch the images of all containers
+  community.podman_quadlets.podman_quadlet_image_prefetch:
+    images:
+      - docker.io/nginx:latest
+      - docker.io/mariadb:11
+      - docker.io/wordpress:latest
+    workers: 8
+'''
+
+RETURN = r'''
+images:
+    description: Per-image results, in the order of the I(images) option
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - image: docker.io/nginx:latest
+        present: false
+        pulled: true
+        elapsed: 4.21
+        size: 192063326
+pulled:
+    description: Images that were pulled
+    type: list
+    elements: str
+    returned: always
+    sample: ['docker.io/nginx:latest']
+failed_images:
+    description: Images that could not be pulled
+    type: list
+    elements: str
+    returned: always
+pulled_bytes:
+    description: Total size in bytes of the pulled images
+    type: int
+    returned: always
+    sample: 192063326
+elapsed:
+    description: Total time in seconds spent pulling images
+    type: float
+    returned: always
+    sample: 4.35
+changed:
+    description: Whether any image was pulled
+    type: bool
+    returned: always
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_api import (
+    PodmanAPIClient,
+    PodmanAPIError
+)
+
+
+class PodmanImagePrefetch:
+    def __init__(self, module):
+        self.module = module
+        self.images = module.params['images']
+        self.workers = module.params['workers']
+        self.client = PodmanAPIClient(module, socket_path=module.params['socket'],
+                                      executable=module.params['executable'])
+
+    @staticmethod
+    def _normalize(image):
+        """Add the implicit latest tag to an image reference."""
+        if '@' in image:
+            return image
+        if ':' not in image.rsplit('/', 1)[-1]:
+            return f"{image}:latest"
+        return image
+
+    def get_local_images(self):
+        """Return the sizes of all local images, keyed by image name."""
+        try:
+            entries = self.client.list_images()
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to list images: {to_native(e)}")
+
+        local_images = {}
+        for entry in entries:
+            for name in (entry.get('Names') or []) + (entry.get('RepoTags') or []):
+                local_images[name] = entry.get('Size', 0)
+            for digest in entry.get('RepoDigests') or []:
+                local_images[digest] = entry.get('Size', 0)
+        return local_images
+
+    def find_local_image(self, image, local_images):
+        """Return the local name matching an image reference, if any."""
+        wanted = self._normalize(image)
+        for name in local_images:
+            # Short names match any registry, e.g. nginx:latest and
+            # docker.io/library/nginx:latest
+            if name == wanted or name.endswith('/' + wanted):
+                return name
+        return None
+
+    def pull_image(self, image):
+        """Pull a single image and time it."""
+        start = time.monotonic()
+        error = None
+        try:
+            self.client.pull_image(image)
+        except PodmanAPIError as e:
+            error = to_native(e)
+        return {
+            'image': image,
+            'error': error,
+            'elapsed': round(time.monotonic() - start, 3),
+        }
+
+    def prefetch(self):
+        """Main method to prefetch the images."""
+        images = list(dict.fromkeys(self.images))
+        local_images = self.get_local_images()
+
+        results = {}
+        for image in images:
+            local_name = self.find_local_image(image, local_images)
+            results[image] = {
+                'image': image,
+                'present': local_name is not None,
+                'pulled': False,
+                'elapsed': 0.0,
+                'size': local_images.get(local_name, 0),
+            }
+        missing = [image for image in images if not results[image]['present']]
+
+        result = {
+            'changed': bool(missing),
+            'pulled': [],
+            'failed_images': [],
+            'pulled_bytes': 0,
+            'elapsed': 0.0,
+        }
+
+        if missing and not self.module.check_mode:
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(missing)))) as pool:
+                pulls = list(pool.map(self.pull_image, missing))
+            result['elapsed'] = round(time.monotonic() - start, 3)
+
+            local_images = self.get_local_images()
+            for pull in pulls:
+                image_result = results[pull['image']]
+                image_result['elapsed'] = pull['elapsed']
+                if pull['error'] is not None:
+                    image_result['msg'] = pull['error']
+                    result['failed_images'].append(pull['image'])
+                    continue
+
+                image_result['pulled'] = True
+                local_name = self.find_local_image(pull['image'], local_images)
+                if local_name is not None:
+                    image_result['size'] = local_images[local_name]
+                result['pulled'].append(pull['image'])
+                result['pulled_bytes'] += image_result['size']
+        elif missing:
+            result['pulled'] = missing
+
+        result['changed'] = bool(result['pulled'])
+        result['images'] = [results[image] for image in images]
+        return result
+
+
+def main():
+    argument_spec = dict(
+        images=dict(type='list', elements='str', required=True),
+        workers=dict(type='int', default=4),
+        executable=dict(type='str', default='podman'),
+        socket=dict(type='path'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    if module.params['workers'] < 1:
+        module.fail_json(msg="'workers' must be at least 1")
+
+    prefetch = PodmanImagePrefetch(module)
+    result = prefetch.prefetch()
+
+    if result['failed_images']:
+        module.fail_json(msg=f"Failed to pull images: {', '.join(result['failed_images'])}",
+                         **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_info
+short_description: Gather information about deployed Podman Quadlets
+version_added: "1.1.0"
+description:
+  - Read back the Quadlet units present in a directory
+  - The directory is read in a single pass and every unit file is parsed into structured data
+  - Parsed units are cached on disk keyed by file modification time and size, so
+    repeated calls only parse the files that changed
+options:
+  quadlet_dir:
+    description:
+      - Directory containing the quadlet files
+    type: path
+    default: ~/.config/containers/systemd
+  names:
+    description:
+      - Only return the units with these names, without their extension
+      - All units are returned when empty
+    type: list
+    elements: str
+    default: []
+  types:
+    description:
+      - Only return units of these types
+    type: list
+    elements: str
+    choices: ['container', 'network', 'volume', 'pod', 'kube', 'image']
+    default: ['container', 'network', 'volume', 'pod', 'kube', 'image']
+  cache:
+    description:
+      - Cache the parsed units on disk
+    type: bool
+    default: true
+  cache_file:
+    description:
+      - Path of the parse cache
+      - Defaults to C(.podman_quadlets-info-cache.json) inside I(quadlet_dir)
+    type: path
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Read all deployed quadlets
+  community.podman_quadlets.podman_quadlet_info:
+  register: quadlets
+
+- name: Show the image of every container
+  ansible.builtin.debug:
+    msg: "{{ item.key }}: {{ item.value.image }}"
+  loop: "{{ quadlets.quadlets | dict2items | selectattr('value.type', 'eq', 'container') }}"
+
+- name: Read the networks of the system-wide directory
+  community.podman_quadlets.podman_quadlet_info:
+    quadlet_dir: /etc/containers/systemd
+    types:
+      - network
+'''
+
+RETURN = r'''
+quadlets:
+    description: Parsed units keyed by unit file name
+    type: dict
+    returned: always
+    sample:
+      web.container:
+        name: web
+        type: container
+        path: /home/user/.config/containers/systemd/web.container
+        service_name: web.service
+        image: docker.io/nginx:latest
+        ports: ['8080:80']
+        networks: ['app.network']
+        volumes: ['web-data.volume:/usr/share/nginx/html']
+        content_hash: 1f0e3dad99908345f7439f8ffabdffc4b1e0a3f3c7b4c1e8e8e6b1a3e0c5f1d2
+        mtime: 1718000000.0
+        size: 312
+count:
+    description: Number of units returned
+    type: int
+    returned: always
+    sample: 1
+cache:
+    description: Number of units served from the parse cache and number of units parsed
+    type: dict
+    returned: always
+    sample:
+      hits: 1200
+      misses: 3
+'''
+
+import json
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    QUADLET_TYPES,
+    parse_quadlet_content,
+    quadlet_content_hash,
+    quadlet_service_name
+)
+
+CACHE_VERSION = 1
+
+
+class PodmanQuadletInfo(PodmanQuadletBase):
+    """Index the quadlet files of a directory."""
+
+    def __init__(self, module):
+        super(PodmanQuadletInfo, self).__init__(module)
+        self.quadlet_dir = self._expand_path(module.params['quadlet_dir'])
+        self.names = set(module.params['names'])
+        self.types = set(module.params['types'])
+        self.cache_enabled = module.params['cache']
+        self.cache_file = self._expand_path(
+            module.params['cache_file']
+            or os.path.join(self.quadlet_dir, '.podman_quadlets-info-cache.json'))
+
+    def load_cache(self):
+        """Load the parse cache, returning an empty one if missing or outdated."""
+        if not self.cache_enabled:
+            return {}
+        content = self._read_file(self.cache_file)
+        try:
+            cache = json.loads(content) if content else {}
+        except ValueError:
+            return {}
+        if cache.get('version') != CACHE_VERSION:
+            return {}
+        return cache.get('entries') or {}
+
+    def save_cache(self, entries):
+        """Write the parse cache, ignoring unwritable locations."""
+        cache = {'version': CACHE_VERSION, 'entries': entries}
+        try:
+            self._write_file(self.cache_file, json.dumps(cache, sort_keys=True) + '\n', mode=0o600)
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def describe_unit(name, quadlet_type, content):
+        """Turn the content of a unit file into structured data."""
+        sections = parse_quadlet_content(content)
+        options = {}
+        for key, value in sections.get(quadlet_type.capitalize(), []):
+            options.setdefault(key, []).append(value)
+
+        return {
+            'name': name,
+            'type': quadlet_type,
+            'service_name': quadlet_service_name(name, quadlet_type),
+            'image': (options.get('Image') or [None])[-1],
+            'ports': options.get('PublishPort', []),
+            'networks': options.get('Network', []),
+            'volumes': options.get('Volume', []),
+            'content_hash': quadlet_content_hash(content),
+        }
+
+    def scan(self):
+        """Return the quadlet files of the directory as (entry, name, type, stat) tuples."""
+        try:
+            scan = list(os.scandir(self.quadlet_dir))
+        except FileNotFoundError:
+            scan = []
+        except OSError as e:
+            self.module.fail_json(msg=f"Failed to read {self.quadlet_dir}: {to_native(e)}")
+
+        files = []
+        for entry in scan:
+            name, dot, quadlet_type = entry.name.rpartition('.')
+            if not dot or not name or name.startswith('.') or quadlet_type not in QUADLET_TYPES:
+                continue
+            try:
+                if entry.is_file():
+                    files.append((entry, name, quadlet_type, entry.stat()))
+            except OSError:
+                continue
+        return files
+
+    def lookup_unit(self, cache, entry, name, quadlet_type, stat):
+        """Return (unit, cache hit) of a quadlet file, None as unit if it cannot be read."""
+        cached = cache.get(entry.name)
+        if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached['unit'], True
+        content = self._read_file(entry.path)
+        if content is None:
+            return None, False
+        return self.describe_unit(name, quadlet_type, content), False
+
+    def gather(self):
+        """Main method to index the quadlet directory."""
+        cache = self.load_cache()
+        entries = {}
+        hits = 0
+
+        quadlets = {}
+        for entry, name, quadlet_type, stat in self.scan():
+            unit, hit = self.lookup_unit(cache, entry, name, quadlet_type, stat)
+            if unit is None:
+                continue
+            hits += hit
+            entries[entry.name] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'unit': unit}
+
+            if (self.names and name not in self.names) or quadlet_type not in self.types:
+                continue
+            quadlets[entry.name] = dict(unit, path=entry.path, mtime=stat.st_mtime,
+                                        size=stat.st_size)
+
+        if self.cache_enabled and entries != cache \
+                and os.path.isdir(os.path.dirname(self.cache_file)):
+            self.save_cache(entries)
+
+        return {
+            'changed': False,
+            'quadlets': dict(sorted(quadlets.items())),
+            'count': len(quadlets),
+            'cache': {'hits': hits, 'misses': len(entries) - hits},
+        }
+
+
+def main():
+    argument_spec = dict(
+        quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        names=dict(type='list', elements='str', default=[]),
+        types=dict(type='list', elements='str', choices=list(QUADLET_TYPES),
+                   default=list(QUADLET_TYPES)),
+        cache=dict(type='bool', default=True),
+        cache_file=dict(type='path'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    info = PodmanQuadletInfo(module)
+    result = info.gather()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -75,6 +75,18 @@ options:
       - Directory to store quadlet files
     type: path
     default: ~/.config/containers/systemd
+  project:
+    description:
+      - Name of the project the unit belongs to
+      - When set, the unit is recorded in the project manifest used by
+        M(community.podman_quadlets.podman_quadlet_stack) to prune orphaned units
+    type: str
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+      - Keys the installed quadlet generator does not support are written as C(PodmanArgs=)
+        when podman has an equivalent flag, and fail otherwise
+    type: dict
 author:
   - GlobalBots Team (@globalbots)
 extends_documentation_fragment:
@@ -124,10 +136,26 @@ changed:
     description: Whether the network configuration was changed
     type: bool
     returned: always
+service_name:
+    description: Name of the systemd service generated for the network
+    type: str
+    returned: always
+    sample: myapp-network.service
+change_class:
+    description:
+      - How the quadlet changed
+      - C(reload_only) means systemd applies the change on daemon-reload and no restart is needed
+    type: str
+    returned: always
+    choices: ['none', 'reload_only', 'recreate']
+    sample: recreate
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import PodmanQuadletBase
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    build_network_config
+)
 
 
 def main():
@@ -144,6 +172,8 @@ def main():
         labels=dict(type='dict', default={}),
         options=dict(type='dict', default={}),
         quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        project=dict(type='str'),
+        capabilities=dict(type='dict'),
     )
 
     module = AnsibleModule(
@@ -154,27 +184,7 @@ def main():
     quadlet = PodmanQuadletBase(module)
     
     # Generate the network configuration
-    network_config = {
-        'name': module.params['name'] + '.network',
-        'service_description': f"{module.params['name']} Network",
-        'driver': module.params['driver'],
-        'labels': module.params['labels'],
-        'options': module.params['options'],
-    }
-    
-    # Add optional network parameters
-    if module.params['subnet']:
-        network_config['subnet'] = module.params['subnet']
-    if module.params['gateway']:
-        network_config['gateway'] = module.params['gateway']
-    if module.params['ip_range']:
-        network_config['ip_range'] = module.params['ip_range']
-    if module.params['ipv6']:
-        network_config['ipv6'] = module.params['ipv6']
-    if module.params['internal']:
-        network_config['internal'] = module.params['internal']
-    if not module.params['dns_enabled']:
-        network_config['disable_dns'] = True
+    network_config = build_network_config(module.params)
     
     result = quadlet.manage_quadlet(
         name=module.params['name'],
@@ -182,6 +192,7 @@ def main():
         config=network_config,
         quadlet_type='network'
     )
+    quadlet.flush_manifests()
     
     module.exit_json(**result)
 
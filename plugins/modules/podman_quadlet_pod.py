@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_pod
+short_description: Manage Podman pods using Quadlets
+version_added: "1.1.0"
+description:
+  - Create, update, and delete Podman pods using systemd Quadlets
+  - Containers join a pod with the I(pod) option of
+    M(community.podman_quadlets.podman_quadlet_container) and share its network namespace,
+    so they reach each other over C(localhost)
+  - Ports are published and networks joined by the pod, once for all its containers
+  - Requires Podman 5.0 or later
+options:
+  name:
+    description:
+      - Name of the pod
+    required: true
+    type: str
+  state:
+    description:
+      - Desired state of the pod
+    choices: ['present', 'absent']
+    default: present
+    type: str
+  networks:
+    description:
+      - Networks the pod is connected to, such as C(internal.network) for a quadlet network
+    type: list
+    elements: str
+    default: []
+  ports:
+    description:
+      - Port mappings of the pod
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      host_port:
+        description: Port on the host
+        type: str
+        required: true
+      container_port:
+        description: Port in the pod
+        type: str
+        required: true
+      host_ip:
+        description: Host address the port is bound to, all addresses when not set
+        type: str
+      protocol:
+        description: Protocol of the port
+        type: str
+        choices: ['tcp', 'udp', 'sctp']
+  volumes:
+    description:
+      - Volumes mounted into every container of the pod
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      host_path:
+        description: Path on the host or a C(.volume) quadlet
+        type: str
+        required: true
+      container_path:
+        description: Path in the containers
+        type: str
+        required: true
+  userns:
+    description:
+      - User namespace of the pod (C(UserNS=)), such as C(keep-id) or C(auto)
+    type: str
+  quadlet_dir:
+    description:
+      - Directory to store quadlet files
+    type: path
+    default: ~/.config/containers/systemd
+  project:
+    description:
+      - Name of the project the unit belongs to
+      - When set, the unit is recorded in the project manifest used by
+        M(community.podman_quadlets.podman_quadlet_stack) to prune orphaned units
+    type: str
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+      - Keys the installed quadlet generator does not support are written as C(PodmanArgs=)
+        when podman has an equivalent flag, and fail otherwise
+    type: dict
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Create a pod publishing the port of the application
+  community.podman_quadlets.podman_quadlet_pod:
+    name: shop
+    ports:
+      - host_port: "8080"
+        container_port: "80"
+    networks:
+      - internal.network
+
+- name: Run the application and its sidecars in the pod
+  community.podman_quadlets.podman_quadlet_container:
+    name: "{{ item.name }}"
+    image: "{{ item.image }}"
+    pod: shop
+    state: started
+  loop:
+    - name: shop-app
+      image: docker.io/library/nginx:1.27
+    - name: shop-exporter
+      image: docker.io/nginx/nginx-prometheus-exporter:1.3
+
+- name: Remove a pod
+  community.podman_quadlets.podman_quadlet_pod:
+    name: shop
+    state: absent
+'''
+
+RETURN = r'''
+quadlet_file:
+    description: Path to the generated quadlet file
+    type: str
+    returned: always
+    sample: /home/user/.config/containers/systemd/shop.pod
+changed:
+    description: Whether the pod configuration was changed
+    type: bool
+    returned: always
+service_name:
+    description: Name of the systemd service generated for the pod
+    type: str
+    returned: always
+    sample: shop-pod.service
+change_class:
+    description:
+      - How the quadlet changed
+      - C(reload_only) means systemd applies the change on daemon-reload and no restart is needed
+    type: str
+    returned: always
+    choices: ['none', 'reload_only', 'recreate']
+    sample: recreate
+changed_services:
+    description:
+      - Services that need a restart to pick up the new configuration
+      - Restarting the pod service recreates the pod and its containers
+      - Empty when the quadlet file was not changed, has been removed or
+        only changed in keys applied by a daemon-reload
+    type: list
+    elements: str
+    returned: always
+    sample: ['shop-pod.service']
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    build_pod_config
+)
+
+
+def main():
+    argument_spec = dict(
+        name=dict(type='str', required=True),
+        state=dict(type='str', default='present', choices=['present', 'absent']),
+        networks=dict(type='list', elements='str', default=[]),
+        ports=dict(type='list', elements='dict', default=[]),
+        volumes=dict(type='list', elements='dict', default=[]),
+        userns=dict(type='str'),
+        quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        project=dict(type='str'),
+        capabilities=dict(type='dict'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    quadlet = PodmanQuadletBase(module)
+
+    # Generate the pod configuration
+    pod_config = build_pod_config(module.params)
+
+    result = quadlet.manage_quadlet(
+        name=module.params['name'],
+        state=module.params['state'],
+        config=pod_config,
+        quadlet_type='pod'
+    )
+    quadlet.flush_manifests()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
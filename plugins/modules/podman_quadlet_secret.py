@@ -15,6 +15,9 @@ version_added: "1.0.0"
 description:
   - Create, update, and delete Podman secrets that can be used with Quadlet containers
   - Secrets provide secure handling of sensitive data like passwords and API keys
+  - A SHA-256 digest of the payload is stored in the C(io.podman_quadlets.digest) label
+    of the secret, so an existing secret is only recreated when its payload changes
+  - Existing secrets without that label are recreated once to record the digest
 options:
   name:
     description:
@@ -51,13 +54,20 @@ options:
   labels:
     description:
       - Labels to apply to the secret
+      - An existing secret with other labels is replaced, podman cannot update them in place
     type: dict
     default: {}
   force:
     description:
-      - Force recreation of an existing secret
+      - Force recreation of an existing secret even if its payload digest is unchanged
     type: bool
     default: false
+  socket:
+    description:
+      - Path of the Podman API socket
+      - Defaults to the socket of the current user, C(/run/podman/podman.sock) for root
+      - The podman CLI is used when the socket does not exist
+    type: path
 author:
   - GlobalBots Team (@globalbots)
 extends_documentation_fragment:
@@ -80,7 +90,13 @@ EXAMPLES = r'''
     file: /path/to/certificate.pem
     state: present
 
-- name: Update a secret (force recreation)
+- name: Rotate a secret (recreated only because the data changed)
+  community.podman_quadlets.podman_quadlet_secret:
+    name: api-key
+    data: "new-api-key-value"
+    state: present
+
+- name: Recreate a secret unconditionally
   community.podman_quadlets.podman_quadlet_secret:
     name: api-key
     data: "new-api-key-value"
@@ -95,20 +111,30 @@ EXAMPLES = r'''
 
 RETURN = r'''
 secret_id:
-    description: ID of the created/updated secret
+    description: ID of the secret, empty in check mode when it would be created or replaced
     type: str
     returned: when state=present
+digest:
+    description: SHA-256 digest of the secret payload
+    type: str
+    returned: when state=present
+    sample: sha256:9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
 changed:
     description: Whether the secret was changed
     type: bool
     returned: always
 '''
 
-import os
-import subprocess
-import json
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils._text import to_native, to_bytes
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_api import (
+    PodmanAPIClient,
+    PodmanAPIError
+)
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    SECRET_DIGEST_LABEL,
+    secret_digest
+)
 
 
 class PodmanSecret:
@@ -122,81 +148,60 @@ class PodmanSecret:
         self.driver_opts = module.params['driver_opts']
         self.labels = module.params['labels']
         self.force = module.params['force']
-        
-    def _run_podman_command(self, args, data=None):
-        """Run a podman command and return the result."""
-        cmd = ['podman', 'secret'] + args
-        
-        try:
-            if data:
-                # Pass data via stdin
-                rc, stdout, stderr = self.module.run_command(
-                    cmd, 
-                    data=to_bytes(data),
-                    check_rc=False
-                )
-            else:
-                rc, stdout, stderr = self.module.run_command(cmd, check_rc=False)
-                
-            return rc, stdout, stderr
-        except Exception as e:
-            self.module.fail_json(msg=f"Failed to run podman command: {to_native(e)}")
-    
-    def secret_exists(self):
-        """Check if secret exists."""
-        rc, stdout, stderr = self._run_podman_command(['inspect', self.name])
-        return rc == 0
-    
+        self.client = PodmanAPIClient(module, socket_path=module.params['socket'])
+
     def get_secret_info(self):
         """Get information about an existing secret."""
-        rc, stdout, stderr = self._run_podman_command(['inspect', self.name])
-        if rc == 0:
-            try:
-                return json.loads(stdout)[0]
-            except (json.JSONDecodeError, IndexError):
-                return None
-        return None
+        try:
+            return self.client.inspect_secret(self.name)
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to inspect secret: {to_native(e)}")
     
-    def create_secret(self):
-        """Create a new secret."""
-        args = ['create']
-        
-        # Add driver options
-        if self.driver and self.driver != 'file':
-            args.extend(['--driver', self.driver])
-        
-        if self.driver_opts:
-            for key, value in self.driver_opts.items():
-                args.extend(['--driver-opt', f'{key}={value}'])
-        
-        # Add labels
-        if self.labels:
-            for key, value in self.labels.items():
-                args.extend(['--label', f'{key}={value}'])
-        
-        # Add secret name
-        args.append(self.name)
-        
-        # Add data source
-        if self.file:
-            args.append(self.file)
-            rc, stdout, stderr = self._run_podman_command(args)
-        elif self.data:
-            args.append('-')
-            rc, stdout, stderr = self._run_podman_command(args, data=self.data)
-        else:
+    def payload_digest(self):
+        """Return the digest of the desired secret payload."""
+        try:
+            if self.file:
+                return secret_digest(path=self.file)
+            return secret_digest(data=self.data)
+        except (IOError, OSError) as e:
+            self.module.fail_json(msg=f"Failed to read secret file: {to_native(e)}")
+
+    @staticmethod
+    def current_labels(info):
+        """Return the labels of an existing secret, including its payload digest."""
+        return (info.get('Spec') or {}).get('Labels') or info.get('Labels') or {}
+
+    def desired_labels(self, digest):
+        """Return the labels the secret should have, as podman stores them."""
+        labels = dict((key, str(value)) for key, value in self.labels.items())
+        labels[SECRET_DIGEST_LABEL] = digest
+        return labels
+
+    def create_secret(self, digest):
+        """Create a new secret and return its ID."""
+        labels = self.desired_labels(digest)
+
+        if not self.file and not self.data:
             self.module.fail_json(msg="Either 'data' or 'file' must be provided")
-        
-        if rc != 0:
-            self.module.fail_json(msg=f"Failed to create secret: {stderr}")
-        
-        return True
-    
+
+        try:
+            return self.client.create_secret(
+                self.name,
+                data=self.data,
+                path=self.file,
+                driver=self.driver,
+                driver_opts=self.driver_opts,
+                labels=labels
+            )
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to create secret: {to_native(e)}")
+
     def remove_secret(self):
         """Remove an existing secret."""
-        rc, stdout, stderr = self._run_podman_command(['rm', self.name])
-        if rc != 0:
-            self.module.fail_json(msg=f"Failed to remove secret: {stderr}")
+        try:
+            self.client.remove_secrets([self.name])
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to remove secret: {to_native(e)}")
         return True
     
     def manage_secret(self):
@@ -206,7 +211,8 @@ class PodmanSecret:
             'name': self.name
         }
         
-        exists = self.secret_exists()
+        info = self.get_secret_info()
+        exists = info is not None
         
         if self.state == 'absent':
             if exists:
@@ -218,25 +224,27 @@ class PodmanSecret:
                 result['msg'] = f"Secret '{self.name}' does not exist"
         
         elif self.state == 'present':
-            if exists and self.force:
-                # Remove and recreate
+            digest = self.payload_digest()
+            result['digest'] = digest
+            result['secret_id'] = ''
+            
+            if exists and (self.force or self.current_labels(info) != self.desired_labels(digest)):
+                # Remove and recreate, the payload or the labels changed
                 if not self.module.check_mode:
                     self.remove_secret()
-                    self.create_secret()
+                    result['secret_id'] = self.create_secret(digest)
                 result['changed'] = True
                 result['msg'] = f"Secret '{self.name}' recreated"
             elif not exists:
                 # Create new secret
                 if not self.module.check_mode:
-                    self.create_secret()
+                    result['secret_id'] = self.create_secret(digest)
                 result['changed'] = True
                 result['msg'] = f"Secret '{self.name}' created"
             else:
-                # Secret exists and force is not set
-                info = self.get_secret_info()
-                if info:
-                    result['secret_id'] = info.get('ID', '')
-                result['msg'] = f"Secret '{self.name}' already exists"
+                # Secret exists with the same payload and labels
+                result['secret_id'] = info.get('ID', '')
+                result['msg'] = f"Secret '{self.name}' is up to date"
         
         return result
 
@@ -251,6 +259,7 @@ def main():
         driver_opts=dict(type='dict', default={}),
         labels=dict(type='dict', default={}),
         force=dict(type='bool', default=False),
+        socket=dict(type='path'),
     )
 
     module = AnsibleModule(
@@ -264,7 +273,8 @@ def main():
 
     secret = PodmanSecret(module)
     result = secret.manage_secret()
-    
+    secret.client.close()
+
     module.exit_json(**result)
 
 
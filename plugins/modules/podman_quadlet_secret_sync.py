@@ -0,0 +1,330 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_secret_sync
+short_description: Reconcile many Podman secrets for use with Quadlets at once
+version_added: "1.1.0"
+description:
+  - Create, update, and delete a whole set of Podman secrets in a single module run
+  - The existing secrets are read once, the create/replace/remove plan is computed in memory
+    and only the required changes are executed
+  - Podman is driven over its API socket, with a single connection for the whole run, and
+    through the podman CLI when the socket does not exist
+  - Like M(community.podman_quadlets.podman_quadlet_secret), the payload digest is stored in the
+    C(io.podman_quadlets.digest) label and a secret is only replaced when its payload changes
+options:
+  secrets:
+    description:
+      - List of secrets to manage
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      name:
+        description: Name of the secret
+        type: str
+        required: true
+      state:
+        description: Desired state of the secret
+        type: str
+        choices: ['present', 'absent']
+        default: present
+      data:
+        description:
+          - Secret data
+          - Either data or file must be provided when state=present
+        type: str
+      file:
+        description:
+          - Path to file containing the secret data
+          - Either data or file must be provided when state=present
+        type: path
+      labels:
+        description: Labels to apply to the secret, in addition to I(labels)
+        type: dict
+        default: {}
+      driver:
+        description: Secret driver to use
+        type: str
+        default: file
+      driver_opts:
+        description: Driver-specific options
+        type: dict
+        default: {}
+      force:
+        description: Force recreation of the secret even if its payload digest is unchanged
+        type: bool
+        default: false
+  secrets_dir:
+    description:
+      - Directory of secret files to manage in addition to I(secrets)
+      - Every regular, non-hidden file becomes a secret named after the file
+    type: path
+  labels:
+    description:
+      - Labels applied to every secret created by this module
+      - Also used to select the secrets considered by I(prune)
+    type: dict
+    default: {}
+  prune:
+    description:
+      - Remove existing secrets that are not listed in I(secrets) or I(secrets_dir)
+      - Only secrets created by this collection (carrying the digest label) and
+        carrying all I(labels) are removed
+    type: bool
+    default: false
+  socket:
+    description:
+      - Path of the Podman API socket
+      - Defaults to the socket of the current user, C(/run/podman/podman.sock) for root
+      - The podman CLI is used when the socket does not exist
+    type: path
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Reconcile the secrets of a project
+  community.podman_quadlets.podman_quadlet_secret_sync:
+    labels:
+      project: webapp
+    secrets:
+      - name: db-password
+        data: "{{ vault_db_password }}"
+      - name: tls-cert
+        file: /etc/webapp/tls.pem
+      - name: old-api-key
+        state: absent
+
+- name: Sync a directory of secret files and remove the ones no longer present
+  community.podman_quadlets.podman_quadlet_secret_sync:
+    secrets_dir: /etc/webapp/secrets
+    labels:
+      project: webapp
+    prune: true
+'''
+
+RETURN = r'''
+secrets:
+    description: Per-secret results
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - name: db-password
+        action: replace
+        digest: sha256:9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
+summary:
+    description: Number of secrets per action
+    type: dict
+    returned: always
+    sample:
+      create: 1
+      replace: 1
+      remove: 0
+      unchanged: 12
+changed:
+    description: Whether any secret was changed
+    type: bool
+    returned: always
+'''
+
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_api import (
+    PodmanAPIClient,
+    PodmanAPIError
+)
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    SECRET_DIGEST_LABEL,
+    secret_digest
+)
+
+
+class PodmanSecretSync:
+    def __init__(self, module):
+        self.module = module
+        self.secrets = module.params['secrets']
+        self.secrets_dir = module.params['secrets_dir']
+        self.labels = module.params['labels']
+        self.prune = module.params['prune']
+        self.client = PodmanAPIClient(module, socket_path=module.params['socket'])
+
+    def get_existing_secrets(self):
+        """Return the labels of all existing secrets, keyed by name."""
+        try:
+            entries = self.client.list_secrets()
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to list secrets: {to_native(e)}")
+
+        existing = {}
+        for entry in entries:
+            spec = entry.get('Spec') or {}
+            name = spec.get('Name') or entry.get('Name')
+            if name:
+                existing[name] = spec.get('Labels') or entry.get('Labels') or {}
+        return existing
+
+    def get_desired_secrets(self):
+        """Merge the secrets option and the secrets directory into one list."""
+        desired = dict((secret['name'], secret) for secret in self.secrets)
+
+        if self.secrets_dir:
+            try:
+                entries = sorted(os.scandir(self.secrets_dir), key=lambda entry: entry.name)
+            except OSError as e:
+                self.module.fail_json(msg=f"Failed to read secrets directory: {to_native(e)}")
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                desired.setdefault(entry.name, {
+                    'name': entry.name,
+                    'state': 'present',
+                    'data': None,
+                    'file': entry.path,
+                    'labels': {},
+                    'driver': 'file',
+                    'driver_opts': {},
+                    'force': False,
+                })
+
+        for secret in desired.values():
+            if secret['state'] == 'present' and secret['data'] is None and not secret['file']:
+                self.module.fail_json(msg="Either 'data' or 'file' must be provided for secret "
+                                          f"'{secret['name']}'")
+        return desired
+
+    def _is_pruneable(self, labels):
+        """Check whether an existing secret is owned by this module's selector."""
+        if SECRET_DIGEST_LABEL not in labels:
+            return False
+        return all(labels.get(key) == str(value) for key, value in self.labels.items())
+
+    def payload_digest(self, secret):
+        """Return the digest of the desired payload of a secret."""
+        try:
+            if secret['file']:
+                return secret_digest(path=secret['file'])
+            return secret_digest(data=secret['data'])
+        except (IOError, OSError) as e:
+            self.module.fail_json(msg=f"Failed to read secret file of '{secret['name']}': "
+                                      f"{to_native(e)}")
+
+    def plan(self, desired, existing):
+        """Compute the action for every secret."""
+        plan = []
+
+        for name, secret in desired.items():
+            if secret['state'] == 'absent':
+                plan.append({'name': name, 'action': 'remove' if name in existing else 'none'})
+                continue
+
+            digest = self.payload_digest(secret)
+            if name not in existing:
+                action = 'create'
+            elif secret['force'] or existing[name].get(SECRET_DIGEST_LABEL) != digest:
+                action = 'replace'
+            else:
+                action = 'none'
+            plan.append({'name': name, 'action': action, 'digest': digest})
+
+        if self.prune:
+            for name in sorted(existing):
+                if name not in desired and self._is_pruneable(existing[name]):
+                    plan.append({'name': name, 'action': 'remove'})
+
+        return plan
+
+    def create_secret(self, secret, digest):
+        """Create a new secret."""
+        labels = dict(self.labels)
+        labels.update(secret['labels'])
+        labels[SECRET_DIGEST_LABEL] = digest
+
+        try:
+            self.client.create_secret(
+                secret['name'],
+                data=secret['data'],
+                path=secret['file'],
+                driver=secret['driver'],
+                driver_opts=secret['driver_opts'],
+                labels=labels
+            )
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to create secret '{secret['name']}': {to_native(e)}")
+
+    def remove_secrets(self, names):
+        """Remove existing secrets over the shared connection."""
+        try:
+            self.client.remove_secrets(names)
+        except PodmanAPIError as e:
+            self.module.fail_json(msg=f"Failed to remove secrets: {to_native(e)}")
+
+    def sync(self):
+        """Main method to reconcile the secrets."""
+        desired = self.get_desired_secrets()
+        existing = self.get_existing_secrets()
+        plan = self.plan(desired, existing)
+
+        summary = {'create': 0, 'replace': 0, 'remove': 0, 'unchanged': 0}
+        for item in plan:
+            summary['unchanged' if item['action'] == 'none' else item['action']] += 1
+
+        if not self.module.check_mode:
+            # Replaced secrets are removed together with the deleted ones
+            self.remove_secrets([item['name'] for item in plan
+                                 if item['action'] in ('remove', 'replace')])
+            for item in plan:
+                if item['action'] in ('create', 'replace'):
+                    self.create_secret(desired[item['name']], item['digest'])
+
+        return {
+            'changed': summary['create'] + summary['replace'] + summary['remove'] > 0,
+            'secrets': plan,
+            'summary': summary,
+        }
+
+
+def main():
+    argument_spec = dict(
+        secrets=dict(type='list', elements='dict', default=[], options=dict(
+            name=dict(type='str', required=True),
+            state=dict(type='str', default='present', choices=['present', 'absent']),
+            data=dict(type='str', no_log=True),
+            file=dict(type='path'),
+            labels=dict(type='dict', default={}),
+            driver=dict(type='str', default='file'),
+            driver_opts=dict(type='dict', default={}),
+            force=dict(type='bool', default=False),
+        ), mutually_exclusive=[['data', 'file']]),
+        secrets_dir=dict(type='path'),
+        labels=dict(type='dict', default={}),
+        prune=dict(type='bool', default=False),
+        socket=dict(type='path'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    sync = PodmanSecretSync(module)
+    result = sync.sync()
+    sync.client.close()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
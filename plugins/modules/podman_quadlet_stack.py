@@ -0,0 +1,766 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_stack
+short_description: Manage a whole set of Podman Quadlets in one run
+version_added: "1.1.0"
+description:
+  - Create, update, and delete the container, network, and volume Quadlets of a project in a single
+    module run
+  - Each unit is reconciled exactly like the individual C(podman_quadlet_container),
+    C(podman_quadlet_network) and C(podman_quadlet_volume) modules would do it,
+    but without paying one module execution per unit
+  - Images, networks, volumes and pods are processed before containers
+  - The C(Network=), C(Volume=), C(Pod=) and I(depends_on) references of the containers form a
+    dependency graph that is written as C(Requires=)/C(After=) and returned as waves of services
+    that can be started together; dependency cycles fail the task
+  - The quadlets are rendered on the controller first, and hosts whose manifest already
+    matches are skipped without transferring or running the module
+  - Containers with I(state=started) or I(state=stopped) have their services controlled after
+    all files are written, with at most one daemon-reload and one C(systemctl) call per action;
+    the module always runs on the host for them
+options:
+  containers:
+    description:
+      - List of containers to manage
+      - Every element accepts the options of M(community.podman_quadlets.podman_quadlet_container)
+        except I(quadlet_dir)
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      name:
+        description: Name of the container
+        type: str
+        required: true
+      state:
+        description: Desired state of the container
+        type: str
+        choices: ['present', 'absent', 'started', 'stopped']
+        default: present
+      image:
+        description:
+          - Container image to use
+          - Required unless I(image_unit) is set or I(state=absent)
+        type: str
+      image_unit:
+        description:
+          - Name of an image unit of I(images) or another C(.image) quadlet to run instead of
+            I(image)
+          - Mutually exclusive with I(image)
+        type: str
+      environment:
+        description: Environment variables for the container
+        type: dict
+        default: {}
+      volumes:
+        description: List of volumes to mount
+        type: list
+        elements: dict
+        default: []
+      networks:
+        description: List of networks to connect to
+        type: list
+        elements: str
+        default: []
+      network_mode:
+        description:
+          - Network mode of the container, C(bridge), C(host), C(none), C(pasta), C(slirp4netns)
+            or C(container:<name>), see M(community.podman_quadlets.podman_quadlet_container)
+        type: str
+      pasta_options:
+        description: Options passed to pasta with I(network_mode=pasta)
+        type: list
+        elements: str
+        default: []
+      slirp4netns:
+        description: Options of slirp4netns with I(network_mode=slirp4netns)
+        type: dict
+        suboptions:
+          port_handler:
+            description: Port forwarder, C(slirp4netns) keeps the client source address
+            type: str
+            choices: ['rootlesskit', 'slirp4netns']
+          mtu:
+            description: MTU of the tap interface
+            type: int
+          enable_ipv6:
+            description: Enable IPv6
+            type: bool
+          allow_host_loopback:
+            description: Let the container reach the loopback address of the host
+            type: bool
+          cidr:
+            description: Network of the container
+            type: str
+          outbound_addr:
+            description: Host address or interface outgoing traffic is sent from
+            type: str
+      labels:
+        description: Labels to apply to the container
+        type: dict
+        default: {}
+      ports:
+        description:
+          - Port mappings with I(host_port), I(container_port) and optionally I(host_ip)
+            and I(protocol) (C(tcp), C(udp) or C(sctp))
+        type: list
+        elements: dict
+        default: []
+      secrets:
+        description: Secrets to mount in the container
+        type: dict
+        default: {}
+      auto_update:
+        description: Enable automatic updates
+        type: str
+        choices: ['registry', 'local', 'disabled']
+        default: 'registry'
+      restart_policy:
+        description:
+          - Restart policy for the container, written as C(Restart=) of the service
+          - C(unless-stopped) is rendered as C(always), systemd does not remember manual stops
+            across reboots
+        type: str
+        choices: ['always', 'on-failure', 'unless-stopped', 'no']
+        default: 'always'
+      restart_sec:
+        description: Time to wait before restarting the service (C(RestartSec=)), such as C(5s)
+        type: str
+      start_limit_burst:
+        description:
+          - Number of starts allowed within I(start_limit_interval_sec) (C(StartLimitBurst=))
+        type: int
+      start_limit_interval_sec:
+        description: Interval of the start rate limit (C(StartLimitIntervalSec=)), such as C(5min)
+        type: str
+      timeout_start_sec:
+        description:
+          - Time allowed for the service to start (C(TimeoutStartSec=)), such as C(15min) for large
+            image pulls
+        type: str
+      timeout_stop_sec:
+        description: Time allowed for the service to stop (C(TimeoutStopSec=))
+        type: str
+      stop_timeout:
+        description:
+          - Seconds podman waits after I(stop_signal) before killing the container (C(StopTimeout=))
+          - Keep it below I(timeout_stop_sec)
+        type: int
+      stop_signal:
+        description: Signal sent to stop the container (C(StopSignal=)), such as C(SIGQUIT)
+        type: str
+      healthcheck:
+        description:
+          - Health check of the container
+          - Durations use the podman format, such as C(30s) or C(1m30s)
+        type: dict
+        suboptions:
+          cmd:
+            description: Command run inside the container to check its health (C(HealthCmd=))
+            type: str
+          interval:
+            description: Time between two checks (C(HealthInterval=))
+            type: str
+          timeout:
+            description: Time after which a check is considered failed (C(HealthTimeout=))
+            type: str
+          start_period:
+            description:
+              - Time given to the container to start before failed checks count
+                (C(HealthStartPeriod=))
+            type: str
+          retries:
+            description:
+              - Number of consecutive failures after which the container is unhealthy
+                (C(HealthRetries=))
+            type: int
+          on_failure:
+            description: Action taken when the container becomes unhealthy (C(HealthOnFailure=))
+            type: str
+            choices: ['none', 'kill', 'restart', 'stop']
+      notify:
+        description:
+          - When the service reports itself as started, like C(podman run --sdnotify)
+          - C(conmon) reports it once the container runs, this is the podman default
+          - C(container) lets the application send the notification itself (C(Notify=true))
+          - C(healthy) waits for the first successful health check (C(Notify=healthy)), so
+            C(systemctl start) and units ordered after the container wait until it is ready;
+            requires I(healthcheck.cmd)
+        type: str
+        choices: ['conmon', 'container', 'healthy']
+      pod:
+        description:
+          - Pod the container joins (C(Pod=)), such as C(shop) or C(shop.pod) for a pod of
+            I(pods)
+          - The container shares the network namespace of the pod, so I(ports) and I(networks)
+            must be set on the pod instead
+        type: str
+      socket_activation:
+        description:
+          - Start the container on the first connection through a companion systemd C(.socket) unit,
+            written to I(socket_activation.unit_dir) and enabled in C(sockets.target)
+          - The container is not started at boot and I(state=started) starts the socket instead
+          - A restart policy of C(always) becomes C(on-failure), so an application exiting when idle
+            stays stopped
+          - Cannot be used with I(replicas) or I(instances)
+        type: dict
+        suboptions:
+          listen_stream:
+            description:
+              - Stream addresses the socket listens on, such as C(8080) or C(/run/app.sock)
+                (C(ListenStream=))
+            type: list
+            elements: str
+            default: []
+          listen_datagram:
+            description: Datagram addresses the socket listens on (C(ListenDatagram=))
+            type: list
+            elements: str
+            default: []
+          file_descriptor_name:
+            description:
+              - Name given to the passed file descriptors in C(LISTEN_FDNAMES)
+                (C(FileDescriptorName=))
+            type: str
+          idle_timeout:
+            description:
+              - Stop the container after this time span without connections, such as C(5min)
+              - Connections go through C(systemd-socket-proxyd) to I(socket_activation.target), so
+                the application does not need to support socket activation; only I(listen_stream)
+                is forwarded
+              - Without it, the listening file descriptors are passed to the container, whose
+                application must accept them (C(LISTEN_FDS))
+            type: str
+          target:
+            description:
+              - Address the proxy forwards connections to, such as C(127.0.0.1:8080)
+              - Required with I(socket_activation.idle_timeout)
+            type: str
+          unit_dir:
+            description:
+              - Directory of the socket units
+              - Defaults to C(/etc/systemd/system) for system quadlet directories and to
+                C(~/.config/systemd/user) otherwise
+            type: path
+      security_label_disable:
+        description: Turn off label separation for the container
+        type: bool
+      no_new_privileges:
+        description: Prevent the container processes from gaining additional privileges
+        type: bool
+      custom_options:
+        description: Additional keys written to the C([Container]) section
+        type: dict
+        default: {}
+      resources:
+        description:
+          - Resource limits of the container
+          - Limits without a native quadlet key are written as C(PodmanArgs=)
+        type: dict
+        suboptions:
+          memory:
+            description: Memory limit, for example C(512m)
+            type: str
+          memory_reservation:
+            description: Memory soft limit, at most I(memory)
+            type: str
+          memory_swap:
+            description:
+              - Limit of memory plus swap, at least I(memory), or C(-1) for unlimited swap
+              - Requires I(memory)
+            type: str
+          cpus:
+            description:
+              - Number of CPUs the container may use
+              - Mutually exclusive with I(cpu_quota) and I(cpu_period)
+            type: float
+          cpu_quota:
+            description: CPU CFS quota in microseconds per I(cpu_period)
+            type: int
+          cpu_period:
+            description: CPU CFS period in microseconds, between 1000 and 1000000
+            type: int
+          cpu_shares:
+            description: Relative CPU shares, between 2 and 262144
+            type: int
+          cpu_weight:
+            description: CPU weight of the service cgroup (C(CPUWeight=)), between 1 and 10000
+            type: int
+          pids_limit:
+            description: Maximum number of processes (C(PidsLimit=)), C(-1) for unlimited
+            type: int
+          blkio_weight:
+            description: Relative block IO weight, between 10 and 1000
+            type: int
+          device_read_bps:
+            description: Read rate limits such as C(/dev/sda:10m)
+            type: list
+            elements: str
+          device_write_bps:
+            description: Write rate limits such as C(/dev/sda:10m)
+            type: list
+            elements: str
+          device_read_iops:
+            description: Read operation limits such as C(/dev/sda:1000)
+            type: list
+            elements: str
+          device_write_iops:
+            description: Write operation limits such as C(/dev/sda:1000)
+            type: list
+            elements: str
+          cpuset_cpus:
+            description:
+              - CPUs the container may run on, such as C(2-5,18-21)
+              - See M(community.podman_quadlets.podman_quadlet_cpuset) to plan them
+            type: str
+          cpuset_mems:
+            description: NUMA nodes the container may allocate memory from, such as C(0)
+            type: str
+      replicas:
+        description:
+          - Deploy the container as a template C(name@.container) with this many instances
+          - Mutually exclusive with I(instances)
+        type: int
+      instances:
+        description:
+          - Deploy the container as a template C(name@.container) with these instances
+          - Mutually exclusive with I(replicas)
+        type: list
+        elements: str
+      instance_base:
+        description: Name of the first instance when I(replicas) is used
+        type: int
+        default: 1
+      depends_on:
+        description:
+          - Containers or units this container needs, written as C(Requires=) and C(After=)
+          - Quadlet networks and volumes it uses are added automatically
+        type: list
+        elements: str
+        default: []
+  images:
+    description:
+      - List of image units to manage
+      - Every element accepts the options of M(community.podman_quadlets.podman_quadlet_image)
+        except I(quadlet_dir)
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      name:
+        description: Name of the image unit
+        type: str
+        required: true
+      state:
+        description: Desired state of the image unit
+        type: str
+        choices: ['present', 'absent']
+        default: present
+      image:
+        description:
+          - Image reference to pull
+          - Required unless I(state=absent)
+        type: str
+      pull_policy:
+        description: Pull policy passed to C(podman image pull --policy)
+        type: str
+        choices: ['always', 'missing', 'newer', 'never']
+      retry:
+        description: Number of times a failed pull is retried
+        type: int
+      retry_delay:
+        description: Delay between pull retries, such as C(10s)
+        type: str
+      arch:
+        description: Architecture of the image to pull
+        type: str
+      os:
+        description: Operating system of the image to pull
+        type: str
+      variant:
+        description: Architecture variant of the image to pull
+        type: str
+      auth_file:
+        description: Path of the registry authentication file
+        type: path
+      tls_verify:
+        description: Verify the TLS certificates of the registry
+        type: bool
+  networks:
+    description:
+      - List of networks to manage
+      - Every element accepts the options of M(community.podman_quadlets.podman_quadlet_network)
+        except I(quadlet_dir)
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      name:
+        description: Name of the network
+        type: str
+        required: true
+      state:
+        description: Desired state of the network
+        type: str
+        choices: ['present', 'absent']
+        default: present
+      driver:
+        description: Network driver to use
+        type: str
+        choices: ['bridge', 'macvlan', 'ipvlan']
+        default: bridge
+      subnet:
+        description: Subnet for the network
+        type: str
+      gateway:
+        description: Gateway for the network
+        type: str
+      ip_range:
+        description: IP range for the network
+        type: str
+      ipv6:
+        description: Enable IPv6 on the network
+        type: bool
+        default: false
+      internal:
+        description: Create an internal network (no external access)
+        type: bool
+        default: false
+      dns_enabled:
+        description: Enable DNS on the network
+        type: bool
+        default: true
+      labels:
+        description: Labels to apply to the network
+        type: dict
+        default: {}
+      options:
+        description: Driver-specific options
+        type: dict
+        default: {}
+  volumes:
+    description:
+      - List of volumes to manage
+      - Every element accepts the options of M(community.podman_quadlets.podman_quadlet_volume)
+        except I(quadlet_dir)
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      name:
+        description: Name of the volume
+        type: str
+        required: true
+      state:
+        description: Desired state of the volume
+        type: str
+        choices: ['present', 'absent']
+        default: present
+      driver:
+        description: Volume driver to use
+        type: str
+        default: local
+      labels:
+        description: Labels to apply to the volume
+        type: dict
+        default: {}
+      options:
+        description: Driver-specific options
+        type: dict
+        default: {}
+      copy:
+        description: Copy data from container directory when volume is created
+        type: bool
+        default: true
+      device:
+        description: Device to mount (for certain drivers)
+        type: str
+      type:
+        description: Mount type (for certain drivers)
+        type: str
+      mount_options:
+        description: Mount options (comma-separated)
+        type: str
+  pods:
+    description:
+      - List of pods to manage
+      - Every element accepts the options of M(community.podman_quadlets.podman_quadlet_pod)
+        except I(quadlet_dir)
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      name:
+        description: Name of the pod
+        type: str
+        required: true
+      state:
+        description: Desired state of the pod
+        type: str
+        choices: ['present', 'absent']
+        default: present
+      networks:
+        description: Networks the pod is connected to
+        type: list
+        elements: str
+        default: []
+      ports:
+        description: Port mappings of the pod
+        type: list
+        elements: dict
+        default: []
+      volumes:
+        description: Volumes mounted into every container of the pod
+        type: list
+        elements: dict
+        default: []
+      userns:
+        description: User namespace of the pod (C(UserNS=))
+        type: str
+  quadlet_dir:
+    description:
+      - Directory to store quadlet files
+    type: path
+    default: ~/.config/containers/systemd
+  project:
+    description:
+      - Name of the project the units belong to
+      - The content hash of every unit written is recorded in the manifest file
+        C(.podman_quadlets-<project>.json) inside I(quadlet_dir)
+    type: str
+    default: default
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+      - Keys the installed quadlet generator does not support are written as C(PodmanArgs=)
+        when podman has an equivalent flag, and fail otherwise
+    type: dict
+  manifest_check:
+    description:
+      - Compare the quadlets rendered on the controller with the manifest of the host
+        and only send the units that differ to the target
+      - When nothing differs the module is not executed at all; units with state
+        C(started) or C(stopped) are checked with a single C(systemctl is-active) call
+        and only sent when their services are not in that state
+      - The manifest only knows what this module wrote, so set to C(false) to
+        reconcile files that were changed by other means
+      - Handled by the action plugin
+    type: bool
+    default: true
+  prune:
+    description:
+      - Remove the units recorded in the manifest of I(project) that are not part of this stack
+      - The services of the pruned units are stopped with a single C(systemctl stop) call
+        before their files are removed
+      - Only the manifest is consulted, so units of other projects and files written by
+        other means are never touched
+    type: bool
+    default: false
+  keep_units:
+    description:
+      - File names of units that must not be pruned although they are not listed
+      - Set by the action plugin for the units it found up to date
+    type: list
+    elements: str
+    default: []
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Deploy a complete application stack
+  community.podman_quadlets.podman_quadlet_stack:
+    networks:
+      - name: wordpress
+        subnet: 10.89.10.0/24
+    volumes:
+      - name: wordpress-db
+      - name: wordpress-data
+    containers:
+      - name: wordpress-db
+        image: docker.io/mariadb:11
+        volumes:
+          - host_path: wordpress-db.volume
+            container_path: /var/lib/mysql
+        networks:
+          - wordpress.network
+      - name: wordpress
+        image: docker.io/wordpress:latest
+        ports:
+          - host_port: "8080"
+            container_port: "80"
+        volumes:
+          - host_path: wordpress-data.volume
+            container_path: /var/www/html
+        networks:
+          - wordpress.network
+        depends_on:
+          - wordpress-db
+  register: stack
+
+- name: Deploy a stack and remove the units dropped from it
+  community.podman_quadlets.podman_quadlet_stack:
+    project: wordpress
+    prune: true
+    containers:
+      - name: wordpress
+        image: docker.io/wordpress:latest
+
+- name: Show which units were rewritten
+  ansible.builtin.debug:
+    var: stack.changed_units
+'''
+
+RETURN = r'''
+changed:
+    description: Whether any quadlet file was changed
+    type: bool
+    returned: always
+containers:
+    description: Per-container results, in the order of the I(containers) option
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - name: wordpress
+        changed: true
+        quadlet_file: /home/user/.config/containers/systemd/wordpress.container
+        service_name: wordpress.service
+        change_class: recreate
+        msg: Created/Updated quadlet file /home/user/.config/containers/systemd/wordpress.container
+networks:
+    description: Per-network results, in the order of the I(networks) option
+    type: list
+    elements: dict
+    returned: always
+volumes:
+    description: Per-volume results, in the order of the I(volumes) option
+    type: list
+    elements: dict
+    returned: always
+images:
+    description: Per-image results, in the order of the I(images) option
+    type: list
+    elements: dict
+    returned: always
+pods:
+    description: Per-pod results, in the order of the I(pods) option
+    type: list
+    elements: dict
+    returned: always
+changed_units:
+    description: File names of all quadlets that were created, updated or removed
+    type: list
+    elements: str
+    returned: always
+    sample: ['wordpress.network', 'wordpress.container']
+changed_services:
+    description:
+      - Container services whose quadlet changed and which need a restart
+      - Removed containers, network or volume units and containers whose
+        I(change_class) is C(reload_only) are never listed
+    type: list
+    elements: str
+    returned: always
+    sample: ['wordpress.service']
+pruned_units:
+    description: File names of the units removed by I(prune)
+    type: list
+    elements: str
+    returned: always
+    sample: ['old-worker.container']
+start_waves:
+    description:
+      - Services of the units kept running by the stack, grouped in dependency order
+      - The services of a wave only depend on services of earlier waves, so each wave
+        can be started with a single C(systemctl start) call
+    type: list
+    elements: list
+    returned: always
+    sample: [['wordpress-network.service', 'wordpress-db-volume.service'], ['wordpress-db.service'],
+             ['wordpress.service']]
+reloaded:
+    description:
+      - Whether systemd was reloaded for containers with I(state=started) or I(state=stopped)
+    type: bool
+    returned: always
+restarted_services:
+    description:
+      - Services of containers with I(state=started) that were started or restarted
+      - They are handled by a single C(systemctl restart) call
+    type: list
+    elements: str
+    returned: always
+    sample: ['wordpress-db.service', 'wordpress.service']
+stopped_services:
+    description:
+      - Services of containers with I(state=stopped) that were stopped by a single
+        C(systemctl stop) call
+    type: list
+    elements: str
+    returned: always
+    sample: []
+active_states:
+    description:
+      - Active state of the services of containers with I(state=started) or I(state=stopped)
+    type: dict
+    returned: always
+    sample:
+      wordpress.service: active
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    stack_argument_spec,
+    validate_stack
+)
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=stack_argument_spec(),
+        supports_check_mode=True
+    )
+
+    quadlet = PodmanQuadletBase(module)
+
+    try:
+        start_waves = validate_stack(module.params)
+    except ValueError as e:
+        module.fail_json(msg=to_native(e))
+
+    result, wanted = quadlet.deploy_stack()
+    result['start_waves'] = start_waves
+
+    # One reload and one call per action for the whole stack, systemd orders
+    # the services of a call by their Requires=/After=
+    control = {'reloaded': False, 'restarted_services': [], 'stopped_services': [],
+               'active_states': {}}
+    if wanted:
+        control = quadlet.apply_service_states(
+            quadlet._expand_path(module.params['quadlet_dir']),
+            wanted,
+            reload=result['changed'],
+            recreate=result['changed_services'])
+        if control['restarted_services'] or control['stopped_services']:
+            result['changed'] = True
+    result.update(control)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_tenants
+short_description: Deploy Quadlet stacks for many users in one run
+version_added: "1.1.0"
+description:
+  - Deploy a stack of Quadlets, as M(community.podman_quadlets.podman_quadlet_stack) does, for every
+    user of a host and for the system scope in a single privileged module run
+  - Units of a user are written to C(~/.config/containers/systemd) of that user and owned by them,
+    units of C(root) are written to C(/etc/containers/systemd) and run as system services
+  - Files in the home of a user are read, written and removed with the uid and gid of that user,
+    so symlinks the user placed there cannot redirect them to files it could not change itself
+  - Every user manager whose units changed is reloaded once with
+    C(systemctl --user -M <user>@ daemon-reload), followed by one restart and one stop call for the
+    containers with I(state=started) or I(state=stopped)
+options:
+  tenants:
+    description:
+      - Stacks to deploy, one per user
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      user:
+        description:
+          - Name of the user owning the units
+          - C(root) deploys rootful units to C(/etc/containers/systemd)
+        type: str
+        required: true
+      containers:
+        description:
+          - Containers of the user, with the suboptions of
+            M(community.podman_quadlets.podman_quadlet_stack)
+        type: list
+        elements: dict
+        default: []
+      images:
+        description:
+          - Image units of the user, with the suboptions of
+            M(community.podman_quadlets.podman_quadlet_stack)
+        type: list
+        elements: dict
+        default: []
+      networks:
+        description:
+          - Networks of the user, with the suboptions of
+            M(community.podman_quadlets.podman_quadlet_stack)
+        type: list
+        elements: dict
+        default: []
+      volumes:
+        description:
+          - Volumes of the user, with the suboptions of
+            M(community.podman_quadlets.podman_quadlet_stack)
+        type: list
+        elements: dict
+        default: []
+      pods:
+        description:
+          - Pods of the user, with the suboptions of
+            M(community.podman_quadlets.podman_quadlet_stack)
+        type: list
+        elements: dict
+        default: []
+      project:
+        description:
+          - Name of the project the units belong to, recorded in the manifest of the user
+        type: str
+        default: default
+      prune:
+        description:
+          - Remove the units of the project manifest of the user that are not listed
+        type: bool
+        default: false
+      linger:
+        description:
+          - Enable lingering for the user, so their services run without a login session
+          - Ignored for C(root)
+        type: bool
+        default: true
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+    type: dict
+notes:
+  - Must run as root unless every tenant is the connecting user
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Deploy the stacks of all tenants
+  community.podman_quadlets.podman_quadlet_tenants:
+    tenants:
+      - user: alice
+        project: shop
+        containers:
+          - name: shop
+            image: docker.io/library/nginx:1.27
+            state: started
+      - user: bob
+        project: blog
+        containers:
+          - name: blog
+            image: docker.io/library/wordpress:latest
+            state: started
+      - user: root
+        project: ingress
+        containers:
+          - name: proxy
+            image: docker.io/library/haproxy:3.0
+            ports:
+              - host_port: "443"
+                container_port: "8443"
+            state: started
+  become: true
+'''
+
+RETURN = r'''
+changed:
+    description: Whether any tenant changed
+    type: bool
+    returned: always
+tenants:
+    description:
+      - Per-tenant results, in the order of the I(tenants) option
+      - Every entry also holds the keys returned by
+        M(community.podman_quadlets.podman_quadlet_stack)
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - user: alice
+        quadlet_dir: /home/alice/.config/containers/systemd
+        changed: true
+        linger_enabled: false
+        changed_units: ['shop.container']
+        reloaded: true
+        restarted_services: ['shop.service']
+reloaded_users:
+    description: Users whose systemd manager was reloaded
+    type: list
+    elements: str
+    returned: always
+    sample: ['alice']
+'''
+
+import os
+import pwd
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    stack_argument_spec,
+    validate_stack
+)
+
+SYSTEM_QUADLET_DIR = '/etc/containers/systemd'
+
+LINGER_DIR = '/var/lib/systemd/linger'
+
+
+def tenant_options():
+    """Return the suboptions of a tenant, sharing the stack unit options."""
+    stack_spec = stack_argument_spec()
+    options = dict((key, stack_spec[key]) for key in ('containers', 'images', 'networks', 'volumes',
+                                                      'pods', 'project', 'prune'))
+    options['user'] = dict(type='str', required=True)
+    options['linger'] = dict(type='bool', default=True)
+    return options
+
+
+class PodmanQuadletTenants:
+    """Deploy quadlet stacks for many users from one process."""
+
+    def __init__(self, module):
+        self.module = module
+        self.tenants = module.params['tenants']
+        self.current_user = pwd.getpwuid(os.geteuid()).pw_name
+
+    def resolve(self, tenant):
+        """Return the quadlet directory, owner and systemd user of a tenant."""
+        if tenant['user'] == 'root':
+            return SYSTEM_QUADLET_DIR, None, None
+        try:
+            entry = pwd.getpwnam(tenant['user'])
+        except KeyError:
+            self.module.fail_json(msg=f"User '{tenant['user']}' does not exist")
+        quadlet_dir = os.path.join(entry.pw_dir, '.config', 'containers', 'systemd')
+        if tenant['user'] == self.current_user:
+            return quadlet_dir, None, None
+        return quadlet_dir, (entry.pw_uid, entry.pw_gid), tenant['user']
+
+    def ensure_linger(self, user):
+        """Enable lingering and start the user manager, returning whether it changed."""
+        if os.path.exists(os.path.join(LINGER_DIR, user)):
+            return False
+        if not self.module.check_mode:
+            for cmd in (['loginctl', 'enable-linger', user],
+                        ['systemctl', 'start', f"user@{pwd.getpwnam(user).pw_uid}.service"]):
+                rc, stdout, stderr = self.module.run_command(cmd, check_rc=False)
+                if rc != 0:
+                    self.module.fail_json(msg=f"Failed to run {' '.join(cmd)}: {stderr.strip()}")
+        return True
+
+    def deploy_tenant(self, tenant, start_waves, quadlet_dir, owner, user):
+        """Deploy the stack of one tenant and bring its services to their wanted state."""
+        params = dict(tenant, quadlet_dir=quadlet_dir, keep_units=[],
+                      capabilities=self.module.params['capabilities'])
+        quadlet = PodmanQuadletBase(self.module, params=params, owner=owner, user=user)
+
+        linger_enabled = False
+        if tenant['linger'] and tenant['user'] != 'root':
+            linger_enabled = self.ensure_linger(tenant['user'])
+
+        try:
+            tenant_result, wanted = quadlet.deploy_stack()
+        except (IOError, OSError) as e:
+            self.module.fail_json(msg=f"Failed to write the units of {tenant['user']}: "
+                                      f"{to_native(e)}")
+        tenant_result.update(user=tenant['user'], quadlet_dir=quadlet_dir,
+                             linger_enabled=linger_enabled, start_waves=start_waves)
+
+        # One reload per user manager, and only when its units changed
+        control = {'reloaded': False, 'restarted_services': [], 'stopped_services': [],
+                   'active_states': {}}
+        if wanted or tenant_result['changed']:
+            control = quadlet.apply_service_states(
+                quadlet_dir,
+                wanted,
+                reload=tenant_result['changed'],
+                recreate=tenant_result['changed_services'])
+        tenant_result.update(control)
+        if control['restarted_services'] or control['stopped_services'] or linger_enabled:
+            tenant_result['changed'] = True
+        return tenant_result
+
+    def deploy(self):
+        """Main method to deploy every tenant."""
+        users = [tenant['user'] for tenant in self.tenants]
+        duplicates = sorted(set(user for user in users if users.count(user) > 1))
+        if duplicates:
+            self.module.fail_json(msg=f"Tenants listed more than once: {', '.join(duplicates)}")
+        if os.geteuid() != 0 and any(user != self.current_user for user in users):
+            self.module.fail_json(msg="Managing the units of other users requires root")
+
+        # Check every tenant before anything is written
+        plans = []
+        for tenant in self.tenants:
+            try:
+                start_waves = validate_stack(tenant)
+            except ValueError as e:
+                self.module.fail_json(msg=f"Invalid stack for {tenant['user']}: {to_native(e)}")
+            plans.append((tenant, start_waves) + self.resolve(tenant))
+
+        result = {'changed': False, 'tenants': [], 'reloaded_users': []}
+        for plan in plans:
+            tenant_result = self.deploy_tenant(*plan)
+            if tenant_result['reloaded']:
+                result['reloaded_users'].append(tenant_result['user'])
+            result['changed'] = result['changed'] or tenant_result['changed']
+            result['tenants'].append(tenant_result)
+
+        return result
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            tenants=dict(type='list', elements='dict', required=True, options=tenant_options()),
+            capabilities=dict(type='dict'),
+        ),
+        supports_check_mode=True
+    )
+
+    tenants = PodmanQuadletTenants(module)
+    result = tenants.deploy()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
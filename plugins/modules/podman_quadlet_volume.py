@@ -64,6 +64,18 @@ options:
       - Directory to store quadlet files
     type: path
     default: ~/.config/containers/systemd
+  project:
+    description:
+      - Name of the project the unit belongs to
+      - When set, the unit is recorded in the project manifest used by
+        M(community.podman_quadlets.podman_quadlet_stack) to prune orphaned units
+    type: str
+  capabilities:
+    description:
+      - Capabilities returned by M(community.podman_quadlets.podman_quadlet_capabilities)
+      - Keys the installed quadlet generator does not support are written as C(PodmanArgs=)
+        when podman has an equivalent flag, and fail otherwise
+    type: dict
 author:
   - GlobalBots Team (@globalbots)
 extends_documentation_fragment:
@@ -115,10 +127,26 @@ changed:
     description: Whether the volume configuration was changed
     type: bool
     returned: always
+service_name:
+    description: Name of the systemd service generated for the volume
+    type: str
+    returned: always
+    sample: webapp-data-volume.service
+change_class:
+    description:
+      - How the quadlet changed
+      - C(reload_only) means systemd applies the change on daemon-reload and no restart is needed
+    type: str
+    returned: always
+    choices: ['none', 'reload_only', 'recreate']
+    sample: recreate
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import PodmanQuadletBase
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    build_volume_config
+)
 
 
 def main():
@@ -133,6 +161,8 @@ def main():
         type=dict(type='str'),
         mount_options=dict(type='str'),
         quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        project=dict(type='str'),
+        capabilities=dict(type='dict'),
     )
 
     module = AnsibleModule(
@@ -143,22 +173,7 @@ def main():
     quadlet = PodmanQuadletBase(module)
     
     # Generate the volume configuration
-    volume_config = {
-        'name': module.params['name'] + '.volume',
-        'service_description': f"{module.params['name']} Volume",
-        'driver': module.params['driver'],
-        'labels': module.params['labels'],
-        'options': module.params['options'],
-        'copy': module.params['copy'],
-    }
-    
-    # Add optional volume parameters
-    if module.params['device']:
-        volume_config['device'] = module.params['device']
-    if module.params['type']:
-        volume_config['type'] = module.params['type']
-    if module.params['mount_options']:
-        volume_config['mount_options'] = module.params['mount_options']
+    volume_config = build_volume_config(module.params)
     
     result = quadlet.manage_quadlet(
         name=module.params['name'],
@@ -166,6 +181,7 @@ def main():
         config=volume_config,
         quadlet_type='volume'
     )
+    quadlet.flush_manifests()
     
     module.exit_json(**result)
 
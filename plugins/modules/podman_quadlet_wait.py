@@ -0,0 +1,329 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: podman_quadlet_wait
+short_description: Wait until many Quadlet services are ready
+version_added: "1.1.0"
+description:
+  - Wait for a set of systemd services generated from Quadlets to become active and,
+    for containers with a health check, healthy
+  - All services share a single deadline instead of one timeout per unit
+  - Every poll queries the state of all pending services with one C(systemctl show) call,
+    their containers with one C(podman ps) call and their health with one C(podman inspect) call
+  - Containers whose health is still C(starting) get their health check run concurrently, so
+    they are reported ready as soon as the application is up rather than at the next check interval
+  - A service entering the C(failed) state ends the wait immediately
+options:
+  services:
+    description:
+      - Services to wait for
+      - Elements may be service names, quadlet unit files such as C(web.container) or C(db.volume),
+        or container names
+    type: list
+    elements: str
+    required: true
+  timeout:
+    description:
+      - Seconds to wait for all services together
+    type: int
+    default: 300
+  interval:
+    description:
+      - Seconds between two polls
+    type: float
+    default: 1.0
+  healthy:
+    description:
+      - Also wait for containers with a health check to report C(healthy)
+    type: bool
+    default: true
+  workers:
+    description:
+      - Maximum number of health checks run at the same time
+    type: int
+    default: 8
+  quadlet_dir:
+    description:
+      - Directory of the quadlet files, which selects the user or system instance of systemd
+    type: path
+    default: ~/.config/containers/systemd
+  executable:
+    description:
+      - Path of the podman executable
+    type: str
+    default: podman
+notes:
+  - Nothing is waited for in check mode, as the services are not started then
+  - Containers are matched to their service through the C(PODMAN_SYSTEMD_UNIT) label podman
+    sets on containers run by systemd
+author:
+  - GlobalBots Team (@globalbots)
+extends_documentation_fragment:
+  - community.podman_quadlets.podman_quadlets
+'''
+
+EXAMPLES = r'''
+- name: Wait for the whole stack
+  community.podman_quadlets.podman_quadlet_wait:
+    services: "{{ stack.start_waves | flatten }}"
+    timeout: 180
+
+- name: Wait for two containers to be running, ignoring health checks
+  community.podman_quadlets.podman_quadlet_wait:
+    services:
+      - web
+      - worker@1
+    healthy: false
+'''
+
+RETURN = r'''
+services:
+    description: Final state of every service
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - service: web.service
+        active_state: active
+        sub_state: running
+        health: healthy
+        ready: true
+        elapsed: 4.2
+ready_services:
+    description: Services that became ready
+    type: list
+    elements: str
+    returned: always
+    sample: ['db.service', 'web.service']
+failed_services:
+    description: Services that entered the failed state
+    type: list
+    elements: str
+    returned: always
+    sample: []
+pending_services:
+    description: Services that were not ready when the deadline passed
+    type: list
+    elements: str
+    returned: always
+    sample: []
+elapsed:
+    description: Seconds spent waiting
+    type: float
+    returned: always
+    sample: 4.2
+'''
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    dependency_service,
+    parse_systemctl_show,
+    quadlet_systemctl_command
+)
+
+
+class PodmanQuadletWait(PodmanQuadletBase):
+    """Wait for quadlet services with a shared deadline."""
+
+    def __init__(self, module):
+        super(PodmanQuadletWait, self).__init__(module)
+        self.services = list(dict.fromkeys(dependency_service(service)
+                                           for service in module.params['services']))
+        self.timeout = module.params['timeout']
+        self.interval = module.params['interval']
+        self.healthy = module.params['healthy']
+        self.workers = module.params['workers']
+        self.executable = module.params['executable']
+        self.systemctl = quadlet_systemctl_command(self._expand_path(module.params['quadlet_dir']))
+
+    def _run_command(self, cmd):
+        """Run a command and return the result."""
+        try:
+            return self.module.run_command(cmd, check_rc=False)
+        except Exception as e:
+            self.module.fail_json(msg=f"Failed to run {cmd[0]}: {to_native(e)}")
+
+    def show_services(self, services):
+        """Return the systemd properties of services with a single systemctl call."""
+        rc, stdout, stderr = self._run_command(
+            self.systemctl + ['show', '--property=Id,ActiveState,SubState,Result'] + services)
+        if rc != 0:
+            self.module.fail_json(msg=f"Failed to query services: {stderr}")
+
+        return parse_systemctl_show(stdout, services)
+
+    def find_containers(self):
+        """Return the ID of the running container of every quadlet service."""
+        rc, stdout, stderr = self._run_command(
+            [self.executable, 'ps', '--filter', 'label=PODMAN_SYSTEMD_UNIT', '--format', 'json'])
+        if rc != 0:
+            self.module.fail_json(msg=f"Failed to list containers: {stderr}")
+
+        try:
+            entries = json.loads(stdout or '[]') or []
+        except ValueError as e:
+            self.module.fail_json(msg=f"Failed to parse container list: {to_native(e)}")
+
+        containers = {}
+        for entry in entries:
+            service = (entry.get('Labels') or {}).get('PODMAN_SYSTEMD_UNIT')
+            if service:
+                containers[service] = entry.get('Id')
+        return containers
+
+    def inspect_health(self, container_ids):
+        """Return the health status of containers with a single podman inspect call."""
+        if not container_ids:
+            return {}
+        rc, stdout, stderr = self._run_command([self.executable, 'inspect', '--type', 'container']
+                                               + container_ids)
+        if rc != 0:
+            # A container may have exited since it was listed, try again next poll
+            return {}
+
+        try:
+            entries = json.loads(stdout or '[]') or []
+        except ValueError:
+            return {}
+
+        health = {}
+        for entry in entries:
+            state = entry.get('State') or {}
+            # Older podman releases name the field Healthcheck
+            status = (state.get('Health') or state.get('Healthcheck') or {}).get('Status') or ''
+            health[entry.get('Id')] = status
+        return health
+
+    def run_healthcheck(self, container_id):
+        """Run the health check of a container now instead of at its next interval."""
+        rc, stdout, stderr = self._run_command([self.executable, 'healthcheck', 'run',
+                                                container_id])
+        return container_id, rc == 0
+
+    def poll(self, pending, states, start):
+        """Refresh the state of the pending services."""
+        active = []
+        for service, properties in self.show_services(pending).items():
+            state = states[service]
+            state['active_state'] = properties.get('ActiveState', 'unknown')
+            state['sub_state'] = properties.get('SubState', 'unknown')
+            if state['active_state'] == 'active':
+                active.append(service)
+
+        containers = {}
+        health = {}
+        if self.healthy and active:
+            containers = self.find_containers()
+            container_ids = [containers[service] for service in active if service in containers]
+            health = self.inspect_health(container_ids)
+            starting = [container_id for container_id in container_ids
+                        if health.get(container_id) == 'starting']
+            if starting:
+                workers = max(1, min(self.workers, len(starting)))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for container_id, passed in pool.map(self.run_healthcheck, starting):
+                        if passed:
+                            health[container_id] = 'healthy'
+
+        for service in active:
+            state = states[service]
+            # Units without a container, such as networks, are ready once active
+            if service in containers:
+                status = health.get(containers[service], 'unknown')
+            else:
+                status = ''
+            state['health'] = status or None
+            if status in ('', 'healthy'):
+                state['ready'] = True
+                state['elapsed'] = round(time.monotonic() - start, 3)
+
+    def wait(self):
+        """Main method to wait for the services."""
+        states = dict((service, {
+            'service': service,
+            'active_state': 'unknown',
+            'sub_state': 'unknown',
+            'health': None,
+            'ready': False,
+            'elapsed': None,
+        }) for service in self.services)
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        pending = list(self.services)
+
+        if self.module.check_mode:
+            pending = []
+
+        while pending:
+            self.poll(pending, states, start)
+            failed = any(states[service]['active_state'] == 'failed' for service in pending)
+            pending = [service for service in pending
+                       if not states[service]['ready']
+                       and states[service]['active_state'] != 'failed']
+            remaining = deadline - time.monotonic()
+            if failed or not pending or remaining <= 0:
+                break
+            time.sleep(min(self.interval, remaining))
+
+        return {
+            'changed': False,
+            'services': [states[service] for service in self.services],
+            'ready_services': [service for service in self.services if states[service]['ready']],
+            'failed_services': [service for service in self.services
+                                if states[service]['active_state'] == 'failed'],
+            'pending_services': pending,
+            'elapsed': round(time.monotonic() - start, 3),
+        }
+
+
+def main():
+    argument_spec = dict(
+        services=dict(type='list', elements='str', required=True),
+        timeout=dict(type='int', default=300),
+        interval=dict(type='float', default=1.0),
+        healthy=dict(type='bool', default=True),
+        workers=dict(type='int', default=8),
+        quadlet_dir=dict(type='path', default='~/.config/containers/systemd'),
+        executable=dict(type='str', default='podman'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    if module.params['timeout'] < 0:
+        module.fail_json(msg="'timeout' cannot be negative")
+    if module.params['interval'] <= 0:
+        module.fail_json(msg="'interval' must be positive")
+    if module.params['workers'] < 1:
+        module.fail_json(msg="'workers' must be at least 1")
+
+    waiter = PodmanQuadletWait(module)
+    result = waiter.wait()
+
+    if result['failed_services']:
+        module.fail_json(msg=f"Services failed: {', '.join(result['failed_services'])}", **result)
+    if result['pending_services']:
+        module.fail_json(msg=f"Timed out after {module.params['timeout']}s waiting for "
+                             f"{', '.join(result['pending_services'])}", **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
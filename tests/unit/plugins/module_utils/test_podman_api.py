@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_api import (
+    PodmanAPIClient,
+    PodmanAPIError
+)
+
+
+class FakeLibpodHandler(BaseHTTPRequestHandler):
+    """Answer libpod requests from the in-memory state of the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, self.path, body))
+        path, _, query = self.path.partition('?')
+        prefix = '/v4.0.0/libpod'
+        assert path.startswith(prefix)
+        path = path[len(prefix):]
+        secrets = self.server.secrets
+
+        if (self.command, path) == ('GET', '/secrets/json'):
+            return self._reply(200, list(secrets.values()))
+        if self.command == 'GET' and path.startswith('/secrets/'):
+            name = path.split('/')[2]
+            if name not in secrets:
+                return self._reply(404, {'cause': 'no such secret',
+                                         'message': f'no secret with name {name}'})
+            return self._reply(200, secrets[name])
+        if (self.command, path) == ('POST', '/secrets/create'):
+            params = dict(item.split('=', 1) for item in query.split('&'))
+            name = params['name']
+            secrets[name] = {'ID': f'id-{name}', 'Spec': {'Name': name, 'Labels': {}}}
+            return self._reply(200, {'ID': f'id-{name}'})
+        if self.command == 'DELETE' and path.startswith('/secrets/'):
+            secrets.pop(path.split('/')[2], None)
+            return self._reply(204)
+        if (self.command, path) == ('POST', '/images/pull'):
+            if 'missing' in query:
+                return self._reply(200, {'error': 'manifest unknown'})
+            return self._reply(200, {'id': 'sha256:abc'})
+        if (self.command, path) == ('GET', '/images/json'):
+            # Drop the connection without notice, like the idle timeout of the service
+            self.close_connection = True
+            return self._reply(200, [{'Names': ['docker.io/library/nginx:latest']}])
+        return self._reply(404)
+
+    do_GET = do_POST = do_DELETE = _handle
+
+
+class FakeLibpodServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        socketserver.UnixStreamServer.__init__(self, path, FakeLibpodHandler)
+        self.connections = 0
+        self.requests = []
+        self.secrets = {}
+
+
+class FakeModule(object):
+    """Record the podman commands run through the CLI fallback."""
+
+    def __init__(self, outputs=None):
+        self.commands = []
+        self.outputs = outputs or {}
+
+    def run_command(self, cmd, data=None, binary_data=False, check_rc=False):
+        self.commands.append((cmd, data))
+        return self.outputs.get(tuple(cmd[1:]), self.outputs.get(tuple(cmd[1:3]), (0, '', '')))
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / 'podman.sock')
+    server = FakeLibpodServer(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = PodmanAPIClient(FakeModule(), socket_path=server.server_address)
+    yield client
+    client.close()
+
+
+def test_secret_operations_share_one_connection(server, client):
+    assert client.inspect_secret('db') is None
+    assert client.create_secret('db', data='secret', labels={'app': 'web'}) == 'id-db'
+    assert client.inspect_secret('db')['ID'] == 'id-db'
+    assert [entry['Spec']['Name'] for entry in client.list_secrets()] == ['db']
+    client.remove_secrets(['db'])
+
+    assert server.connections == 1
+    assert server.secrets == {}
+    method, path, body = server.requests[1]
+    assert method == 'POST'
+    assert 'labels=%7B%22app%22%3A+%22web%22%7D' in path
+    assert body == b'secret'
+    assert client.module.commands == []
+
+
+def test_create_secret_sends_file_content(server, client, tmp_path):
+    secret_file = tmp_path / 'token'
+    secret_file.write_bytes(b'from-file')
+    client.create_secret('token', path=str(secret_file))
+
+    assert server.requests[-1][2] == b'from-file'
+
+
+def test_closed_connection_is_reopened(server, client):
+    assert client.list_images() == [{'Names': ['docker.io/library/nginx:latest']}]
+    assert client.list_secrets() == []
+
+    assert server.connections == 2
+
+
+def test_pull_error_in_stream(client):
+    client.pull_image('docker.io/library/nginx:latest')
+    with pytest.raises(PodmanAPIError, match='manifest unknown'):
+        client.pull_image('docker.io/library/missing:latest')
+
+
+def test_pulls_from_threads_use_own_connections(server, client):
+    threads = [threading.Thread(target=client.pull_image, args=(f'image{index}',))
+               for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.connections == 3
+
+
+def test_cli_fallback_without_socket(tmp_path):
+    secrets = [{'ID': 'id-db', 'Spec': {'Name': 'db', 'Labels': {}}}]
+    module = FakeModule({
+        ('secret', 'ls'): (0, json.dumps([{'ID': 'id-db', 'Name': 'db', 'Driver': 'file'}]), ''),
+        ('secret', 'inspect', 'id-db'): (0, json.dumps(secrets), ''),
+        ('secret', 'inspect'): (125, '', 'no such secret'),
+        ('secret', 'create'): (0, 'id-db\n', ''),
+    })
+    client = PodmanAPIClient(module, socket_path=str(tmp_path / 'missing.sock'),
+                             executable='/usr/bin/podman')
+
+    assert client.transport == 'cli'
+    assert client.list_secrets() == secrets
+    assert client.inspect_secret('db') is None
+    assert client.create_secret('db', data='secret', labels={'app': 'web'}) == 'id-db'
+
+    assert module.commands[-1] == (
+        ['/usr/bin/podman', 'secret', 'create', '--label', 'app=web', 'db', '-'], b'secret')
+
+
+def test_cli_fallback_lists_secret_labels(tmp_path):
+    # podman secret ls has no labels, so they come from a single inspect call
+    listed = [{'ID': 'id-db', 'Name': 'db', 'Driver': 'file', 'CreatedAt': '2024-01-01'},
+              {'ID': 'id-api', 'Name': 'api', 'Driver': 'file', 'CreatedAt': '2024-01-01'}]
+    inspected = [{'ID': 'id-db', 'Spec': {'Name': 'db',
+                                          'Labels': {'io.podman_quadlets.digest': 'sha256:1'}}},
+                 {'ID': 'id-api', 'Spec': {'Name': 'api', 'Labels': {}}}]
+    module = FakeModule({
+        ('secret', 'ls'): (0, json.dumps(listed), ''),
+        ('secret', 'inspect', 'id-db', 'id-api'): (0, json.dumps(inspected), ''),
+    })
+    client = PodmanAPIClient(module, socket_path=str(tmp_path / 'missing.sock'))
+
+    assert client.list_secrets() == inspected
+    assert [cmd[1:] for cmd, data in module.commands] == [
+        ['secret', 'ls', '--format', 'json'], ['secret', 'inspect', 'id-db', 'id-api']]
+
+
+def test_cli_fallback_without_secrets(tmp_path):
+    module = FakeModule({('secret', 'ls'): (0, '[]', '')})
+    client = PodmanAPIClient(module, socket_path=str(tmp_path / 'missing.sock'))
+
+    assert client.list_secrets() == []
+    assert len(module.commands) == 1
+
+
+def test_cli_fallback_when_socket_refuses(tmp_path):
+    path = str(tmp_path / 'stale.sock')
+    stale = socketserver.UnixStreamServer(path, BaseHTTPRequestHandler)
+    stale.server_close()
+    module = FakeModule({('images', '--format'): (0, '[]', '')})
+    client = PodmanAPIClient(module, socket_path=path)
+
+    assert os.path.exists(path)
+    assert client.list_images() == []
+    assert client.transport == 'cli'
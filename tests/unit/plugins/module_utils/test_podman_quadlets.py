@@ -0,0 +1,489 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, GlobalBots Team <team@globalbots.net>
+# MIT License
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from ansible_collections.community.podman_quadlets.plugins.module_utils.podman_quadlets import (
+    PodmanQuadletBase,
+    build_pod_config,
+    classify_quadlet_change,
+    container_instances,
+    container_network_entries,
+    container_resource_entries,
+    format_cpuset,
+    is_quadlet_unit_file,
+    parse_cpuset,
+    publish_port,
+    quadlet_start_waves,
+    serialize_quadlet,
+    socket_activation_units,
+    split_quadlet_words
+)
+
+
+BASE = '[Unit]\nDescription=web\n\n[Container]\nImage=nginx\n'
+
+
+@pytest.mark.parametrize('sections, expected', [
+    (
+        [('Container', [('Image', 'nginx')])],
+        '[Container]\nImage=nginx',
+    ),
+    # Known keys follow the schema order, unknown keys come last sorted by name
+    (
+        [('Container', [('Zeta', 1), ('ContainerName', 'web'), ('Alpha', 'x'),
+                        ('Image', 'nginx')])],
+        '[Container]\nImage=nginx\nContainerName=web\nAlpha=x\nZeta=1',
+    ),
+    # List keys keep their order, map keys are sorted
+    (
+        [('Unit', [('After', 'b.service'), ('After', 'a.service')]),
+         ('Container', [('Label', 'b=2'), ('Label', 'a=1')])],
+        '[Unit]\nAfter=b.service\nAfter=a.service\n\n[Container]\nLabel=a=1\nLabel=b=2',
+    ),
+    # Quotes do not change the order of map values
+    (
+        [('Container', [('Environment', 'B=1'), ('Environment', 'A=two words')])],
+        '[Container]\nEnvironment="A=two words"\nEnvironment=B=1',
+    ),
+    (
+        [('Container', [('Environment', 'A=say "hi"')])],
+        '[Container]\nEnvironment="A=say \\"hi\\""',
+    ),
+    # Free-form values escape %, keys using specifiers keep them
+    (
+        [('Container', [('Environment', 'URL=a%20b'), ('Label', 'date=+%Y-%m'),
+                        ('Environment', 'MSG=100% done'), ('ContainerName', 'web-%i'),
+                        ('PublishPort', '808%i:80')])],
+        '[Container]\nContainerName=web-%i\nEnvironment="MSG=100%% done"\n'
+        'Environment=URL=a%%20b\nPublishPort=808%i:80\nLabel=date=+%%Y-%%m',
+    ),
+    (
+        [('Container', [('NoNewPrivileges', True), ('SecurityLabelDisable', False)])],
+        '[Container]\nSecurityLabelDisable=false\nNoNewPrivileges=true',
+    ),
+    (
+        [('Unit', [('Description', 'web')]), ('Container', [('Image', 'nginx')]),
+         ('Service', [('Restart', 'always')])],
+        '[Unit]\nDescription=web\n\n[Container]\nImage=nginx\n\n[Service]\nRestart=always',
+    ),
+])
+def test_serialize_quadlet(sections, expected):
+    assert serialize_quadlet(sections) == expected
+
+
+def test_serialize_quadlet_entry_order_is_irrelevant():
+    entries = [('Image', 'nginx'), ('Label', 'b=2'), ('PublishPort', '80:80'), ('Label', 'a=1')]
+    assert (serialize_quadlet([('Container', entries)])
+            == serialize_quadlet([('Container', list(reversed(entries)))]))
+
+
+def test_serialize_quadlet_rejects_line_breaks():
+    with pytest.raises(ValueError, match='line breaks'):
+        serialize_quadlet([('Container', [('Environment', 'A=1\nB=2')])])
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('A=1', ['A=1']),
+    ('"A=1"', ['A=1']),
+    ("'A=1'", ['A=1']),
+    ('"A=hello world" B=2', ['A=hello world', 'B=2']),
+    ('  A=1   B=2 ', ['A=1', 'B=2']),
+    ('A="x y"', ['A=x y']),
+    ('"A=say \\"hi\\""', ['A=say "hi"']),
+    ('"A=\\x41\\101\\u00e9"', ['A=AAé']),
+    ('"A=1\\tB"', ['A=1\tB']),
+    ('""', ['']),
+    ('', []),
+])
+def test_split_quadlet_words(value, expected):
+    assert split_quadlet_words(value) == expected
+
+
+@pytest.mark.parametrize('current, new, expected', [
+    (BASE, BASE, 'none'),
+    (None, BASE, 'recreate'),
+    (BASE, None, 'recreate'),
+    # Same meaning written differently
+    (BASE, '[Container]\nImage=nginx\n\n[Unit]\nDescription=web\n', 'none'),
+    (BASE + 'Label=b=2\nLabel=a=1\n', BASE + 'Label=a=1\nLabel=b=2\n', 'none'),
+    (BASE + 'Environment="A=1"\n', BASE + 'Environment=A=1\n', 'none'),
+    (BASE + 'Environment="A=1" B=2\n', BASE + 'Environment=B=2\nEnvironment=A=1\n', 'none'),
+    (BASE + 'NoNewPrivileges=yes\n', BASE + 'NoNewPrivileges=true\n', 'none'),
+    (BASE + 'Environment="A=50%% off"\n', BASE + 'Environment=A=50%%\\soff\n', 'none'),
+    (BASE + '# comment\n', BASE, 'none'),
+    # Changes systemd applies on daemon-reload
+    (BASE, BASE.replace('Description=web', 'Description=shop'), 'reload_only'),
+    (BASE, BASE + '\n[Service]\nRestart=on-failure\n', 'reload_only'),
+    (BASE, BASE + '\n[Install]\nWantedBy=default.target\n', 'reload_only'),
+    # Changes of the container itself
+    (BASE, BASE.replace('Image=nginx', 'Image=httpd'), 'recreate'),
+    (BASE + 'Environment=A=1\n', BASE + 'Environment=A=2\n', 'recreate'),
+    # Units written before % was escaped expand it, so the value did change
+    (BASE + 'Environment=URL=a%20b\n', BASE + 'Environment=URL=a%%20b\n', 'recreate'),
+    (BASE + 'PodmanArgs=--a\nPodmanArgs=--b\n', BASE + 'PodmanArgs=--b\nPodmanArgs=--a\n',
+     'recreate'),
+    (BASE, BASE.replace('Description=web', 'Description=shop') + 'PublishPort=80:80\n',
+     'recreate'),
+])
+def test_classify_quadlet_change(current, new, expected):
+    assert classify_quadlet_change(current, new) == expected
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({}, None),
+    ({'replicas': None, 'instances': None}, None),
+    ({'replicas': 3}, ['1', '2', '3']),
+    ({'replicas': 2, 'instance_base': 8080}, ['8080', '8081']),
+    ({'replicas': 2, 'instance_base': 0}, ['0', '1']),
+    ({'replicas': 0}, []),
+    ({'instances': ['blue', 8080]}, ['blue', '8080']),
+    ({'instances': ['blue'], 'replicas': 3}, ['blue']),
+])
+def test_container_instances(params, expected):
+    assert container_instances(params) == expected
+
+
+@pytest.mark.parametrize('resources, container, service', [
+    (None, [], []),
+    ({'memory': None, 'cpus': None}, [], []),
+    ({'memory': '512m', 'memory_reservation': '256m', 'memory_swap': '-1'},
+     [('PodmanArgs', '--memory=512m'), ('PodmanArgs', '--memory-reservation=256m'),
+      ('PodmanArgs', '--memory-swap=-1')], []),
+    ({'cpus': 1.5, 'cpu_shares': 512}, [('PodmanArgs', '--cpus=1.5'),
+                                        ('PodmanArgs', '--cpu-shares=512')], []),
+    ({'cpu_weight': 200, 'pids_limit': 100},
+     [('PidsLimit', 100)], [('CPUWeight', 200)]),
+    ({'blkio_weight': 300, 'device_read_bps': ['/dev/sda:10m'],
+      'device_write_iops': ['/dev/sda:100']},
+     [('PodmanArgs', '--blkio-weight=300'), ('PodmanArgs', '--device-read-bps=/dev/sda:10m'),
+      ('PodmanArgs', '--device-write-iops=/dev/sda:100')], []),
+    ({'cpuset_cpus': '3,0-1', 'cpuset_mems': '0'},
+     [('PodmanArgs', '--cpuset-cpus=0-1,3'), ('PodmanArgs', '--cpuset-mems=0')], []),
+])
+def test_container_resource_entries(resources, container, service):
+    assert container_resource_entries(resources) == (container, service)
+
+
+@pytest.mark.parametrize('resources, message', [
+    ({'memory': 'lots'}, 'resources.memory'),
+    ({'memory': '1m', 'memory_reservation': '2m'}, 'cannot exceed resources.memory'),
+    ({'memory_swap': '1g'}, 'requires resources.memory'),
+    ({'memory': '1g', 'memory_swap': '512m'}, 'cannot be lower than resources.memory'),
+    ({'cpus': 0}, 'greater than 0'),
+    ({'cpus': 1, 'cpu_quota': 50000}, 'cannot be combined'),
+    ({'cpu_period': 100}, 'between 1000 and 1000000'),
+    ({'pids_limit': -2}, 'at least -1'),
+    ({'blkio_weight': 5}, 'between 10 and 1000'),
+    ({'device_read_bps': ['sda:10m']}, '/dev/sda:10m'),
+    ({'device_write_iops': ['/dev/sda:fast']}, '/dev/sda:1000'),
+    ({'cpuset_cpus': '3-1'}, 'resources.cpuset_cpus'),
+])
+def test_container_resource_entries_invalid(resources, message):
+    with pytest.raises(ValueError, match=message):
+        container_resource_entries(resources)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('', []),
+    ('0', [0]),
+    ('0-3', [0, 1, 2, 3]),
+    ('8,0-2', [0, 1, 2, 8]),
+    (' 1 , 3-4 ,', [1, 3, 4]),
+    ('2-2,2', [2]),
+])
+def test_parse_cpuset(value, expected):
+    assert parse_cpuset(value) == expected
+
+
+@pytest.mark.parametrize('value', ['a', '1-', '-1', '1-b', '4-2'])
+def test_parse_cpuset_invalid(value):
+    with pytest.raises(ValueError):
+        parse_cpuset(value)
+
+
+@pytest.mark.parametrize('ids, expected', [
+    ([], ''),
+    ([3], '3'),
+    ([0, 1, 2, 3], '0-3'),
+    ([8, 0, 1, 2, 8], '0-2,8'),
+    ([1, 3, 4, 6], '1,3-4,6'),
+])
+def test_format_cpuset(ids, expected):
+    assert format_cpuset(ids) == expected
+    assert parse_cpuset(format_cpuset(ids)) == sorted(set(ids))
+
+
+@pytest.mark.parametrize('units, expected', [
+    ({}, []),
+    ({'web.container': (['web.service'], [])}, [['web.service']]),
+    # Units without dependencies between them start together, sorted by unit file
+    ({'b.container': (['b.service'], []), 'a.container': (['a.service'], [])},
+     [['a.service', 'b.service']]),
+    ({'web.container': (['web.service'], ['db.service']),
+      'db.container': (['db.service'], ['data-volume.service']),
+      'data.volume': (['data-volume.service'], [])},
+     [['data-volume.service'], ['db.service'], ['web.service']]),
+    # Dependencies outside of the units are left to systemd
+    ({'web.container': (['web.service'], ['network-online.target', 'db.service'])},
+     [['web.service']]),
+    # A templated container starts all its instances in the same wave
+    ({'web@.container': (['web@1.service', 'web@2.service'], ['db.service']),
+      'db.container': (['db.service'], [])},
+     [['db.service'], ['web@1.service', 'web@2.service']]),
+    # Units without services, such as absent ones, only order the others
+    ({'web.container': (['web.service'], []), 'old.container': ([], [])}, [['web.service']]),
+])
+def test_quadlet_start_waves(units, expected):
+    assert quadlet_start_waves(units) == expected
+
+
+@pytest.mark.parametrize('units, cycle', [
+    ({'a.container': (['a.service'], ['b.service']),
+      'b.container': (['b.service'], ['a.service'])},
+     'a.container -> b.container -> a.container'),
+    ({'a.container': (['a.service'], []),
+      'b.container': (['b.service'], ['c.service']),
+      'c.container': (['c.service'], ['d.service']),
+      'd.container': (['d.service'], ['b.service'])},
+     'b.container -> c.container -> d.container -> b.container'),
+])
+def test_quadlet_start_waves_cycle(units, cycle):
+    with pytest.raises(ValueError, match=f'Dependency cycle between {cycle}'):
+        quadlet_start_waves(units)
+
+
+HEADER = '# Managed by community.podman_quadlets\n'
+
+INSTALL = '\n\n[Install]\nWantedBy=sockets.target'
+
+
+@pytest.mark.parametrize('socket_activation, expected', [
+    (
+        {'listen_stream': ['8080', '[::]:8443'], 'listen_datagram': ['5353'],
+         'file_descriptor_name': 'http'},
+        {'web.socket': HEADER + '[Unit]\nDescription=web Socket\n\n[Socket]\n'
+                                'ListenStream=8080\nListenStream=[::]:8443\n'
+                                'ListenDatagram=5353\nFileDescriptorName=http' + INSTALL},
+    ),
+    # With idle_timeout a proxy forwards connections and exits once idle
+    (
+        {'listen_stream': ['8080'], 'idle_timeout': ' 5min ', 'target': '127.0.0.1:18080'},
+        {'web.socket': HEADER + '[Unit]\nDescription=web Socket\n\n[Socket]\n'
+                                'ListenStream=8080\nService=web-proxy.service' + INSTALL,
+         'web-proxy.service': HEADER + '[Unit]\nDescription=web Socket Proxy\n'
+                                       'Requires=web.service\nRequires=web.socket\n'
+                                       'After=web.service\nAfter=web.socket\n\n[Service]\n'
+                                       'ExecStart=/usr/lib/systemd/systemd-socket-proxyd '
+                                       '--exit-idle-time=5min 127.0.0.1:18080'},
+    ),
+])
+def test_socket_activation_units(socket_activation, expected):
+    assert socket_activation_units('web', socket_activation) == expected
+
+
+@pytest.mark.parametrize('socket_activation, message', [
+    ({}, 'requires listen_stream or listen_datagram'),
+    ({'listen_stream': [], 'listen_datagram': None}, 'requires listen_stream or listen_datagram'),
+    ({'listen_stream': ['8080'], 'idle_timeout': '5min'}, 'requires socket_activation.target'),
+    ({'listen_stream': ['8080'], 'target': '127.0.0.1:18080'}, 'only used with'),
+    ({'listen_datagram': ['5353'], 'idle_timeout': '5min', 'target': '127.0.0.1:5353'},
+     'only forwards streams'),
+    ({'listen_stream': ['8080'], 'idle_timeout': 'soon', 'target': '127.0.0.1:18080'},
+     'must be a time span'),
+])
+def test_socket_activation_units_invalid(socket_activation, message):
+    with pytest.raises(ValueError, match=message):
+        socket_activation_units('web', socket_activation)
+
+
+@pytest.mark.parametrize('port, expected', [
+    ({'host_port': '8080', 'container_port': '80'}, '8080:80'),
+    ({'host_port': 8080, 'container_port': 80, 'host_ip': None, 'protocol': None}, '8080:80'),
+    ({'host_port': '53', 'container_port': '53', 'protocol': 'udp'}, '53:53/udp'),
+    ({'host_port': '8080', 'container_port': '80', 'host_ip': '127.0.0.1'},
+     '127.0.0.1:8080:80'),
+    ({'host_port': '8080', 'container_port': '80', 'host_ip': '::1', 'protocol': 'tcp'},
+     '[::1]:8080:80/tcp'),
+    ({'host_port': '8080', 'container_port': '80', 'host_ip': '[::1]'}, '[::1]:8080:80'),
+    ({'host_port': '808%i', 'container_port': '80'}, '808%i:80'),
+])
+def test_publish_port(port, expected):
+    assert publish_port(port) == expected
+
+
+def test_publish_port_invalid_protocol():
+    with pytest.raises(ValueError, match="got 'icmp'"):
+        publish_port({'host_port': '8080', 'container_port': '80', 'protocol': 'icmp'})
+
+
+@pytest.mark.parametrize('config, expected', [
+    ({}, []),
+    ({'network_mode': 'bridge', 'networks': ['internal.network', 'podman']},
+     ['internal.network', 'podman']),
+    ({'network_mode': 'host'}, ['host']),
+    ({'network_mode': 'none'}, ['none']),
+    ({'network_mode': 'container:db'}, ['container:db']),
+    ({'network_mode': 'pasta'}, ['pasta']),
+    ({'network_mode': 'pasta', 'pasta_options': ['-T', '5432']}, ['pasta:-T,5432']),
+    ({'network_mode': 'slirp4netns'}, ['slirp4netns']),
+    ({'network_mode': 'slirp4netns',
+      'slirp4netns': {'mtu': 1500, 'allow_host_loopback': True, 'port_handler': None}},
+     ['slirp4netns:allow_host_loopback=true,mtu=1500']),
+    ({'network_mode': 'pasta', 'ports': [{'host_port': '8080', 'container_port': '80'}]},
+     ['pasta']),
+])
+def test_container_network_entries(config, expected):
+    assert container_network_entries(config) == expected
+
+
+@pytest.mark.parametrize('config, message', [
+    ({'pasta_options': ['-T', '5432']}, 'pasta_options requires network_mode=pasta'),
+    ({'network_mode': 'host', 'slirp4netns': {'mtu': 1500}},
+     'slirp4netns requires network_mode=slirp4netns'),
+    ({'network_mode': 'host', 'networks': ['podman']}, 'cannot be joined with network_mode=host'),
+    ({'network_mode': 'slirp4netns', 'slirp4netns': {'mtu': 60}}, 'at least 68'),
+    ({'network_mode': 'host', 'ports': [{'host_port': '80', 'container_port': '80'}]},
+     'cannot be published with network_mode=host'),
+    ({'network_mode': 'container:db', 'ports': [{'host_port': '80', 'container_port': '80'}]},
+     'cannot be published with network_mode=container:db'),
+    ({'network_mode': 'container:'}, "got 'container:'"),
+    ({'network_mode': 'macvlan'}, "got 'macvlan'"),
+])
+def test_container_network_entries_invalid(config, message):
+    with pytest.raises(ValueError, match=message):
+        container_network_entries(config)
+
+
+class FakeModule(object):
+    """Record the commands and warnings of PodmanQuadletBase."""
+
+    check_mode = False
+
+    def __init__(self, outputs=None):
+        self.commands = []
+        self.warnings = []
+        # stdout of the systemctl commands, by verb
+        self.outputs = outputs or {}
+
+    def run_command(self, cmd, check_rc=False):
+        self.commands.append(cmd)
+        return 0, self.outputs.get(cmd[2], ''), ''
+
+    def warn(self, msg):
+        self.warnings.append(msg)
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs['msg'])
+
+
+@pytest.mark.parametrize('unit_file, expected', [
+    ('web.container', True),
+    ('web@.container', True),
+    ('shop.pod', True),
+    ('web.socket', False),
+    ('.container', False),
+    ('web', False),
+    ('.', False),
+    ('..', False),
+    ('../web.container', False),
+    ('/etc/web.container', False),
+    ('sub/web.container', False),
+])
+def test_is_quadlet_unit_file(unit_file, expected):
+    assert is_quadlet_unit_file(unit_file) == expected
+
+
+def test_prune_quadlets_ignores_paths_in_manifest(tmp_path):
+    quadlet_dir = tmp_path / 'containers' / 'systemd'
+    quadlet_dir.mkdir(parents=True)
+    victims = [tmp_path / 'containers' / 'victim.container', tmp_path / 'other.container']
+    for victim in victims:
+        victim.write_text('keep me')
+    for unit_file in ('web.container', 'old.container'):
+        (quadlet_dir / unit_file).write_text('[Container]\nImage=nginx\n')
+    manifest = quadlet_dir / '.podman_quadlets-shop.json'
+    manifest.write_text(json.dumps({'units': {
+        'web.container': 'a', 'old.container': 'b', '../victim.container': 'c',
+        str(victims[1]): 'd', '..': 'e',
+    }}))
+    module = FakeModule()
+    quadlet = PodmanQuadletBase(module, params={'quadlet_dir': str(quadlet_dir),
+                                                'project': 'shop'})
+
+    assert quadlet.prune_quadlets({'web.container'}) == ['old.container']
+    quadlet.flush_manifests()
+
+    assert [victim.read_text() for victim in victims] == ['keep me', 'keep me']
+    assert sorted(path.name for path in quadlet_dir.iterdir()) == [
+        '.podman_quadlets-shop.json', 'web.container']
+    assert json.loads(manifest.read_text())['units'] == {'web.container': 'a'}
+    assert len(module.warnings) == 3
+    assert module.commands == [['systemctl', '--user', 'stop', 'old.service']]
+
+
+def test_pod_recreate_restarts_pod(tmp_path):
+    module = FakeModule(outputs={'show': 'ActiveState=active\n'})
+    quadlet = PodmanQuadletBase(module, params={'quadlet_dir': str(tmp_path)})
+    params = {'name': 'shop', 'networks': [], 'volumes': [], 'userns': None,
+              'ports': [{'host_port': 8080, 'container_port': 80}]}
+    quadlet.manage_quadlet('shop', 'present', build_pod_config(params), quadlet_type='pod')
+
+    params['ports'] = [{'host_port': 8081, 'container_port': 80}]
+    result = quadlet.manage_quadlet('shop', 'present', build_pod_config(params),
+                                    quadlet_type='pod')
+    assert result['change_class'] == 'recreate'
+    assert result['changed_services'] == ['shop-pod.service']
+
+    module.commands = []
+    control = quadlet.apply_service_states(str(tmp_path), {'shop-pod.service': 'started'},
+                                           recreate=result['changed_services'])
+    assert control['restarted_services'] == ['shop-pod.service']
+    assert ['systemctl', '--user', 'restart', 'shop-pod.service'] in module.commands
+
+
+@pytest.fixture
+def shared_dirs():
+    """Return a directory of an unprivileged user and one of root, both reachable by the user."""
+    dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+    for path in dirs:
+        os.chmod(path, 0o755)
+    os.chown(dirs[0], 65534, 65534)
+    yield dirs
+    for path in dirs:
+        shutil.rmtree(path)
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='acting as another user needs root')
+def test_owner_file_operations_run_as_owner(shared_dirs):
+    home, system_dir = shared_dirs
+    important = os.path.join(system_dir, 'important.conf')
+    with open(important, 'w') as f:
+        f.write('keep me')
+    # The user points its quadlet directory at a directory of root
+    os.symlink(system_dir, os.path.join(home, 'systemd'))
+    quadlet = PodmanQuadletBase(FakeModule(), params={}, owner=(65534, 65534))
+
+    with pytest.raises(PermissionError):
+        quadlet._write_file(os.path.join(home, 'systemd', 'web.container'), '[Container]\n')
+    with pytest.raises(PermissionError):
+        quadlet._remove_file(os.path.join(home, 'systemd', 'important.conf'))
+    assert os.listdir(system_dir) == ['important.conf']
+
+    quadlet_dir = os.path.join(home, '.config', 'containers', 'systemd')
+    assert quadlet._ensure_directory(quadlet_dir)
+    quadlet._write_file(os.path.join(quadlet_dir, 'web.container'), '[Container]\n')
+    assert os.stat(os.path.join(quadlet_dir, 'web.container')).st_uid == 65534
+    assert os.stat(os.path.join(home, '.config')).st_uid == 65534
+    assert quadlet._read_file(os.path.join(quadlet_dir, 'web.container')) == '[Container]\n'
+    assert (os.geteuid(), os.getegid()) == (0, 0)